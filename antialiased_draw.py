@@ -1,4 +1,5 @@
 # Anti-aliased drawing utilities for pygame
+from collections import OrderedDict
 import pygame
 import pygame.gfxdraw
 
@@ -72,3 +73,71 @@ def draw_antialiased_rect(surface, color, rect):
     # For rectangles, we'll use regular pygame as gfxdraw doesn't provide
     # anti-aliased rectangles. We could implement our own, but it's complex.
     pygame.draw.rect(surface, color, rect)
+
+def circle_coverage(radius):
+    """
+    Coverage (0-255) of every pixel by an anti-aliased circle as draw_antialiased_circle()
+    draws it, as a (2 * radius + 3) square array indexed [x, y] with the center at radius + 1
+    """
+    radius = int(radius)
+    size = 2 * radius + 3
+    surface = pygame.Surface((size, size))
+    draw_antialiased_circle(surface, (255, 255, 255), (radius + 1, radius + 1), radius)
+    return pygame.surfarray.array_red(surface)
+
+class CircleSpriteCache:
+    """
+    Pre-rendered anti-aliased circles keyed by (radius, color), so drawing a circle is a
+    single blit instead of two gfxdraw calls. Sprites have one pixel of room around the
+    circle for the anti-aliased edge. The least recently used sprites are dropped beyond
+    max_size, so patterns with random colors do not grow the cache without bound.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._sprites = OrderedDict()  # (radius, color) -> (surface, offset from the center to the top left)
+        self._coverage = {}  # radius -> circle_coverage(radius), one per radius in use
+
+    def get(self, color, radius):
+        """Get the sprite of a circle and the offset to add to its center for blitting"""
+        key = (int(radius), tuple(color[:3]))
+        entry = self._sprites.get(key)
+        if entry is not None:
+            self._sprites.move_to_end(key)
+        else:
+            radius, color = key
+            # The coverage becomes the sprite's alpha (gfxdraw on a transparent surface
+            # would overwrite the alpha of the filled pixels)
+            coverage = self._coverage.get(radius)
+            if coverage is None:
+                coverage = self._coverage[radius] = circle_coverage(radius)
+            sprite = pygame.Surface(coverage.shape, pygame.SRCALPHA)
+            sprite.fill((*color, 0))
+            alpha = pygame.surfarray.pixels_alpha(sprite)
+            alpha[:] = coverage
+            del alpha  # Unlock the sprite
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()  # Matches the display format, faster to blit
+            entry = self._sprites[key] = (sprite, -(radius + 1))
+            if len(self._sprites) > self.max_size:
+                self._sprites.popitem(last=False)
+        return entry
+
+    def blit_args(self, color, center, radius):
+        """(sprite, destination) for Surface.blit() or Surface.blits() drawing a circle"""
+        sprite, offset = self.get(color, radius)
+        return sprite, (int(center[0]) + offset, int(center[1]) + offset)
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def clear(self):
+        self._sprites.clear()
+        self._coverage.clear()
+
+# Global circle sprite cache instance
+circle_sprites = CircleSpriteCache()
+
+def draw_circle_sprite(surface, color, center, radius):
+    """Draw an anti-aliased circle from the sprite cache (same arguments as draw_antialiased_circle)"""
+    surface.blit(*circle_sprites.blit_args(color, center, radius))
@@ -0,0 +1,160 @@
+"""
+Benchmark - Run the Player bot headless through all levels for many seeds in parallel
+
+Every seed plays one full game from level 1 with the bot until it wins, loses or hits the
+frame cap. The results (per game, per level and summarized, with the simulation speed of
+every worker) are written as JSON so runs on different commits can be compared.
+
+Usage: python benchmark.py [output.json] [seed count] [bot mode]
+"""
+import json
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+
+SEEDS = 32                 # Number of games, seeded 0..SEEDS-1
+WORKERS = None             # Pool size, None for one worker per CPU
+BOT_MODE = 'casts'         # Player.bot_mode, see Player
+MAX_FRAMES = 60 * 60 * 5   # Frame cap per game (5 minutes of game time)
+LEVELS = 10                # Levels of a full game, reaching LEVELS + 1 is a win
+OUTPUT = 'benchmark.json'
+
+_game = None  # Game reused by all the games of a worker process
+
+def run_game(task) -> dict:
+    """
+    Play one seeded game with the bot
+
+    Args:
+        task: (seed, bot mode, frame cap)
+
+    Returns:
+        Results of the game as a JSON-compatible dict
+    """
+    global _game
+    seed, bot_mode, max_frames = task
+    if _game is None:
+        from game import Game
+        _game = Game(headless=True)
+    game = _game
+    game.reset(seed=seed)
+    game.player.bot_enabled = True
+    game.player.bot_mode = bot_mode
+    game.player.bot_planner.budget_us = None  # Only the deterministic work budget, see LookaheadPlanner
+
+    # Frames spent and hits taken on every level
+    level_frames = [0] * LEVELS
+    level_hits = [0] * LEVELS
+    start = time.perf_counter()
+    while not game.game_over and game.clock.frame < max_frames:
+        level, damage_recieved = game.level, game.damage_recieved
+        game.update()
+        level_frames[level - 1] += 1
+        level_hits[level - 1] += game.damage_recieved - damage_recieved
+    elapsed = time.perf_counter() - start
+
+    return {
+        'seed': seed,
+        'survived': game.player.lives > 0,
+        'win': game.win,
+        'level_reached': min(game.level, LEVELS),
+        'frames': game.clock.frame,
+        'damage_dealt': game.damage_dealt,
+        'damage_recieved': game.damage_recieved,
+        'lives': game.player.lives,
+        'elapsed': elapsed,
+        'fps': game.clock.frame / elapsed if elapsed > 0 else 0.0,
+        'level_frames': level_frames,
+        'level_hits': level_hits,
+        'worker': os.getpid(),
+    }
+
+def summarize(games: list, wall_time: float) -> dict:
+    """Aggregate the results of run_game()"""
+    count = len(games)
+    mean = lambda key: sum(game[key] for game in games) / count if count else 0.0
+
+    # Simulated frames per second of every worker over all of its games
+    workers = {}
+    for game in games:
+        frames, elapsed = workers.get(game['worker'], (0, 0.0))
+        workers[game['worker']] = (frames + game['frames'], elapsed + game['elapsed'])
+    worker_fps = [frames / elapsed if elapsed > 0 else 0.0 for frames, elapsed in workers.values()]
+
+    # Per level: how many games got there, and the hits taken per minute spent on it
+    levels = []
+    for index in range(LEVELS):
+        frames = sum(game['level_frames'][index] for game in games)
+        hits = sum(game['level_hits'][index] for game in games)
+        levels.append({
+            'level': index + 1,
+            'games_reached': sum(1 for game in games if game['level_frames'][index] > 0),
+            'frames': frames,
+            'hits': hits,
+            'hits_per_minute': hits / (frames / 3600) if frames else 0.0,
+        })
+
+    return {
+        'games': count,
+        'survival_rate': mean('survived'),
+        'win_rate': mean('win'),
+        'mean_level_reached': mean('level_reached'),
+        'mean_damage_dealt': mean('damage_dealt'),
+        'mean_damage_recieved': mean('damage_recieved'),
+        'mean_frames': mean('frames'),
+        'worker_fps': worker_fps,
+        'total_fps': sum(game['frames'] for game in games) / wall_time if wall_time > 0 else 0.0,
+        'wall_time': wall_time,
+        'levels': levels,
+    }
+
+def git_commit() -> str | None:
+    """Current commit of the working directory, None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(seeds: int = SEEDS, bot_mode: str = BOT_MODE, max_frames: int = MAX_FRAMES,
+                  workers: int = WORKERS) -> dict:
+    """
+    Play seeds games in a process pool
+
+    Returns:
+        {'config', 'commit', 'summary', 'games'} with the games ordered by seed
+    """
+    tasks = [(seed, bot_mode, max_frames) for seed in range(seeds)]
+    start = time.perf_counter()
+    with mp.Pool(workers) as pool:
+        games = sorted(pool.imap_unordered(run_game, tasks), key=lambda game: game['seed'])
+    wall_time = time.perf_counter() - start
+
+    return {
+        'config': {'seeds': seeds, 'bot_mode': bot_mode, 'max_frames': max_frames,
+                   'workers': workers or os.cpu_count(), 'levels': LEVELS},
+        'commit': git_commit(),
+        'summary': summarize(games, wall_time),
+        'games': games,
+    }
+
+def main():
+    output = sys.argv[1] if len(sys.argv) > 1 else OUTPUT
+    seeds = int(sys.argv[2]) if len(sys.argv) > 2 else SEEDS
+    bot_mode = sys.argv[3] if len(sys.argv) > 3 else BOT_MODE
+
+    results = run_benchmark(seeds, bot_mode)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+
+    summary = results['summary']
+    print(f"{summary['games']} games with the '{bot_mode}' bot in {summary['wall_time']:.1f}s")
+    print(f"Survival: {summary['survival_rate']:.0%}  Wins: {summary['win_rate']:.0%}  "
+          f"Mean level reached: {summary['mean_level_reached']:.2f}")
+    print(f"Damage dealt: {summary['mean_damage_dealt']:.1f}  Damage recieved: {summary['mean_damage_recieved']:.2f}")
+    print(f"Simulated FPS per worker: {', '.join(f'{fps:.0f}' for fps in summary['worker_fps'])}")
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+LookaheadPlanner - Beam search dodging planner based on analytic closest-approach times
+"""
+import math
+import time
+import numpy as np
+from globals import Globals
+
+# Candidate moves per plan segment: stay, the 4 axes and the 4 diagonals (unit length)
+_DIAGONAL = 1 / math.sqrt(2)
+PLANNER_MOVES = np.array([(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1),
+                          (_DIAGONAL, _DIAGONAL), (_DIAGONAL, -_DIAGONAL),
+                          (-_DIAGONAL, _DIAGONAL), (-_DIAGONAL, -_DIAGONAL)])
+
+class Plan:
+    """Result of LookaheadPlanner.plan()"""
+
+    def __init__(self, actions: np.ndarray, cost: float, clearance: float, depth: int, elapsed_us: float):
+        self.actions = actions      # Indices into PLANNER_MOVES, one per segment
+        self.cost = cost
+        self.clearance = clearance  # Smallest gap to any bullet along the plan (negative means a hit)
+        self.depth = depth          # Number of segments searched before a budget ran out
+        self.elapsed_us = elapsed_us
+
+    def direction(self, index: int = 0) -> np.ndarray:
+        """Unit move (or zero) of a plan segment"""
+        return PLANNER_MOVES[self.actions[index]]
+
+class LookaheadPlanner:
+    """
+    Searches piecewise-linear player trajectories: the horizon is split into segments and
+    each segment holds one of the PLANNER_MOVES. Bullets move in straight lines, so the
+    closest approach between the player and every bullet within a segment has a closed
+    form, and a segment only considers the bullets that could have reached the player by
+    its end. A beam search expands all moves of the best partial plans one segment at a time
+    and returns the best plan found so far (at least one segment is always searched) when the
+    next segment would exceed the work budget: max_work closest-approach evaluations (nodes
+    times bullets) per call. The work budget is deterministic, so the same game state always
+    gives the same plan. budget_us is only a hard cap on top of it for the live game: a segment
+    is skipped when its work at the measured cost per evaluation would overrun it. Set it to
+    None where results have to be reproducible (benchmarks, replays).
+
+    Segment cost: a large penalty for a hit (larger when sooner), a quadratic penalty when
+    the gap to a bullet falls below safety_margin, and a small pull towards a target point.
+    """
+
+    def __init__(self, player_speed: float = Globals.player_speed, player_radius: float = 2,
+                 segment_frames: int = 6, segments: int = 6, beam_width: int = 12,
+                 max_work: int = 20000, budget_us: float | None = 1500, safety_margin: float = 12):
+        """
+        Args:
+            player_speed: Distance the player moves per frame
+            player_radius: Player collision radius
+            segment_frames: Frames each move is held
+            segments: Number of segments in a full plan (horizon = segments * segment_frames)
+            beam_width: Partial plans kept after every segment
+            max_work: Closest-approach evaluations (nodes times bullets) per plan() call
+            budget_us: Hard time cap per plan() call in microseconds, None for none
+            safety_margin: Gap to bullets below which a plan is penalized
+        """
+        self.player_speed = player_speed
+        self.player_radius = player_radius
+        self.segment_frames = segment_frames
+        self.segments = segments
+        self.beam_width = beam_width
+        self.max_work = max_work
+        self.budget_us = budget_us
+        self.safety_margin = safety_margin
+        self.hit_cost = 1000.0
+        self.target_weight = 0.2
+        self.evaluation_ns = None  # Measured cost of one closest-approach evaluation (smoothed)
+
+    @property
+    def horizon(self) -> int:
+        """Frames covered by a full plan"""
+        return self.segments * self.segment_frames
+
+    def reach(self, bullet_radii: np.ndarray, bullet_velocities: np.ndarray, frames: int = None) -> float:
+        """Distance from the player beyond which no bullet can matter within frames (default: the horizon)"""
+        if len(bullet_radii) == 0:
+            return 0.0
+        frames = self.horizon if frames is None else frames
+        max_speed = np.sqrt((bullet_velocities ** 2).sum(axis=1)).max()
+        return (frames * (max_speed + self.player_speed) + bullet_radii.max()
+                + self.player_radius + self.safety_margin)
+
+    def _bounds(self):
+        """Lowest and highest player position in the world"""
+        low = np.array([Globals.world_left + self.player_radius, Globals.world_top + self.player_radius])
+        high = np.array([Globals.world_right - self.player_radius, Globals.world_bottom - self.player_radius])
+        return low, high
+
+    @staticmethod
+    def _segment_clearance(starts: np.ndarray, player_velocity: np.ndarray, frames: float,
+                           bullet_positions: np.ndarray, bullet_velocities: np.ndarray, gap: np.ndarray) -> np.ndarray:
+        """
+        Smallest gap to the bullets of each player segment (start, velocity held for frames),
+        from the closest approach of the bullet relative to the player, which is linear in time
+
+        Args:
+            starts, player_velocity: (N, 2) segment starts and velocities
+            bullet_positions: (B, 2) bullet positions at the start of the segments
+        """
+        offset = bullet_positions[np.newaxis, :, :] - starts[:, np.newaxis, :]
+        relative_velocity = bullet_velocities[np.newaxis, :, :] - player_velocity[:, np.newaxis, :]
+        speed2 = (relative_velocity ** 2).sum(axis=2)
+        tau = np.clip(-(offset * relative_velocity).sum(axis=2) / np.maximum(speed2, 1e-9), 0, frames)
+        closest = offset + relative_velocity * tau[:, :, np.newaxis]
+        return (np.sqrt((closest ** 2).sum(axis=2)) - gap).min(axis=1)
+
+    def clearance(self, position, actions: np.ndarray, first_frames: int, bullet_positions: np.ndarray,
+                  bullet_velocities: np.ndarray, bullet_radii: np.ndarray) -> float:
+        """
+        Smallest gap to the bullets along the rest of a plan
+
+        Args:
+            position: Player position (Vector2 or (x, y))
+            actions: Remaining plan segments, indices into PLANNER_MOVES
+            first_frames: Frames left of the first remaining segment
+        """
+        if len(bullet_positions) == 0:
+            return np.inf
+        low, high = self._bounds()
+        gap = bullet_radii + self.player_radius
+        start = np.array([[position[0], position[1]]], dtype=np.float64)
+        elapsed = 0
+        clearance = np.inf
+        for index, action in enumerate(actions):
+            frames = first_frames if index == 0 else self.segment_frames
+            end = np.clip(start + PLANNER_MOVES[action] * self.player_speed * frames, low, high)
+            segment = self._segment_clearance(start, (end - start) / frames, frames,
+                                              bullet_positions + bullet_velocities * elapsed, bullet_velocities, gap)
+            clearance = min(clearance, float(segment[0]))
+            start = end
+            elapsed += frames
+        return clearance
+
+    def plan(self, position, bullet_positions: np.ndarray, bullet_velocities: np.ndarray,
+             bullet_radii: np.ndarray, target=None) -> Plan:
+        """
+        Find a low-cost plan from the given position
+
+        Args:
+            position: Player position (Vector2 or (x, y))
+            bullet_positions, bullet_velocities, bullet_radii: (B, 2), (B, 2) and (B,) arrays
+                of the bullets to avoid, usually just the ones within reach()
+            target: Point the plan is pulled towards, defaults to the player start position
+
+        Returns:
+            The best Plan found within the budgets
+        """
+        start_time = time.perf_counter_ns()
+        deadline = None if self.budget_us is None else start_time + self.budget_us * 1000
+        target = np.array(target if target is not None else (0, Globals.world_bottom - 120), dtype=np.float64)
+        low, high = self._bounds()
+        gap = bullet_radii + self.player_radius
+        frames = self.segment_frames
+
+        # A bullet can only come within the safety margin of the player once the player
+        # and the bullet together covered the distance between them
+        origin = np.array([position[0], position[1]], dtype=np.float64)
+        distance = np.sqrt(((bullet_positions - origin) ** 2).sum(axis=1)) - gap - self.safety_margin
+        closing_speed = np.sqrt((bullet_velocities ** 2).sum(axis=1)) + self.player_speed
+        move_count = len(PLANNER_MOVES)
+
+        # Beam of partial plans
+        positions = np.array([[position[0], position[1]]], dtype=np.float64)
+        costs = np.zeros(1)
+        clearances = np.full(1, np.inf)
+        actions = np.zeros((1, 0), dtype=np.int64)
+
+        work = 0
+        for depth in range(self.segments):
+            t0 = depth * frames
+            relevant = np.flatnonzero(distance < (t0 + frames) * closing_speed)
+
+            # Stop before a segment that would exceed the work budget or overrun the time cap
+            segment_work = len(positions) * move_count * len(relevant)
+            if depth > 0:
+                if work + segment_work > self.max_work:
+                    break
+                if (deadline is not None and self.evaluation_ns is not None
+                        and time.perf_counter_ns() + segment_work * self.evaluation_ns > deadline):
+                    break
+            work += segment_work
+            segment_start = time.perf_counter_ns()
+
+            # Every move from every node, with the segment end clamped to the world
+            starts = np.repeat(positions, move_count, axis=0)
+            moves = np.tile(np.arange(move_count), len(positions))
+            ends = np.clip(starts + PLANNER_MOVES[moves] * self.player_speed * frames, low, high)
+            player_velocity = (ends - starts) / frames
+
+            segment_clearance = np.full(len(starts), np.inf)
+            if len(relevant):
+                velocity = bullet_velocities[relevant]
+                segment_clearance = self._segment_clearance(starts, player_velocity, frames,
+                                                            bullet_positions[relevant] + velocity * t0, velocity, gap[relevant])
+
+            hit = segment_clearance < 0
+            danger = np.maximum(0, self.safety_margin - segment_clearance) / self.safety_margin
+            segment_cost = np.where(hit, self.hit_cost * (self.segments - depth), danger ** 2)
+            segment_cost += self.target_weight * np.sqrt(((ends - target) ** 2).sum(axis=1)) / Globals.screen_height
+
+            node = np.repeat(np.arange(len(positions)), move_count)
+            costs = costs[node] + segment_cost
+            clearances = np.minimum(clearances[node], segment_clearance)
+            actions = np.column_stack((actions[node], moves))
+            positions = ends
+
+            # Keep the best partial plans (stable, so ties keep the move order)
+            if len(costs) > self.beam_width:
+                keep = np.argsort(costs, kind='stable')[:self.beam_width]
+                costs, clearances, actions, positions = costs[keep], clearances[keep], actions[keep], positions[keep]
+
+            # Cost per evaluation, from segments with enough work to outweigh the fixed overhead
+            if segment_work >= 1000:
+                measured = (time.perf_counter_ns() - segment_start) / segment_work
+                self.evaluation_ns = measured if self.evaluation_ns is None else 0.8 * self.evaluation_ns + 0.2 * measured
+
+        best = int(np.argmin(costs))
+        elapsed_us = (time.perf_counter_ns() - start_time) / 1000
+        return Plan(actions[best], float(costs[best]), float(clearances[best]), actions.shape[1], elapsed_us)
+
+class PlanCache:
+    """
+    Follows a LookaheadPlanner plan across frames instead of replanning every frame.
+    A new plan is needed when there is none yet, when replan_interval frames passed
+    (or the plan ran out), when a bullet the plan did not consider enters the threat
+    region (bullets that could reach the player within replan_interval frames), or when
+    the rest of the plan passes closer than min_clearance to the bullets in that region.
+    Counts how often and why it replanned.
+    """
+    REASONS = ('start', 'interval', 'threat', 'clearance')
+
+    def __init__(self, planner: LookaheadPlanner, replan_interval: int = 12, min_clearance: float = 4):
+        """
+        Args:
+            planner: Planner making the plans
+            replan_interval: Frames a plan is followed at most
+            min_clearance: Gap to the threat region bullets below which the plan is replaced
+        """
+        self.planner = planner
+        self.replan_interval = replan_interval
+        self.min_clearance = min_clearance
+        self.reset()
+        self.reset_stats()
+
+    def reset(self):
+        """Drop the current plan"""
+        self.plan = None
+        self.frame = 0              # Frames of the plan already followed
+        self._considered = set()    # Keys of the bullets the plan was made against
+
+    def get_state(self):
+        """Get the followed plan (restore it with set_state), the stats are not included"""
+        return (self.plan, self.frame, frozenset(self._considered))
+
+    def set_state(self, state):
+        """Restore a state captured with get_state"""
+        self.plan, self.frame, considered = state
+        self._considered = set(considered)
+
+    def reset_stats(self):
+        self.frames = 0             # Frames a direction was asked for
+        self.replans = 0
+        self.reasons = dict.fromkeys(self.REASONS, 0)
+
+    @property
+    def replan_rate(self) -> float:
+        """Fraction of frames that needed a new plan"""
+        return self.replans / self.frames if self.frames else 0.0
+
+    def threat_radius(self, bullet_radii: np.ndarray, bullet_velocities: np.ndarray) -> float:
+        """Distance within which bullets can reach the player before the next scheduled replan"""
+        return self.planner.reach(bullet_radii, bullet_velocities, self.replan_interval)
+
+    def replan_reason(self, position, threat_keys, threat_positions: np.ndarray, threat_velocities: np.ndarray,
+                      threat_radii: np.ndarray) -> str | None:
+        """
+        Why the plan has to be replaced this frame, None to keep following it
+
+        Args:
+            position: Player position (Vector2 or (x, y))
+            threat_keys: Hashable keys of the threat region bullets, matching the considered keys of set_plan()
+            threat_positions, threat_velocities, threat_radii: Arrays of the threat region bullets
+        """
+        if self.plan is None:
+            return 'start'
+        if self.frame >= min(self.replan_interval, self.planner.segment_frames * len(self.plan.actions)):
+            return 'interval'
+        if not self._considered.issuperset(threat_keys):
+            return 'threat'
+        segment, into = divmod(self.frame, self.planner.segment_frames)
+        clearance = self.planner.clearance(position, self.plan.actions[segment:], self.planner.segment_frames - into,
+                                           threat_positions, threat_velocities, threat_radii)
+        if clearance < self.min_clearance:
+            return 'clearance'
+        return None
+
+    def set_plan(self, plan: Plan, considered_keys, reason: str):
+        """Start following a new plan made against the bullets with the given keys"""
+        self.plan = plan
+        self.frame = 0
+        self._considered = set(considered_keys)
+        self.replans += 1
+        self.reasons[reason] += 1
+
+    def next_direction(self) -> np.ndarray:
+        """Unit move (or zero) of the current frame of the plan"""
+        direction = self.plan.direction(self.frame // self.planner.segment_frames)
+        self.frame += 1
+        self.frames += 1
+        return direction
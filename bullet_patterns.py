@@ -109,9 +109,9 @@ PATTERN_SEQUENCE = [
     "random_chaos"      # Level 10+
 ]
 
-def get_pattern_for_level(level: int) -> list:
-    # Randmize everything
-    rd = Random()  # Ensure consistent random patterns for each level
+def get_pattern_for_level(level: int, rng: Random = None) -> list:
+    # Randmize everything (pass a seeded rng for reproducible patterns)
+    rd = rng if rng is not None else Random()
     angle = 90 + rd.randint(-10, 10)  # Randomize angle slightly
     count = int(level * 1.5 + rd.randint(1, 3))  # Randomize count between 2 and 6
     speed = 4.5 + rd.uniform(-2.0, 2.0)  # Randomize speed slightly
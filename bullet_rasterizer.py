@@ -0,0 +1,168 @@
+"""
+BulletRasterizer - Draw huge numbers of bullets straight into a surface's pixel buffer
+"""
+import numpy as np
+import pygame
+from antialiased_draw import circle_coverage
+
+class BulletRasterizer:
+    """
+    Splats bullets from arrays into the pixels of a 32-bit surface with NumPy instead of one
+    blit per bullet, so the cost follows the number of covered pixels rather than the bullet
+    count. Each radius has a precomputed stamp (the pixel offsets and coverage of the
+    anti-aliased circle of CircleSpriteCache); bullets are grouped by radius and every group
+    is written with one scatter of mapped colors for the opaque pixels and one blend for the
+    edges. Only bullets crossing the surface border need per-pixel bounds checks.
+
+    Overlapping edges of a group are combined per pixel before blending and opaque pixels
+    win over edges within a group. Larger radii are drawn over smaller ones instead of in
+    entity order, which only shows where bullets of different colors overlap.
+    """
+
+    def __init__(self, max_pixels: int = 1 << 20):
+        """
+        Args:
+            max_pixels: Stamp pixels processed at once, bounds the temporary arrays
+        """
+        self.max_pixels = max_pixels
+        self._stamps = {}  # (radius, pitch) -> opaque and edge stamps, see _stamp()
+        self._owner = np.empty(0, dtype=np.int64)  # Per-pixel scratch of _blend()
+
+    def _stamp(self, radius: int, pitch: int):
+        """
+        (opaque, edge) stamps of a radius, each a tuple of x offsets, y offsets and buffer
+        index offsets for rows of pitch pixels; the edge stamp also has the coverage (0-1)
+        """
+        stamp = self._stamps.get((radius, pitch))
+        if stamp is None:
+            coverage = circle_coverage(radius)
+            center = radius + 1
+            opaque_x, opaque_y = np.nonzero(coverage == 255)
+            edge_x, edge_y = np.nonzero((coverage > 0) & (coverage < 255))
+            edge_alpha = coverage[edge_x, edge_y].astype(np.float32) / 255
+            opaque_x, opaque_y, edge_x, edge_y = opaque_x - center, opaque_y - center, edge_x - center, edge_y - center
+            stamp = self._stamps[(radius, pitch)] = ((opaque_x, opaque_y, opaque_y * pitch + opaque_x),
+                                                     (edge_x, edge_y, edge_y * pitch + edge_x, edge_alpha))
+        return stamp
+
+    def draw(self, surface, positions: np.ndarray, radii: np.ndarray, colors, camera_offset=None):
+        """
+        Draw bullets onto a 32-bit surface
+
+        Args:
+            positions: (N, 2) world positions
+            radii: (N,) radii
+            colors: (N, 3) RGB colors, or a single RGB color for all bullets
+            camera_offset: Added to the positions to get screen positions (Vector2 or (x, y))
+        """
+        if surface.get_bytesize() != 4:
+            raise ValueError(f"BulletRasterizer needs a 32-bit surface, got {surface.get_bitsize()} bits")
+        if len(positions) == 0:
+            return
+        width, height = surface.get_size()
+        pitch = surface.get_pitch() // 4
+        offset = (0, 0) if camera_offset is None else (camera_offset[0], camera_offset[1])
+        centers = np.trunc(positions + offset).astype(np.int64)  # Same rounding as the sprite blits
+        radii = radii.astype(np.int64)
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.uint8)[..., :3], (len(positions), 3))
+
+        # Skip the bullets whose stamp misses the surface
+        reach = radii + 1
+        visible = ((centers[:, 0] + reach >= 0) & (centers[:, 0] - reach < width) &
+                   (centers[:, 1] + reach >= 0) & (centers[:, 1] - reach < height))
+        if not visible.any():
+            return
+        centers, radii, colors, reach = centers[visible], radii[visible], colors[visible], reach[visible]
+        inside = ((centers[:, 0] - reach >= 0) & (centers[:, 0] + reach < width) &
+                  (centers[:, 1] - reach >= 0) & (centers[:, 1] + reach < height))
+
+        # Colors in the surface's pixel format, opaque if it has per-pixel alpha
+        shifts = surface.get_shifts()
+        mapped = ((colors[:, 0].astype(np.uint32) << shifts[0]) | (colors[:, 1].astype(np.uint32) << shifts[1])
+                  | (colors[:, 2].astype(np.uint32) << shifts[2]) | np.uint32(surface.get_masks()[3]))
+        bases = centers[:, 1] * pitch + centers[:, 0]
+
+        pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint32)
+        try:
+            order = np.argsort(radii, kind='stable')
+            group_radii, starts = np.unique(radii[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            for radius, start, end in zip(group_radii.tolist(), starts.tolist(), ends.tolist()):
+                opaque, edge = self._stamp(radius, pitch)
+                chunk = max(1, self.max_pixels // (len(opaque[0]) + len(edge[0])))
+                for first in range(start, end, chunk):
+                    group = order[first:min(first + chunk, end)]
+                    whole, border = group[inside[group]], group[~inside[group]]
+
+                    # Edges blend with what is already drawn, then the opaque pixels go on top
+                    if len(whole):
+                        self._blend(pixels, bases[whole][:, np.newaxis] + edge[2], colors[whole][:, np.newaxis, :], edge[3], shifts)
+                        pixels[bases[whole][:, np.newaxis] + opaque[2]] = mapped[whole][:, np.newaxis]
+                    if len(border):
+                        index, bullet, pixel = self._clip(border, bases, centers, edge, width, height)
+                        self._blend(pixels, index, colors[bullet], edge[3][pixel], shifts)
+                        index, bullet, _ = self._clip(border, bases, centers, opaque, width, height)
+                        pixels[index] = mapped[bullet]
+        finally:
+            del pixels  # Unlock the surface
+
+    @staticmethod
+    def _clip(bullets: np.ndarray, bases: np.ndarray, centers: np.ndarray, stamp, width: int, height: int):
+        """
+        Buffer indices of a stamp placed on bullets crossing the surface border, keeping the
+        pixels on the surface
+
+        Returns:
+            (buffer indices, bullet of each index, stamp pixel of each index)
+        """
+        x = centers[bullets, 0:1] + stamp[0]
+        y = centers[bullets, 1:2] + stamp[1]
+        bullet, pixel = np.nonzero((x >= 0) & (x < width) & (y >= 0) & (y < height))
+        return bases[bullets][bullet] + stamp[2][pixel], bullets[bullet], pixel
+
+    def _blend(self, pixels: np.ndarray, index: np.ndarray, colors: np.ndarray, alpha: np.ndarray, shifts):
+        """
+        Blend colors over the pixels at index with the given coverage (all broadcast against
+        index). Edges landing on the same pixel are combined as if they were layered: the pixel
+        keeps prod(1 - alpha) of its background and the rest is the coverage-weighted mean of
+        their colors (exact when they share a color).
+        """
+        index, alpha = np.broadcast_arrays(index, alpha)
+        colors = np.broadcast_to(colors, index.shape + (3,))
+        flat = index.ravel()
+        if len(flat) == 0:
+            return
+
+        # Find the shared pixels with a per-pixel scratch buffer instead of sorting all edges:
+        # an entry overwritten by a later one marks its pixel, then every entry on it is found
+        if len(self._owner) != len(pixels):
+            self._owner = np.empty(len(pixels), dtype=np.int64)
+        entries = np.arange(len(flat))
+        self._owner[flat] = entries
+        overwritten = self._owner[flat] != entries
+        shared_pixels = None
+        if overwritten.any():
+            self._owner[flat[overwritten]] = -1
+            shared = np.unravel_index(np.flatnonzero(self._owner[flat] == -1), index.shape)
+            shared_pixels, layer = np.unique(index[shared], return_inverse=True)
+            shared_alpha = alpha[shared].astype(np.float64)
+            coverage = np.bincount(layer, shared_alpha)
+            shared_colors = np.column_stack([np.bincount(layer, shared_alpha * colors[shared][:, channel])
+                                             for channel in range(3)]) / coverage[:, np.newaxis]
+            shared_keep = np.exp(np.bincount(layer, np.log1p(-shared_alpha)))
+            shared_background = pixels[shared_pixels]
+
+        # Every edge over the background, then the shared pixels again with their combined layer
+        pixels[index] = self._over(pixels[index], colors, 1 - alpha, shifts)
+        if shared_pixels is not None:
+            pixels[shared_pixels] = self._over(shared_background, shared_colors, shared_keep, shifts)
+
+    @staticmethod
+    def _over(background: np.ndarray, colors: np.ndarray, keep: np.ndarray, shifts) -> np.ndarray:
+        """Mapped pixels of colors over a background that keeps the given fraction of it"""
+        blended = background & ~np.uint32(sum(0xFF << shift for shift in shifts[:3]))
+        for channel in range(3):
+            under = ((background >> shifts[channel]) & 0xFF).astype(np.float32)
+            over = colors[..., channel] + (under - colors[..., channel]) * keep + 0.5
+            blended |= over.astype(np.uint32) << shifts[channel]
+        return blended
@@ -2,10 +2,11 @@ import pygame
 from pygame.math import Vector2
 from globals import Globals
 from entity import Entity, EntityTag
-from antialiased_draw import draw_antialiased_circle
+from antialiased_draw import circle_sprites
 
 class Bullet(Entity):
     """Base bullet class for enemy bullets"""
+    linear_motion = True
     def __init__(self, entity_manager, position, velocity, radius=12, color=(255, 51, 0)):
         super().__init__(entity_manager, position=position, tag=EntityTag.ENEMY_BULLET)
         self.velocity = velocity
@@ -18,19 +19,19 @@ class Bullet(Entity):
         
     def draw(self, surface, camera_offset=None):
         """Draw the bullet with camera offset"""
-        # Calculate screen position with camera offset
-        if camera_offset is None:
-            camera_offset = Vector2(0, 0)
-        
-        screen_pos = self.position + camera_offset
-        
-        # Draw with anti-aliasing
-        draw_antialiased_circle(surface, self.color, 
-                               (screen_pos.x, screen_pos.y), 
-                               self.radius)
+        surface.blit(*self.get_blit(camera_offset))
+    
+    def get_blit(self, camera_offset=None):
+        """Pre-rendered anti-aliased circle at the screen position"""
+        x, y = self.position
+        if camera_offset is not None:
+            x += camera_offset.x
+            y += camera_offset.y
+        return circle_sprites.blit_args(self.color, (x, y), self.radius)
 
 class PlayerBullet(Entity):
     """Player bullet class"""
+    linear_motion = True
     def __init__(self, entity_manager, position):
         super().__init__(entity_manager, position=position, tag=EntityTag.PLAYER_BULLET)
         self.velocity = Vector2(0, -Globals.bullet_speed)  # Upward movement
@@ -43,13 +44,12 @@ class PlayerBullet(Entity):
         
     def draw(self, surface, camera_offset=None):
         """Draw the bullet with camera offset"""
-        # Calculate screen position with camera offset
-        if camera_offset is None:
-            camera_offset = Vector2(0, 0)
-        
-        screen_pos = self.position + camera_offset
-        
-        # Draw with anti-aliasing
-        draw_antialiased_circle(surface, self.color, 
-                               (screen_pos.x, screen_pos.y), 
-                               self.radius)
\ No newline at end of file
+        surface.blit(*self.get_blit(camera_offset))
+    
+    def get_blit(self, camera_offset=None):
+        """Pre-rendered anti-aliased circle at the screen position"""
+        x, y = self.position
+        if camera_offset is not None:
+            x += camera_offset.x
+            y += camera_offset.y
+        return circle_sprites.blit_args(self.color, (x, y), self.radius)
@@ -0,0 +1,140 @@
+"""
+DangerField - Coarse cost map of where bullets are and will shortly be
+"""
+import math
+import numpy as np
+from globals import Globals
+
+class DangerField:
+    """
+    Grid over the world bounds holding how dangerous each cell is. Every bullet is sampled
+    at its current position and at a few predicted positions along its velocity, with later
+    samples weighing less. Samples are splatted bilinearly onto the cell centers, one layer
+    per reach (bullet radius + player radius + margin, rounded up to a multiple of reach_step
+    so the layers and kernels stay few whatever the radii), and each layer is spread with a
+    kernel of 1 - (distance / reach)^2, so the bullet count only costs one bincount.
+    """
+
+    def __init__(self, cell_size: float = 8, horizon: int = 30, samples: int = 3,
+                 player_radius: float = 2, margin: float = 8, reach_step: float = 2):
+        """
+        Args:
+            cell_size: Size of a cell in world units
+            horizon: Frames ahead of the last predicted position
+            samples: Number of predicted positions per bullet (besides the current one)
+            player_radius: Player collision radius added to every bullet's reach
+            margin: Extra distance added to every bullet's reach
+            reach_step: Reaches are rounded up to a multiple of this, in world units
+        """
+        self.cell_size = cell_size
+        self.horizon = horizon
+        self.samples = samples
+        self.player_radius = player_radius
+        self.margin = margin
+        self.reach_step = reach_step
+        self.left, self.top = Globals.world_left, Globals.world_top
+        self.cols = math.ceil(Globals.screen_width / cell_size)
+        self.rows = math.ceil(Globals.screen_height / cell_size)
+        self.cost = np.zeros((self.rows, self.cols))
+        self._gradient = None
+        self._kernels = {}
+
+        # Sample times and weights: now = 1, fading linearly towards the horizon
+        self.times = np.linspace(0, horizon, samples + 1)
+        self.weights = 1 - self.times / (horizon * (1 + 1 / samples)) if samples else np.ones(1)
+
+    def build(self, positions: np.ndarray, velocities: np.ndarray, radii: np.ndarray) -> 'DangerField':
+        """
+        Rebuild the map from bullet arrays
+
+        Args:
+            positions, velocities, radii: (B, 2), (B, 2) and (B,) bullet arrays
+        """
+        self.cost.fill(0)
+        self._gradient = None
+        if len(positions) == 0:
+            return self
+
+        # One sample per (bullet, time), in cell-center units
+        points = (positions[:, np.newaxis, :] + velocities[:, np.newaxis, :] * self.times[np.newaxis, :, np.newaxis]).reshape(-1, 2)
+        grid = (points - (self.left, self.top)) / self.cell_size - 0.5
+        reach = np.ceil((radii + self.player_radius + self.margin) / self.reach_step) * self.reach_step / self.cell_size
+        reach = np.repeat(reach, len(self.times))
+        weight = np.tile(self.weights, len(positions))
+        inside = ((grid[:, 0] > -reach - 1) & (grid[:, 0] < self.cols + reach) &
+                  (grid[:, 1] > -reach - 1) & (grid[:, 1] < self.rows + reach))
+        grid, reach, weight = grid[inside], reach[inside], weight[inside]
+        if len(grid) == 0:
+            return self
+
+        # Splat every sample bilinearly onto the 4 surrounding cell centers, one padded layer per
+        # reach step in use, in a single bincount
+        reaches, layer = np.unique(reach, return_inverse=True)
+        pad = math.ceil(reaches[-1]) + 1
+        height, width = self.rows + 2 * pad, self.cols + 2 * pad
+        corner = np.floor(grid)
+        fraction = grid - corner
+        base = layer * (height * width) + (corner[:, 1].astype(np.int64) + pad) * width + corner[:, 0].astype(np.int64) + pad
+        cells = np.concatenate((base, base + 1, base + width, base + width + 1))
+        weights = np.concatenate((weight * (1 - fraction[:, 0]) * (1 - fraction[:, 1]),
+                                  weight * fraction[:, 0] * (1 - fraction[:, 1]),
+                                  weight * (1 - fraction[:, 0]) * fraction[:, 1],
+                                  weight * fraction[:, 0] * fraction[:, 1]))
+        layers = np.bincount(cells, weights, len(reaches) * height * width).reshape(len(reaches), height, width)
+
+        # Spread each layer with its falloff kernel by adding shifted copies
+        for reach, splat in zip(reaches, layers):
+            kernel = self._kernel(reach)
+            span = kernel.shape[0] // 2
+            for (dy, dx), value in np.ndenumerate(kernel):
+                if value > 0:
+                    top, left = pad + dy - span, pad + dx - span
+                    self.cost += value * splat[top:top + self.rows, left:left + self.cols]
+        return self
+
+    def _kernel(self, reach: float) -> np.ndarray:
+        """Falloff of one sample at the cell centers around it, for a reach in cells"""
+        kernel = self._kernels.get(reach)
+        if kernel is None:
+            steps = np.arange(-math.ceil(reach), math.ceil(reach) + 1)
+            distance2 = steps[:, np.newaxis] ** 2 + steps[np.newaxis, :] ** 2
+            kernel = self._kernels[reach] = np.maximum(0, 1 - distance2 / reach ** 2)
+        return kernel
+
+    def _bilinear(self, grid: np.ndarray, x: float, y: float) -> float:
+        """Bilinear interpolation of a per-cell array at a world position"""
+        gx = min(max((x - self.left) / self.cell_size - 0.5, 0), self.cols - 1)
+        gy = min(max((y - self.top) / self.cell_size - 0.5, 0), self.rows - 1)
+        col, row = min(int(gx), self.cols - 2), min(int(gy), self.rows - 2)
+        fx, fy = gx - col, gy - row
+        top = grid[row, col] * (1 - fx) + grid[row, col + 1] * fx
+        bottom = grid[row + 1, col] * (1 - fx) + grid[row + 1, col + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def value_at(self, x: float, y: float) -> float:
+        """Danger at a world position"""
+        return float(self._bilinear(self.cost, x, y))
+
+    def gradient_at(self, x: float, y: float):
+        """(d/dx, d/dy) of the danger at a world position, per world unit"""
+        if self._gradient is None:
+            d_dy, d_dx = np.gradient(self.cost, self.cell_size)
+            self._gradient = (d_dx, d_dy)
+        return float(self._bilinear(self._gradient[0], x, y)), float(self._bilinear(self._gradient[1], x, y))
+
+    def window(self, x: float, y: float, size: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        Copy the size x size cells centered on a world position, zero outside the world
+
+        Args:
+            out: Optional (size, size) array to write into
+        """
+        out = np.zeros((size, size)) if out is None else out
+        out.fill(0)
+        col0 = int((x - self.left) // self.cell_size) - size // 2
+        row0 = int((y - self.top) // self.cell_size) - size // 2
+        src_cols = slice(max(col0, 0), min(col0 + size, self.cols))
+        src_rows = slice(max(row0, 0), min(row0 + size, self.rows))
+        if src_cols.start < src_cols.stop and src_rows.start < src_rows.stop:
+            out[src_rows.start - row0:src_rows.stop - row0, src_cols.start - col0:src_cols.stop - col0] = self.cost[src_rows, src_cols]
+        return out
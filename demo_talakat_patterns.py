@@ -71,6 +71,7 @@ def main():
         
         # Update entities
         entity_manager.update_all()
+        entity_manager.clock.tick()
         
         # Clean up off-screen bullets
         active_entities = entity_manager.get_active_entities()
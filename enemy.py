@@ -1,12 +1,11 @@
 import pygame
 from pygame.math import Vector2
 import math
-import random
 from globals import Globals
 from entity import Entity, EntityTag
 from bullets import Bullet  # Enemy bullets
 from tools import seconds_to_frames
-from antialiased_draw import draw_antialiased_circle, draw_antialiased_rect
+from antialiased_draw import draw_circle_sprite, draw_antialiased_rect
 from shape_renderer import ShapeRenderer
 from talakat import TalakatInterpreter
 from bullet_patterns import get_pattern_for_level
@@ -14,7 +13,7 @@ from bullet_patterns import get_pattern_for_level
 class Enemy(Entity):
     def __init__(self, entity_manager):
         # Random starting X position above screen
-        start_x = random.uniform(Globals.world_left + 90, Globals.world_right - 90)  # Don't start too close to edges
+        start_x = entity_manager.rng.uniform(Globals.world_left + 90, Globals.world_right - 90)  # Don't start too close to edges
         super().__init__(entity_manager, position=Vector2(start_x, Globals.world_top - 90), tag=EntityTag.ENEMY)  # Start above screen
         entity_manager.add_entity(self)  # Add to entity manager
         self.radius = 24  # Scaled up for native resolution
@@ -34,10 +33,25 @@ class Enemy(Entity):
         
         # Bullet spawning system with Talakat
         self.shoot_timer = 0
-        self.talakat_interpreter = TalakatInterpreter()
-        self.current_pattern = get_pattern_for_level(1)  # Start with level 1 pattern
+        self.talakat_interpreter = TalakatInterpreter(entity_manager.rng)
+        self.current_pattern = get_pattern_for_level(1, entity_manager.rng)  # Start with level 1 pattern
         self.pattern_level = 1
         
+    def reset(self):
+        """Return to the freshly spawned state with the level 1 pattern, reusing this object"""
+        rng = self.get_entity_manager().rng
+        start_x = rng.uniform(Globals.world_left + 90, Globals.world_right - 90)
+        self.position = Vector2(start_x, Globals.world_top - 90)
+        self.active = True
+        self.health = self.max_health
+        self.is_entering = True
+        self.invincible = True
+        self.invincible_timer = seconds_to_frames(1.0)
+        self.shoot_timer = 0
+        self.current_pattern = get_pattern_for_level(1, rng)
+        self.pattern_level = 1
+        self.talakat_interpreter.reset()
+        
     def update(self):
         """Update enemy position and state"""
         
@@ -56,7 +70,7 @@ class Enemy(Entity):
                 self.is_entering = False
         else:
             # Normal side-to-side movement once in position
-            self.position.x += math.sin(pygame.time.get_ticks() / 1000) * self.speed
+            self.position.x += math.sin(self.get_entity_manager().clock.time) * self.speed
         
         # Keep within bounds (centered coordinate system)
         self.position.x = max(Globals.world_left + self.radius, min(self.position.x, Globals.world_right - self.radius))
@@ -88,9 +102,7 @@ class Enemy(Entity):
             color = (255, 255, 200)
         
         # Draw main enemy body with anti-aliasing
-        draw_antialiased_circle(surface, color, 
-                               (screen_pos.x, screen_pos.y), 
-                               self.radius)
+        draw_circle_sprite(surface, color, (screen_pos.x, screen_pos.y), self.radius)
         
         # Arc health bar around the enemy (always visible)
         health_percentage = self.health / self.max_health
@@ -158,7 +170,7 @@ class Enemy(Entity):
         """Update the bullet pattern based on game level"""
         if level != self.pattern_level:
             self.pattern_level = level
-            self.current_pattern = get_pattern_for_level(level)
+            self.current_pattern = get_pattern_for_level(level, self.get_entity_manager().rng)
             # Reset interpreter when changing patterns
             self.talakat_interpreter.reset()
     
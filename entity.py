@@ -12,6 +12,9 @@ class EntityTag:
 
 class Entity(ABC):
     """Base class for all game entities"""
+    # True when update() only does position += velocity and the entity is only ever deactivated
+    # through deactivate(), so EntityManager can track it in arrays (see LinearTagStore)
+    linear_motion = False
     
     def __init__(self, entity_manager, position=None, tag=EntityTag.PLAYER):
         self.position = position if position else Vector2(0, 0)
@@ -19,6 +22,7 @@ class Entity(ABC):
         self.active = True  # Whether the entity should be updated/drawn
         self.radius = 1  # Default collision radius
         self.color = (255, 255, 255)  # Default white color
+        self.serial = None  # Unique number given by the EntityManager, a stable key for the entity
         # Required reference to entity manager (weak reference to avoid circular dependencies)
         self._entity_manager_ref = weakref.ref(entity_manager)
         
@@ -32,6 +36,13 @@ class Entity(ABC):
         """Draw the entity. Must be implemented by subclasses."""
         pass
     
+    def get_blit(self, camera_offset=None):
+        """
+        (surface, destination) that draws the entity with a single blit, or None when it
+        needs draw(). Entities with a blit are batched into Surface.blits() by EntityManager.draw_all().
+        """
+        return None
+    
     def get_entity_manager(self):
         """Get the entity manager"""
         return self._entity_manager_ref()  # Returns None if manager was garbage collected
@@ -43,6 +54,10 @@ class Entity(ABC):
     def deactivate(self):
         """Mark entity as inactive (for removal)"""
         self.active = False
+        if self.linear_motion:
+            entity_manager = self.get_entity_manager()
+            if entity_manager is not None:
+                entity_manager.entity_deactivated(self)
     
     def get_center(self):
         """Get the center position of the entity"""
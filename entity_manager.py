@@ -1,22 +1,175 @@
 from typing import List, Dict, Any
-from entity import Entity
+import random
+import numpy as np
+from danger_field import DangerField
+from entity import Entity, EntityTag
+from globals import Globals
+from spatial_grid import SpatialGrid
+from tools import SimulationClock
+
+_NO_VELOCITY = (0.0, 0.0)
+
+def _entity_rows(entities) -> np.ndarray:
+    """One packed row per entity: x, y, vx, vy, radius"""
+    return np.array([(entity.position.x, entity.position.y,
+                      *getattr(entity, 'velocity', _NO_VELOCITY), entity.radius)
+                     for entity in entities], dtype=np.float64).reshape(len(entities), 5)
+
+class TagArrays:
+    """Array snapshot of the active entities with one tag (float64, exact copies of the Vector2 values)"""
+    def __init__(self, entities, rows: np.ndarray = None, colors: np.ndarray = None):
+        """
+        Args:
+            entities: The entities, a list or an object array
+            rows: Their (N, 5) packed rows (see _entity_rows), read from the entities if not given
+            colors: Their (N, 3) uint8 colors, read from the entities on first use if not given
+        """
+        self.entities = entities
+        rows = _entity_rows(entities) if rows is None else rows
+        self.positions = rows[:, 0:2]
+        self.velocities = rows[:, 2:4]
+        self.radii = rows[:, 4]
+        self._grid = None
+        self._colors = colors
+
+    def __len__(self):
+        return len(self.entities)
+
+    @property
+    def colors(self) -> np.ndarray:
+        """(N, 3) uint8 RGB colors, built on first use"""
+        if self._colors is None:
+            self._colors = np.array([entity.color[:3] for entity in self.entities], dtype=np.uint8).reshape(len(self.entities), 3)
+        return self._colors
+    
+    def get_grid(self, cell_size: float) -> SpatialGrid:
+        """Spatial grid over the positions, built on first use"""
+        if self._grid is None or self._grid.cell_size != cell_size:
+            self._grid = SpatialGrid(cell_size, (Globals.world_left, Globals.world_right, Globals.world_top, Globals.world_bottom))
+            self._grid.build(self.positions)
+        return self._grid
+
+class LinearTagStore:
+    """
+    Rows of the entities of one tag that move linearly (Entity.linear_motion), kept in entity
+    order and up to date without reading the entities back: spawned entities are appended,
+    deactivated and removed ones are dropped in one compaction, and a frame of updates is one
+    position += velocity over the rows of the entities that were updated. Float64 addition is
+    exactly what Vector2 does, so the rows stay identical to the entities.
+    """
+
+    def __init__(self, entities=()):
+        entities = list(entities)
+        self.count = len(entities)
+        capacity = max(64, self.count)
+        self.entities = np.empty(capacity, dtype=object)
+        self.entities[:self.count] = entities
+        self.rows = np.zeros((capacity, 5))
+        self.rows[:self.count] = _entity_rows(entities)
+        self.colors = np.zeros((capacity, 3), dtype=np.uint8)
+        self.colors[:self.count] = np.array([entity.color[:3] for entity in entities], dtype=np.uint8).reshape(-1, 3)
+        self.serials = np.zeros(capacity, dtype=np.int64)  # Increasing, rows are in the order entities were added
+        self.serials[:self.count] = [entity.serial for entity in entities]
+        self.keep = np.ones(capacity, dtype=bool)  # False for rows waiting to be compacted out
+        self.dropped = 0
+        self.moved = 0     # Rows updated in the current update_all(), a prefix of the rows
+        self.advanced = 0  # Rows whose update is applied to the arrays
+        self.snapshot = None
+
+    def append(self, entity: Entity):
+        if self.count == len(self.rows):
+            self._grow()
+        row = self.count
+        self.entities[row] = entity
+        self.rows[row] = (entity.position.x, entity.position.y, entity.velocity.x, entity.velocity.y, entity.radius)
+        self.colors[row] = entity.color[:3]
+        self.serials[row] = entity.serial
+        self.keep[row] = True
+        self.count += 1
+        self.snapshot = None
+
+    def _grow(self):
+        capacity = 2 * len(self.rows)
+        for name in ('entities', 'rows', 'colors', 'serials', 'keep'):
+            array = getattr(self, name)
+            grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+
+    def drop(self, entity: Entity):
+        """Mark the row of a deactivated or removed entity for the next compaction"""
+        row = int(np.searchsorted(self.serials[:self.count], entity.serial))
+        if row < self.count and self.serials[row] == entity.serial and self.keep[row]:
+            self.keep[row] = False
+            self.dropped += 1
+            self.snapshot = None
+
+    def compact(self):
+        """Remove the dropped rows"""
+        if self.dropped:
+            keep = np.flatnonzero(self.keep[:self.count])
+            for name in ('entities', 'rows', 'colors', 'serials'):
+                array = getattr(self, name)
+                array[:len(keep)] = array[keep]
+            self.entities[len(keep):self.count] = None
+            self.keep[:self.count] = True
+            self.count = len(keep)
+            self.dropped = 0
+            self.snapshot = None
+
+    def advance(self):
+        """Apply the updates of the rows moved so far"""
+        if self.advanced < self.moved:
+            rows = self.rows[self.advanced:self.moved]
+            rows[:, 0:2] += rows[:, 2:4]
+            self.advanced = self.moved
+            self.snapshot = None
+
+    def get_snapshot(self, updating: bool) -> TagArrays:
+        """TagArrays of the kept rows, views of the store valid until its next change"""
+        self.advance()
+        if self.snapshot is None:
+            if self.dropped and updating:
+                # Rows have to stay put while update_all() counts the moved ones, copy instead
+                keep = np.flatnonzero(self.keep[:self.count])
+                return TagArrays(self.entities[keep], self.rows[keep], self.colors[keep])
+            self.compact()
+            self.snapshot = TagArrays(self.entities[:self.count], self.rows[:self.count], self.colors[:self.count])
+        return self.snapshot
 
 class EntityManager:
     """Manages all entities in the game"""
     
-    def __init__(self):
+    def __init__(self, clock: SimulationClock = None, rng: random.Random = None):
+        self.clock = clock if clock is not None else SimulationClock()  # Simulation time for entities
+        self.rng = rng if rng is not None else random.Random()  # Gameplay randomness for entities
         self.entities: List[Entity] = []
         self._entities_by_tag: Dict[int, List[Entity]] = {}
+        self._tag_arrays: Dict[int, TagArrays] = {}  # Rebuilt after entities are added, removed or updated
+        self._linear: Dict[int, LinearTagStore] = {}  # Incremental arrays of the tags with linear motion
+        self._updating = False
+        self.grid_cell_size = 32  # Cell size of the spatial grids behind query_radius()
+        self.danger_field = DangerField()  # Enemy bullet cost map behind get_danger_field()
+        self._danger_source = None  # Tag snapshot the danger field was built from
+        self.next_serial = 0  # Serial of the next added entity, never reused (unlike id())
     
     def add_entity(self, entity: Entity):
         """Add an entity to the manager"""
         if entity not in self.entities:
             self.entities.append(entity)
+            entity.serial = self.next_serial
+            self.next_serial += 1
             
             # Add to tag-based lookup
             if entity.tag not in self._entities_by_tag:
                 self._entities_by_tag[entity.tag] = []
             self._entities_by_tag[entity.tag].append(entity)
+            self._tag_arrays.pop(entity.tag, None)
+            if entity.linear_motion and entity.active:
+                store = self._linear.get(entity.tag)
+                if store is None:
+                    store = self._linear[entity.tag] = LinearTagStore()
+                store.append(entity)
     
     def remove_entity(self, entity: Entity):
         """Remove an entity from the manager"""
@@ -27,24 +180,121 @@ class EntityManager:
             if entity.tag in self._entities_by_tag:
                 if entity in self._entities_by_tag[entity.tag]:
                     self._entities_by_tag[entity.tag].remove(entity)
+            self._tag_arrays.pop(entity.tag, None)
+            self.entity_deactivated(entity)
+    
+    def entity_deactivated(self, entity: Entity):
+        """Drop an entity with linear motion from its tag's arrays (called by Entity.deactivate)"""
+        store = self._linear.get(entity.tag)
+        if store is not None:
+            store.drop(entity)
+    
+    def set_entities(self, entities: List[Entity]):
+        """Replace all entities at once, keeping their order (and serials, new ones get one)"""
+        self.entities = list(entities)
+        self._entities_by_tag = {}
+        for entity in self.entities:
+            self._entities_by_tag.setdefault(entity.tag, []).append(entity)
+            if entity.serial is None:
+                entity.serial = self.next_serial
+                self.next_serial += 1
+        self._tag_arrays.clear()
+        self._linear = {tag: LinearTagStore(entity for entity in entities if entity.active)
+                        for tag, entities in self._entities_by_tag.items() if entities[0].linear_motion}
     
     def get_entities_by_tag(self, tag: int) -> List[Entity]:
         """Get all entities with a specific tag"""
         return self._entities_by_tag.get(tag, [])
     
+    def get_tag_arrays(self, tag: int) -> TagArrays:
+        """
+        Get positions, velocities and radii of the active entities with a tag as arrays.
+        The snapshot is built once and reused until entities are added, removed or updated.
+        Tags whose entities move linearly (Entity.linear_motion) are not read back from the
+        entities but kept up to date incrementally, see LinearTagStore.
+        """
+        store = self._linear.get(tag)
+        if store is not None:
+            return store.get_snapshot(self._updating)
+        arrays = self._tag_arrays.get(tag)
+        if arrays is None:
+            entities = [entity for entity in self.get_entities_by_tag(tag) if entity.is_active()]
+            arrays = self._tag_arrays[tag] = TagArrays(entities)
+        return arrays
+    
+    def query_radius(self, tag: int, center, radius: float) -> np.ndarray:
+        """
+        Find the active entities with a tag whose position is closer than radius to center,
+        through a spatial grid over the tag snapshot
+
+        Returns:
+            Sorted indices into get_tag_arrays(tag)
+        """
+        grid = self.get_tag_arrays(tag).get_grid(self.grid_cell_size)
+        _, index = grid.query_pairs(np.array([[center.x, center.y]]), radius)
+        return np.sort(index)
+    
+    def get_danger_field(self) -> DangerField:
+        """
+        Get the danger field of the enemy bullets. It is built from the enemy bullet
+        snapshot and reused for as long as that snapshot is.
+        """
+        bullets = self.get_tag_arrays(EntityTag.ENEMY_BULLET)
+        if self._danger_source is not bullets:
+            self.danger_field.build(bullets.positions, bullets.velocities, bullets.radii)
+            self._danger_source = bullets
+        return self.danger_field
+    
     def get_active_entities(self) -> List[Entity]:
         """Get all active entities"""
         return [entity for entity in self.entities if entity.is_active()]
     
     def update_all(self):
         """Update all active entities"""
-        for entity in self.get_active_entities():
-            entity.update()
+        # The rows of a linear tag are then exactly its active entities, in update order
+        for store in self._linear.values():
+            store.compact()
+            store.moved = store.advanced = 0
+        
+        self._updating = True
+        try:
+            for entity in self.get_active_entities():
+                store = self._linear.get(entity.tag)
+                if store is not None:
+                    # Only moves itself, its row is advanced when the arrays are read next
+                    entity.update()
+                    store.moved += 1
+                    continue
+                # Snapshots taken by an earlier entity this frame would miss this one's movement
+                if self._tag_arrays:
+                    self._tag_arrays.clear()
+                entity.update()
+        finally:
+            self._updating = False
+        for store in self._linear.values():
+            store.advance()
+        self._tag_arrays.clear()
     
-    def draw_all(self, surface, camera_offset=None):
-        """Draw all active entities with camera offset"""
+    def draw_all(self, surface, camera_offset=None, skip_tag: int = None):
+        """
+        Draw all active entities with camera offset, in order. Consecutive entities that
+        provide a blit (see Entity.get_blit) are drawn with one Surface.blits() call.
+        Entities with skip_tag are left out (e.g. when they are rasterized separately).
+        """
+        blits = []
         for entity in self.get_active_entities():
+            if entity.tag == skip_tag:
+                continue
+            blit = entity.get_blit(camera_offset)
+            if blit is not None:
+                blits.append(blit)
+                continue
+            if blits:
+                surface.blits(blits, doreturn=False)
+                blits.clear()
             entity.draw(surface, camera_offset)
+        if blits:
+            surface.blits(blits, doreturn=False)
     
     def cleanup_inactive(self):
         """Remove all inactive entities"""
@@ -56,6 +306,8 @@ class EntityManager:
         """Remove all entities"""
         self.entities.clear()
         self._entities_by_tag.clear()
+        self._tag_arrays.clear()
+        self._linear.clear()
     
     def count_active_entities(self) -> int:
         """Get the count of all active entities"""
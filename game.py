@@ -1,4 +1,5 @@
 from typing import Any
+import random
 import pygame
 from pygame.math import Vector2
 import numpy as np
@@ -7,9 +8,14 @@ from enemy import Enemy
 from globals import Globals
 from entity import EntityTag
 from entity_manager import EntityManager
+from bullets import Bullet, PlayerBullet
 from antialiased_draw import draw_antialiased_circle
 from font_manager import font_manager
 from background import ScrollingBackground
+from player_input import ActionInput
+from tools import SimulationClock
+from bullet_rasterizer import BulletRasterizer
+from obs_encoders import make_obs_encoder
 import gymnasium as gym
 from typing import Optional
 
@@ -21,11 +27,68 @@ class GameState:
     PAUSED = 3
     GAME_OVER = 4
 
+class GameSnapshot:
+    """Compact copy of the simulation state of a Game, see Game.clone_state()"""
+    def __init__(self, frame, rng_state, game_values, player_values, enemy_values, interpreter_state,
+                 plan_cache_state, entity_tags, entity_serials, next_serial, enemy_bullets, enemy_bullet_colors,
+                 player_bullets, scroll_offset):
+        self.frame = frame
+        self.rng_state = rng_state
+        self.game_values = game_values              # score, level, game_over, win, spawn_enemy_timer, damage dealt/recieved
+        self.player_values = player_values          # Player fields, see Game.clone_state()
+        self.enemy_values = enemy_values            # Enemy fields, see Game.clone_state()
+        self.interpreter_state = interpreter_state  # TalakatInterpreter.get_state()
+        self.plan_cache_state = plan_cache_state    # PlanCache.get_state() of the player's planner bot
+        self.entity_tags = entity_tags              # Tag of every entity in update order (int8 array)
+        self.entity_serials = entity_serials        # Serial of every entity in update order (int64 array)
+        self.next_serial = next_serial              # EntityManager.next_serial
+        self.enemy_bullets = enemy_bullets          # (N, 5) float64 array: x, y, vx, vy, radius
+        self.enemy_bullet_colors = enemy_bullet_colors
+        self.player_bullets = player_bullets        # (M, 2) float64 array: x, y
+        self.scroll_offset = scroll_offset
+
 class Game(gym.Env):
-    def __init__(self):
-        # Initialize pygame and joystick early
-        pygame.init()
-        pygame.joystick.init()
+    metadata = {"render_modes": ["rgb_array"], "render_fps": 60}
+
+    def __init__(self, headless=False, obs_mode='stats', render_mode=None, render_size=None, grayscale=False,
+                 frame_skip=1, raster_bullets=False):
+        """
+        Args:
+            headless: Run without pygame initialization, devices or background animation.
+                The player is driven by the actions passed to step()
+            obs_mode: 'stats' for damage dealt and lives only, 'bullet_grid' to also observe
+                a player-centered bullet grid (see BulletGridEncoder), 'nearest_bullets' to also
+                observe features of the most threatening bullets (see NearestBulletEncoder),
+                'danger_field' to also observe the danger field around the player (see DangerFieldEncoder)
+            render_mode: None or 'rgb_array' to draw into an off-screen surface in render()
+            render_size: (width, height) to downsample rendered frames to with OpenCV, None for full size
+            grayscale: Convert rendered frames to single-channel grayscale with OpenCV
+            frame_skip: Number of simulation frames each step() advances with the same action
+            raster_bullets: Draw enemy bullets with the NumPy BulletRasterizer instead of sprite
+                blits, for stages with very large bullet counts. They are drawn after all other
+                entities: the player and enemy stay underneath as in entity order (they come
+                first), but player bullets end up below every enemy bullet instead of interleaved
+        """
+        self.headless = headless
+        self.frame_skip = frame_skip
+        if render_mode not in (None, 'rgb_array'):
+            raise ValueError(f"Unsupported render_mode: {render_mode}")
+        self.render_mode = render_mode
+        self.render_size = render_size
+        self.grayscale = grayscale
+        self._render_surface = None
+        self._frame_buffers = None  # Reused OpenCV outputs (resized, converted)
+        self.bullet_rasterizer = BulletRasterizer() if raster_bullets else None
+        self.obs_mode = obs_mode
+        self.obs_encoder = make_obs_encoder(obs_mode)
+        self.action_input = ActionInput()  # Player input in headless mode, set by step()
+        self.rng = random.Random()  # All gameplay randomness (enemy spawns, patterns, RANDOM tokens)
+        self.player = None  # Entities are created by the first _reset() and reused afterwards
+        
+        if not headless:
+            # Initialize pygame and joystick early
+            pygame.init()
+            pygame.joystick.init()
         
         self._reset()
         
@@ -33,10 +96,13 @@ class Game(gym.Env):
         super().__init__()
 
         self.action_space = gym.spaces.Discrete(10)
-        self.observation_space = gym.spaces.Dict({
+        spaces = {
             'total_damage_dealt': gym.spaces.Box(low=0, high=float('inf'), shape=(1,), dtype=np.float32),
             'player_hp': gym.spaces.Discrete(4)  # 0 to 3 lives
-        })
+        }
+        if self.obs_encoder is not None:
+            spaces[self.obs_mode] = self.obs_encoder.observation_space
+        self.observation_space = gym.spaces.Dict(spaces)
 
 
     def _get_obs(self):
@@ -45,6 +111,8 @@ class Game(gym.Env):
             'total_damage_dealt': self.damage_dealt,
             'player_hp': self.player.lives
         }
+        if self.obs_encoder is not None:
+            obs[self.obs_mode] = self.obs_encoder.encode(self.entity_manager, self.player.position).copy()
         return obs
 
     def _get_info(self):
@@ -52,6 +120,8 @@ class Game(gym.Env):
 
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None): # type: ignore
         super().reset(seed=seed, options=options)
+        if seed is not None:
+            self.rng.seed(seed)
         self._reset()
 
         observation = self._get_obs()
@@ -59,17 +129,31 @@ class Game(gym.Env):
         return observation, info
         
 
-    def _reset(self):
-        """Reset the game state"""
+    def _create_world(self):
+        """Create the clock, entity manager, background and entities"""
+        # Simulation clock, advanced once per simulated frame and shared with all entities
+        self.clock = SimulationClock()
+        
         # Initialize entity manager
-        self.entity_manager = EntityManager()
+        self.entity_manager = EntityManager(self.clock, self.rng)
         
         # Initialize scrolling background
         self.background = ScrollingBackground()
         
         # Create entities with entity manager reference
-        self.player = Player(self.entity_manager)
+        self.player = Player(self.entity_manager, self.action_input if self.headless else None)
         self.enemy = Enemy(self.entity_manager)  # Back to single enemy
+
+    def _reset(self):
+        """Reset the game state, reusing the objects of the previous episode"""
+        if self.player is None:
+            self._create_world()
+        else:
+            self.clock.reset()
+            self.background.scroll_offset = 0
+            self.player.reset()
+            self.enemy.reset()
+            self.entity_manager.set_entities([self.player, self.enemy])
                 
         # Game state
         self.score = 0
@@ -83,20 +167,94 @@ class Game(gym.Env):
         # Set initial enemy pattern level
         self.enemy.set_pattern_level(self.level)
 
+    def clone_state(self) -> GameSnapshot:
+        """
+        Capture the simulation state (entities, interpreter, RNG, timers) with plain values
+        and arrays, so it can be restored any number of times with restore_state()
+        """
+        player, enemy = self.player, self.enemy
+        entities = self.entity_manager.entities
+        enemy_bullets = [entity for entity in entities if entity.tag == EntityTag.ENEMY_BULLET]
+        player_bullets = [entity for entity in entities if entity.tag == EntityTag.PLAYER_BULLET]
+
+        return GameSnapshot(
+            frame=self.clock.frame,
+            rng_state=self.rng.getstate(),
+            game_values=(self.score, self.level, self.game_over, self.win, self.spawn_enemy_timer,
+                         self.damage_dealt, self.damage_recieved),
+            player_values=(player.position.x, player.position.y, player.active, player.lives,
+                           player.invincible, player.invincible_timer, player.shoot_cooldown,
+                           player.bot_enabled, player.bot_desired_direction.x, player.bot_desired_direction.y),
+            enemy_values=(enemy.position.x, enemy.position.y, enemy.active, enemy.health, enemy.is_entering,
+                          enemy.invincible, enemy.invincible_timer, enemy.shoot_timer,
+                          enemy.current_pattern, enemy.pattern_level),
+            interpreter_state=enemy.talakat_interpreter.get_state(),
+            plan_cache_state=player.bot_plan_cache.get_state(),
+            entity_tags=np.array([entity.tag for entity in entities], dtype=np.int8),
+            entity_serials=np.array([entity.serial for entity in entities], dtype=np.int64),
+            next_serial=self.entity_manager.next_serial,
+            enemy_bullets=np.array([(b.position.x, b.position.y, b.velocity.x, b.velocity.y, b.radius)
+                                    for b in enemy_bullets], dtype=np.float64).reshape(-1, 5),
+            enemy_bullet_colors=[b.color for b in enemy_bullets],
+            player_bullets=np.array([(b.position.x, b.position.y) for b in player_bullets],
+                                    dtype=np.float64).reshape(-1, 2),
+            scroll_offset=self.background.scroll_offset,
+        )
+
+    def restore_state(self, snapshot: GameSnapshot):
+        """Return the game to a state captured with clone_state()"""
+        self.clock.frame = snapshot.frame
+        self.rng.setstate(snapshot.rng_state)
+        (self.score, self.level, self.game_over, self.win, self.spawn_enemy_timer,
+         self.damage_dealt, self.damage_recieved) = snapshot.game_values
+        self.background.scroll_offset = snapshot.scroll_offset
+
+        player = self.player
+        (x, y, player.active, player.lives, player.invincible, player.invincible_timer, player.shoot_cooldown,
+         player.bot_enabled, dx, dy) = snapshot.player_values
+        player.position = Vector2(x, y)
+        player.bot_desired_direction = Vector2(dx, dy)
+        player.bot_plan_cache.set_state(snapshot.plan_cache_state)
+
+        enemy = self.enemy
+        (x, y, enemy.active, enemy.health, enemy.is_entering, enemy.invincible, enemy.invincible_timer,
+         enemy.shoot_timer, enemy.current_pattern, enemy.pattern_level) = snapshot.enemy_values
+        enemy.position = Vector2(x, y)
+        enemy.talakat_interpreter.set_state(snapshot.interpreter_state)
+
+        # Recreate the bullets and put every entity back in its original update order
+        manager = self.entity_manager
+        enemy_bullets = iter([Bullet(manager, Vector2(x, y), Vector2(vx, vy), radius, color)
+                              for (x, y, vx, vy, radius), color
+                              in zip(snapshot.enemy_bullets.tolist(), snapshot.enemy_bullet_colors)])
+        player_bullets = iter([PlayerBullet(manager, Vector2(x, y)) for x, y in snapshot.player_bullets.tolist()])
+        by_tag = {EntityTag.PLAYER: iter([player]), EntityTag.ENEMY: iter([enemy]),
+                  EntityTag.ENEMY_BULLET: enemy_bullets, EntityTag.PLAYER_BULLET: player_bullets}
+        entities = [next(by_tag[tag]) for tag in snapshot.entity_tags.tolist()]
+        for entity, serial in zip(entities, snapshot.entity_serials.tolist()):
+            entity.serial = serial  # The plan cache knows the bullets by serial
+        manager.next_serial = snapshot.next_serial
+        manager.set_entities(entities)
+
     def step(self, action: Any):
         """Perform a game step based on the action"""
         if self.game_over:
             return self._get_obs(), 0, True, False, self._get_info()
         
-        # Update game state
-        self.update()
+        # Apply the action (drives the player in headless mode)
+        self.action_input.set_action(action)
         
-        # Calculate reward
+        # Repeat the action for frame_skip simulation frames, stopping when the game ends
         reward = 0
-        if self.win:
-            reward = 100
-        elif self.game_over:
-            reward = -100
+        for _ in range(self.frame_skip):
+            self._simulate_frame()
+            if self.game_over:
+                reward += 100 if self.win else -100
+                break
+        
+        # Background animation only once per step (purely visual, skipped when headless)
+        if not self.headless:
+            self.background.update()
         
         observation = self._get_obs()
         terminated = self.game_over
@@ -111,9 +269,14 @@ class Game(gym.Env):
         if self.game_over:
             return
         
-        # Update background animation
-        self.background.update()
+        # Update background animation (purely visual, skipped when headless)
+        if not self.headless:
+            self.background.update()
         
+        self._simulate_frame()
+
+    def _simulate_frame(self):
+        """Advance the simulation by one frame, without any visual-only work"""
         # Update entity manager (handles all active entities)
         self.entity_manager.update_all()
 
@@ -146,7 +309,56 @@ class Game(gym.Env):
 
          # Clean up inactive entities
         self.entity_manager.cleanup_inactive()
+        
+        self.clock.tick()
     
+    def render(self):
+        """
+        Draw the game off-screen and return the frame as an (H, W, 3) uint8 array, or
+        (H, W) with grayscale. Without resizing or grayscale the array is a zero-copy view
+        of the surface pixels; with them it is a buffer reused by every call. Either way the
+        frame is only valid until the next render(), copy it to keep it.
+        """
+        if self.render_mode != 'rgb_array':
+            return None
+
+        # A view kept by the caller keeps the surface locked, draw on a fresh one instead
+        if self._render_surface is None or self._render_surface.get_locked():
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self._render_surface = pygame.Surface((Globals.screen_width, Globals.screen_height), 0, 32)
+        self.draw(self._render_surface)
+
+        if self.render_size is None and not self.grayscale:
+            return pygame.surfarray.pixels3d(self._render_surface).transpose(1, 0, 2)
+        return self._convert_frame(self._render_surface)
+
+    def _convert_frame(self, surface):
+        """Resize and/or grayscale a surface with OpenCV into the reused frame buffers"""
+        import cv2
+
+        # Raw 32-bit pixels as an (H, W, 4) view, byte order given by the surface masks
+        height, width = surface.get_height(), surface.get_width()
+        pixels = pygame.surfarray.pixels2d(surface).T.view(np.uint8).reshape(height, width, 4)
+        bgr = surface.get_shifts()[0] == 16
+        out_width, out_height = self.render_size if self.render_size is not None else (width, height)
+
+        if self._frame_buffers is None:
+            resized = np.empty((out_height, out_width, 4), dtype=np.uint8) if self.render_size is not None else None
+            converted = np.empty((out_height, out_width) if self.grayscale else (out_height, out_width, 3), dtype=np.uint8)
+            self._frame_buffers = (resized, converted)
+        resized, converted = self._frame_buffers
+
+        if resized is not None:
+            cv2.resize(pixels, (out_width, out_height), dst=resized, interpolation=cv2.INTER_AREA)
+            pixels = resized
+        if self.grayscale:
+            code = cv2.COLOR_BGRA2GRAY if bgr else cv2.COLOR_RGBA2GRAY
+        else:
+            code = cv2.COLOR_BGRA2RGB if bgr else cv2.COLOR_RGBA2RGB
+        cv2.cvtColor(pixels, code, dst=converted)
+        return converted
+
     def draw(self, screen):
         """Draw everything to the screen"""
         # Draw scrolling background
@@ -156,7 +368,13 @@ class Game(gym.Env):
         camera_offset = Vector2(Globals.half_width, Globals.half_height)
         
         # Draw all entities using entity manager with camera offset
-        self.entity_manager.draw_all(screen, camera_offset)
+        if self.bullet_rasterizer is None:
+            self.entity_manager.draw_all(screen, camera_offset)
+        else:
+            # Enemy bullets go on top, splatted from their arrays (z-order, see raster_bullets)
+            self.entity_manager.draw_all(screen, camera_offset, skip_tag=EntityTag.ENEMY_BULLET)
+            bullets = self.entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET)
+            self.bullet_rasterizer.draw(screen, bullets.positions, bullets.radii, bullets.colors, camera_offset)
             
         # Draw UI
         self._draw_ui(screen)
@@ -184,8 +402,14 @@ class Game(gym.Env):
         active_count = len(self.entity_manager.get_active_entities())
         entities_text = font_manager.render_text(f"Entities: {active_count}", small_font_size, Globals.ui_text_color)
         surface.blit(entities_text, (15, Globals.screen_height - 35))
-        
-        
+
+        # Replan rate of the planner bot (bottom left, above the entity count)
+        if self.player.bot_enabled and self.player.bot_mode == 'planner':
+            replan_rate = self.player.bot_plan_cache.replan_rate
+            replan_text = font_manager.render_text(f"Replans: {replan_rate:.0%}", small_font_size, Globals.ui_text_color)
+            surface.blit(replan_text, (15, Globals.screen_height - 60))
+
+
         # Game over screen
         if self.game_over:
             overlay = pygame.Surface((Globals.screen_width, Globals.screen_height))
@@ -211,12 +435,12 @@ class Game(gym.Env):
         """Handle pygame events"""
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_r and self.game_over:
-                self.__init__()  # Reset the game
+                self.reset()
                 
         elif event.type == pygame.JOYBUTTONDOWN:
             # Handle gamepad restart (Start button is usually button 7)
             if event.button == 7 and self.game_over:  # Start button
-                self.__init__()  # Reset the game
+                self.reset()
     
     def test_collisions(self, entities_a, entities_b, collision_handler):
         """
@@ -255,13 +479,10 @@ class Game(gym.Env):
             self.damage_recieved += 1
 
     def spawn_enemy(self):
-        """Spawn a new enemy and add it to the entity manager"""
+        """Respawn the enemy with the pattern of the next level"""
         self.level += 1
-        self.enemy = Enemy(self.entity_manager)
+        self.enemy.reset()  # Reuse the defeated enemy, it is still in the entity manager
         
         # Set the enemy's bullet pattern based on current level
         self.enemy.set_pattern_level(self.level)
-        
-        # Add the new enemy to the entity manager
-        self.entity_manager.add_entity(self.enemy)
             
\ No newline at end of file
@@ -1,18 +1,44 @@
 import pygad
+from pygame.math import Vector2
+from globals import Globals
+from talakat import TokenType
+from talakat_evaluator import TalakatEvaluator
 
 target_difficulty = 0
+evaluation_frames = 600  # 10 seconds at 60 FPS
+evaluation_cell_size = 32  # Free space grid cell size, 4x fewer cells and half the samples of the default 16
+
+
+def solution_to_pattern(solution):  # solution = [count, angle, spread, speed, size, loop, wait]
+    count, angle, spread, speed, size, loop, wait = solution
+    return [
+        (TokenType.LOOP, int(loop)),
+        (TokenType.ANGLE, angle),
+        (TokenType.COUNT, int(count)),
+        (TokenType.SPEED, speed),
+        (TokenType.SIZE, size),
+        (TokenType.WAIT, int(wait)),
+        (TokenType.SPREAD, spread),
+    ]
 
 
 def fitness_func(ga_instance, solution, solution_idx):  # solution = [count, angle, spread, speed, size, loop, wait]
-    bullets_distribution = 0
-    min_bullets = 0
-    # evaluate these by initializing a game with these parameters
-    # return -(difficulty_eval(bullets_distribution, min_bullets) - target_difficulty) ** 2
-    return sum(-solution)
+    # evaluate the pattern from the enemy's firing position, spawn log only (no frames)
+    evaluator = TalakatEvaluator(solution_to_pattern(solution), Vector2(0, Globals.world_top + 90),
+                                 bounds=(Globals.world_left, Globals.world_right, Globals.world_top, Globals.world_bottom))
+    evaluator.simulate(evaluation_frames, record_frames=False)
+    # difficulty_eval() only needs the safe fraction while there is a safe path
+    metrics = evaluator.get_difficulty_metrics(cell_size=evaluation_cell_size, stop_when_blocked=True)
+    return -(difficulty_eval(metrics) - target_difficulty) ** 2
 
 
-def difficulty_eval(bullets_distribution, min_bullets):
-    return 0
+def difficulty_eval(metrics):
+    # 0 = the whole play area stays free, 1 = no way to survive
+    if not metrics:
+        return 0
+    if not metrics['safe_path']:
+        return 1
+    return 1 - metrics['mean_safe_fraction']
 
 
 fitness_function = fitness_func
@@ -0,0 +1,190 @@
+"""
+Observation encoders - Turn the bullet field around the player into fixed-shape arrays
+"""
+import math
+import numpy as np
+import gymnasium as gym
+from entity import EntityTag
+
+class BulletGridEncoder:
+    """
+    Rasterizes enemy bullets into a player-centered grid with three channels:
+    occupancy (1 where any bullet covers the cell) and the mean x/y velocity of the
+    bullets covering it. A cell counts as covered when its center is within the bullet
+    radius plus half a cell. Everything is scattered with NumPy, no pygame drawing.
+    """
+
+    def __init__(self, grid_size: int = 32, cell_size: float = 12.0):
+        """
+        Args:
+            grid_size: Number of cells along each side of the grid
+            cell_size: Size of a cell in world units
+        """
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.half_extent = grid_size * cell_size / 2
+        self.observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=(3, grid_size, grid_size), dtype=np.float32)
+        self.buffer = np.zeros((3, grid_size, grid_size), dtype=np.float32)
+        self._counts = self.buffer[0].reshape(-1)
+
+    def encode(self, entity_manager, player_position) -> np.ndarray:
+        """
+        Encode the enemy bullets around the player
+
+        Args:
+            entity_manager: EntityManager holding the bullets
+            player_position: Center of the grid in world coordinates
+
+        Returns:
+            (3, grid_size, grid_size) array. This is the encoder's buffer and is overwritten
+            by the next call, copy it to keep it.
+        """
+        bullets = entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET)
+        self.buffer.fill(0)
+
+        relative = bullets.positions - np.array((player_position.x, player_position.y))
+        reach = bullets.radii + self.cell_size / 2
+        visible = (np.abs(relative) < (self.half_extent + reach)[:, np.newaxis]).all(axis=1)
+        if not visible.any():
+            return self.buffer
+        relative, reach, velocities = relative[visible], reach[visible], bullets.velocities[visible]
+
+        # Window of cells around each bullet, large enough for the biggest one
+        span = math.ceil(reach.max() / self.cell_size)
+        steps = np.arange(-span, span + 1)
+        grid = (relative + self.half_extent) / self.cell_size
+        cols = np.floor(grid[:, 0]).astype(np.int64)[:, np.newaxis] + steps
+        rows = np.floor(grid[:, 1]).astype(np.int64)[:, np.newaxis] + steps
+
+        # Separable squared distances from each window cell center to the bullet
+        dx2 = ((cols + 0.5) - grid[:, 0:1]) ** 2
+        dy2 = ((rows + 0.5) - grid[:, 1:2]) ** 2
+        covered = dy2[:, :, np.newaxis] + dx2[:, np.newaxis, :] < ((reach / self.cell_size) ** 2)[:, np.newaxis, np.newaxis]
+        covered &= ((rows >= 0) & (rows < self.grid_size))[:, :, np.newaxis]
+        covered &= ((cols >= 0) & (cols < self.grid_size))[:, np.newaxis, :]
+
+        bullet_index, row_step, col_step = np.nonzero(covered)
+        cells = rows[bullet_index, row_step] * self.grid_size + cols[bullet_index, col_step]
+        cell_count = self.grid_size * self.grid_size
+        counts = np.bincount(cells, minlength=cell_count)
+        occupied = counts > 0
+        self.buffer[1].reshape(-1)[occupied] = np.bincount(cells, velocities[bullet_index, 0], cell_count)[occupied] / counts[occupied]
+        self.buffer[2].reshape(-1)[occupied] = np.bincount(cells, velocities[bullet_index, 1], cell_count)[occupied] / counts[occupied]
+        self._counts[occupied] = 1
+        return self.buffer
+
+class NearestBulletEncoder:
+    """
+    Describes the k enemy bullets closest to (or most threatening to) the player as a
+    fixed-shape feature array, one row per bullet ordered from most to least dangerous.
+    Rows past the number of bullets are zero, with the present column at 0.
+
+    'distance' ranks bullets by the gap between their edge and the player right now,
+    'threat' by the smallest gap they will reach within horizon frames if they keep their
+    velocity and the player stands still.
+    """
+    FEATURES = ('dx', 'dy', 'vx', 'vy', 'radius', 'time_to_closest', 'present')
+
+    def __init__(self, k: int = 16, rank: str = 'threat', horizon: float = 60.0):
+        """
+        Args:
+            k: Number of bullets described
+            rank: 'distance' or 'threat'
+            horizon: Frames looked ahead by the time to closest approach
+        """
+        if rank not in ('distance', 'threat'):
+            raise ValueError(f"Unknown rank: {rank}")
+        self.k = k
+        self.rank = rank
+        self.horizon = horizon
+        self.observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=(k, len(self.FEATURES)), dtype=np.float32)
+        self.buffer = np.zeros((k, len(self.FEATURES)), dtype=np.float32)
+
+    def encode(self, entity_manager, player_position) -> np.ndarray:
+        """
+        Encode the enemy bullets around the player
+
+        Args:
+            entity_manager: EntityManager holding the bullets
+            player_position: Player position in world coordinates
+
+        Returns:
+            (k, len(FEATURES)) array. This is the encoder's buffer and is overwritten by the
+            next call, copy it to keep it.
+        """
+        bullets = entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET)
+        self.buffer.fill(0)
+        if len(bullets) == 0:
+            return self.buffer
+
+        relative = bullets.positions - np.array((player_position.x, player_position.y))
+        velocities = bullets.velocities
+
+        # Time at which each bullet passes closest to the player, clamped to [0, horizon]
+        speed2 = (velocities ** 2).sum(axis=1)
+        closing = -(relative * velocities).sum(axis=1)
+        time_to_closest = np.clip(closing / np.maximum(speed2, 1e-6), 0, self.horizon)
+
+        if self.rank == 'threat':
+            closest = relative + velocities * time_to_closest[:, np.newaxis]
+            score = np.sqrt((closest ** 2).sum(axis=1)) - bullets.radii
+        else:
+            score = np.sqrt((relative ** 2).sum(axis=1)) - bullets.radii
+
+        # Partial sort for the k best, then order just those
+        count = min(self.k, len(bullets))
+        nearest = np.argpartition(score, count - 1)[:count] if count < len(bullets) else np.arange(count)
+        nearest = nearest[np.argsort(score[nearest], kind='stable')]
+
+        self.buffer[:count, 0:2] = relative[nearest]
+        self.buffer[:count, 2:4] = velocities[nearest]
+        self.buffer[:count, 4] = bullets.radii[nearest]
+        self.buffer[:count, 5] = time_to_closest[nearest]
+        self.buffer[:count, 6] = 1
+        return self.buffer
+
+class DangerFieldEncoder:
+    """
+    Player-centered window of the entity manager's shared danger field (see DangerField).
+    Reads the map built once per frame instead of rasterizing the bullets again; the cell
+    size is the field's.
+    """
+
+    def __init__(self, grid_size: int = 32):
+        """
+        Args:
+            grid_size: Number of field cells along each side of the window
+        """
+        self.grid_size = grid_size
+        self.observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(grid_size, grid_size), dtype=np.float32)
+        self.buffer = np.zeros((grid_size, grid_size), dtype=np.float32)
+
+    def encode(self, entity_manager, player_position) -> np.ndarray:
+        """
+        Encode the danger around the player
+
+        Args:
+            entity_manager: EntityManager holding the bullets
+            player_position: Center of the window in world coordinates
+
+        Returns:
+            (grid_size, grid_size) array. This is the encoder's buffer and is overwritten
+            by the next call, copy it to keep it.
+        """
+        field = entity_manager.get_danger_field()
+        return field.window(player_position.x, player_position.y, self.grid_size, self.buffer)
+
+# Encoder class of every obs_mode besides 'stats'
+OBS_ENCODERS = {
+    'bullet_grid': BulletGridEncoder,
+    'nearest_bullets': NearestBulletEncoder,
+    'danger_field': DangerFieldEncoder,
+}
+
+def make_obs_encoder(obs_mode: str):
+    """Encoder of an obs_mode with default settings, None for 'stats' (damage dealt and lives only)"""
+    if obs_mode == 'stats':
+        return None
+    if obs_mode not in OBS_ENCODERS:
+        raise ValueError(f"Unknown obs_mode: {obs_mode}")
+    return OBS_ENCODERS[obs_mode]()
@@ -2,6 +2,7 @@ import pygame
 import sys
 from game import Game
 from globals import Globals
+from replay import ReplayRecorder
 
 def main():
     # Initialize pygame
@@ -21,10 +22,26 @@ def main():
     # Clock for controlling frame rate
     clock = pygame.time.Clock()
     
-    # Create game instance
-    game = Game()
+    # Optional trained policy playing instead of the keyboard: python play.py --policy model.zip
+    policy = None
+    if "--policy" in sys.argv:
+        from policy_bot import PolicyController, attach_policy, set_inference_threads
+        set_inference_threads(1)
+        policy = PolicyController.load(sys.argv[sys.argv.index("--policy") + 1])
+    
+    # Create game instance (--raster-bullets draws enemy bullets with the NumPy rasterizer)
+    raster_bullets = "--raster-bullets" in sys.argv
+    game = Game(obs_mode=policy.obs_mode, raster_bullets=raster_bullets) if policy else Game(raster_bullets=raster_bullets)
+    if policy:
+        attach_policy(game, policy)
     #game.start()
     
+    # Optional recording of the first game: python play.py --record session.nhr
+    recorder = None
+    if "--record" in sys.argv:
+        record_path = sys.argv[sys.argv.index("--record") + 1]
+        recorder = ReplayRecorder(game)
+    
     # Game loop
     running = True
     while running:
@@ -43,6 +60,11 @@ def main():
         screen.fill(Globals.bg_color)
                 
         game.update()
+        if recorder:
+            recorder.after_update(game)
+            if game.game_over:
+                save_recording(recorder, game, record_path)
+                recorder = None
         game.draw(screen)
         
         # Update the display
@@ -51,9 +73,19 @@ def main():
         # Control frame rate (60 FPS)
         clock.tick(60)
     
+    if recorder:
+        save_recording(recorder, game, record_path)
+    if policy:
+        print(f"Policy latency: {policy.latency_stats()}")
+    
     # Clean up
     pygame.quit()
     sys.exit()
 
+def save_recording(recorder, game, path):
+    replay = recorder.stop(game)
+    replay.save(path)
+    print(f"Saved {len(replay)} frames to {path}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
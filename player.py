@@ -6,10 +6,74 @@ from entity import Entity, EntityTag
 from tools import seconds_to_frames
 from antialiased_draw import draw_antialiased_circle
 from shape_renderer import ShapeRenderer
+from player_input import DeviceInput
+from bot_planner import LookaheadPlanner, PlanCache
 import math
+import numpy as np
+
+def bot_cast_directions(cast_count: int) -> np.ndarray:
+    """(cast_count, 2) unit directions evenly spread around the circle, starting at +x"""
+    return np.array([(math.cos(math.radians(i * 360 / cast_count)), math.sin(math.radians(i * 360 / cast_count)))
+                     for i in range(cast_count)])
+
+def score_directions(positions: np.ndarray, directions: np.ndarray, cast_width: float, cast_length: float,
+                     bullet_positions: np.ndarray, bullet_velocities: np.ndarray, bullet_radii: np.ndarray,
+                     position_index: np.ndarray = None, bullet_index: np.ndarray = None) -> np.ndarray:
+    """
+    Bot score of every (position, direction) box cast, in one broadcast over
+    (bullet pairs x directions). Higher is better.
+
+    Safety starts at 100. Each bullet whose current position, or its position 10 frames
+    ahead, comes within cast_width / 2 + radius of the cast center costs 50, 25 or 10
+    points (bullet closer than 20, 40 or further). Cast ends near the screen edge cost 30.
+    Tactical points: +20 for ending in the lower half, +10 for ending near the center column.
+
+    Args:
+        positions: (A, 2) cast origins
+        directions: (D, 2) unit cast directions
+        cast_width: Width of the box casts
+        cast_length: Length of the box casts
+        bullet_positions, bullet_velocities, bullet_radii: (B, 2), (B, 2) and (B,) bullet arrays
+        position_index, bullet_index: (position, bullet) pairs to test, every pair when omitted
+
+    Returns:
+        (A, D) array of scores
+    """
+    if position_index is None:
+        position_index = np.repeat(np.arange(len(positions)), len(bullet_positions))
+        bullet_index = np.tile(np.arange(len(bullet_positions)), len(positions))
+
+    cast_end = positions[:, np.newaxis, :] + directions[np.newaxis, :, :] * cast_length  # (A, D, 2)
+    scores = np.full(cast_end.shape[:2], 100.0)
+
+    if len(bullet_index):
+        origin = positions[position_index]
+        bullet_now = bullet_positions[bullet_index]
+        bullet_future = bullet_now + bullet_velocities[bullet_index] * 10  # Look ahead 10 frames
+        cast_center = (origin[:, np.newaxis, :] + cast_end[position_index]) * 0.5  # (P, D, 2)
+        to_bullet = np.sqrt(((bullet_now[:, np.newaxis, :] - cast_center) ** 2).sum(axis=2))
+        to_bullet_future = np.sqrt(((bullet_future[:, np.newaxis, :] - cast_center) ** 2).sum(axis=2))
+        intersects = np.minimum(to_bullet, to_bullet_future) < (cast_width * 0.5 + bullet_radii[bullet_index])[:, np.newaxis]
+
+        distance = np.sqrt(((bullet_now - origin) ** 2).sum(axis=1))
+        penalty = np.where(distance < 20, 50, np.where(distance < 40, 25, 10))
+        slots = (position_index[:, np.newaxis] * len(directions) + np.arange(len(directions))).ravel()
+        scores -= np.bincount(slots, weights=(intersects * penalty[:, np.newaxis]).ravel(),
+                              minlength=scores.size).reshape(scores.shape)
+
+    # Prefer the lower half for shooting upward, and being somewhat centered horizontally
+    scores += np.where(cast_end[:, :, 1] > 0, 20, 0)
+    scores += np.where(np.abs(cast_end[:, :, 0]) < Globals.half_width // 3, 10, 0)
+
+    # Avoid screen edges
+    margin = 10
+    off_edge = ((cast_end[:, :, 0] < Globals.world_left + margin) | (cast_end[:, :, 0] > Globals.world_right - margin) |
+                (cast_end[:, :, 1] < Globals.world_top + margin) | (cast_end[:, :, 1] > Globals.world_bottom - margin))
+    scores -= np.where(off_edge, 30, 0)
+    return scores
 
 class Player(Entity):
-    def __init__(self, entity_manager):
+    def __init__(self, entity_manager, input_source=None):
         super().__init__(entity_manager, position=Vector2(0, Globals.world_bottom - 120), tag=EntityTag.PLAYER)  # Center-bottom
         entity_manager.add_entity(self)  # Add to entity manager
         self.radius = 2  # Scaled up for native resolution
@@ -22,9 +86,8 @@ class Player(Entity):
         # Shooting system
         self.shoot_cooldown = 0
         
-        # Gamepad support
-        self.gamepad = None
-        self._init_gamepad()
+        # Input source (keyboard + gamepad unless one is given, e.g. ActionInput for headless envs)
+        self.input_source = input_source if input_source is not None else DeviceInput()
         
         # Bot AI system
         self.bot_enabled = False  # Bot is enabled by default
@@ -32,58 +95,41 @@ class Player(Entity):
         self.bot_cast_width = 8   # Width of box cast
         self.bot_cast_length = 30  # Length of box cast
         self.bot_desired_direction = Vector2(0, 0)  # Current bot movement direction
-        
-    def _init_gamepad(self):
-        """Initialize gamepad if available"""
-        # Initialize joystick subsystem if not already initialized
-        if not pygame.get_init() or not pygame.joystick.get_init():
-            pygame.joystick.init()
-            
-        if pygame.joystick.get_count() > 0:
-            self.gamepad = pygame.joystick.Joystick(0)
-            self.gamepad.init()
-    
-    def _get_gamepad_input(self):
-        """Get current gamepad input state"""
-        if not self.gamepad:
-            return {}
-            
-        gamepad_input = {}
-        
-        # Left stick for movement
-        gamepad_input['left_stick_x'] = self.gamepad.get_axis(0)
-        gamepad_input['left_stick_y'] = self.gamepad.get_axis(1)
-        
-        # Buttons for shooting (A button or right trigger)
-        try:
-            gamepad_input['shoot'] = (self.gamepad.get_button(0) or  # A button
-                                    self.gamepad.get_axis(5) > 0.5)  # Right trigger
-        except pygame.error:
-            # Handle cases where controller doesn't have all expected inputs
-            gamepad_input['shoot'] = False
-            
-        return gamepad_input
+        self._bot_directions = None  # Cached unit cast directions
+        self.bot_mode = 'casts'  # 'casts' (box cast heuristic), 'planner' (LookaheadPlanner) or 'gradient' (danger field)
+        self.bot_planner = LookaheadPlanner(self.speed, self.radius)
+        self.bot_plan_cache = PlanCache(self.bot_planner)  # Plan followed by the planner mode, with replan stats
+        self.bot_gradient_gain = 20  # Scale of the downhill danger field step in the gradient mode
+        self.bot_gradient_pull = 0.3  # Weight of the pull towards the shooting position in the gradient mode
+        
+    def reset(self):
+        """Return to the starting state, keeping the input source"""
+        self.position = Vector2(0, Globals.world_bottom - 120)
+        self.active = True
+        self.invincible = False
+        self.invincible_timer = 0
+        self.lives = 3
+        self.shoot_cooldown = 0
+        self.bot_enabled = False
+        self.bot_desired_direction = Vector2(0, 0)
+        self.bot_plan_cache.reset()
         
     def update(self):
         """Update player position and state"""
         
         # Get current input state
-        keys = pygame.key.get_pressed()
-        gamepad_input = self._get_gamepad_input()
+        player_input = self.input_source.poll()
         
-        # Check for bot toggle (B key)
-        if keys[pygame.K_b] and not hasattr(self, '_b_key_pressed'):
+        # Check for bot toggle
+        if player_input.toggle_bot:
             self.bot_enabled = not self.bot_enabled
-            self._b_key_pressed = True
             print(f"Bot {'enabled' if self.bot_enabled else 'disabled'}")
-        elif not keys[pygame.K_b]:
-            self._b_key_pressed = False
         
         # Update based on control mode
         if self.bot_enabled:
             self._update_bot()
         else:
-            self._update_human(keys, gamepad_input)
+            self._update_human(player_input)
         
         # Update invincibility
         if self.invincible:
@@ -119,29 +165,28 @@ class Player(Entity):
                                            outline_width=0, antialiased=True)
         
     def hit(self):
-        """Handle player being hit"""
-        if not self.invincible:
-            self.lives -= 1
-            self.invincible = True
-            self.invincible_timer = seconds_to_frames(1.5)  # 1.5 seconds of invincibility
-            
-            # Reset position when hit (center-bottom)
-            self.position = Vector2(0, 80)
+        """Handle player being hit, returns whether it cost a life"""
+        if self.invincible:
+            return False
+        
+        self.lives -= 1
+        self.invincible = True
+        self.invincible_timer = seconds_to_frames(1.5)  # 1.5 seconds of invincibility
+        
+        # Reset position when hit (center-bottom)
+        self.position = Vector2(0, 80)
+        return True
     
     def get_center(self):
         """Get the center position for bullet spawning"""
         return self.position
     
-    def _handle_shooting(self, keys, gamepad_input):
+    def _handle_shooting(self, shoot_pressed):
         """Handle player shooting logic"""
         # Update shoot cooldown
         if self.shoot_cooldown > 0:
             self.shoot_cooldown -= 1
         
-        # Check for shooting input
-        shoot_pressed = (keys[pygame.K_SPACE] or 
-                        gamepad_input.get('shoot', False))
-        
         # Create bullet if shooting and cooldown is ready
         if shoot_pressed and self.shoot_cooldown <= 0:
             from bullets import PlayerBullet
@@ -155,43 +200,17 @@ class Player(Entity):
                 entity_manager.add_entity(bullet)
                 self.shoot_cooldown = seconds_to_frames(0.167)  # ~0.167 seconds between shots
     
-    def _update_human(self, keys, gamepad_input):
-        """Update player with human input"""
-        # Player movement - keyboard
-        move_x = 0
-        move_y = 0
-        
-        if keys[pygame.K_w] or keys[pygame.K_UP]:
-            move_y -= 1
-        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-            move_y += 1
-        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-            move_x -= 1
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-            move_x += 1
-            
-        # Gamepad movement
-        if gamepad_input:
-            # Left stick for movement
-            stick_x = gamepad_input.get('left_stick_x', 0)
-            stick_y = gamepad_input.get('left_stick_y', 0)
-            
-            # Apply deadzone
-            deadzone = 0.15
-            if abs(stick_x) > deadzone:
-                move_x += stick_x
-            if abs(stick_y) > deadzone:
-                move_y += stick_y
-        
+    def _update_human(self, player_input):
+        """Update player with human (or env action) input"""
         # Apply movement
-        movement = Vector2(move_x, move_y) * self.speed
+        movement = Vector2(player_input.move_x, player_input.move_y) * self.speed
         self.position += movement
             
         # Keep player within bounds
         self._clamp_to_bounds()
         
         # Handle shooting
-        self._handle_shooting(keys, gamepad_input)
+        self._handle_shooting(player_input.shoot)
     
     def _update_bot(self):
         """Update player with bot AI"""
@@ -201,11 +220,17 @@ class Player(Entity):
             return
         
         # Get all enemy bullets
-        enemy_bullets = entity_manager.get_entities_by_tag(EntityTag.ENEMY_BULLET)
-        enemies = entity_manager.get_entities_by_tag(EntityTag.ENEMY)
-        
-        # Perform directional box casts to find safe movement
-        safe_direction = self._find_safe_direction(enemy_bullets, enemies)
+        enemy_bullets = entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET)
+        
+        if self.bot_mode == 'planner':
+            # Follow the first move of a lookahead plan
+            safe_direction = self._plan_direction(enemy_bullets)
+        elif self.bot_mode == 'gradient':
+            # Slide down the shared danger field
+            safe_direction = self._gradient_direction()
+        else:
+            # Perform directional box casts to find safe movement
+            safe_direction = self._find_safe_direction(enemy_bullets)
         
         # Apply bot movement
         if safe_direction.length() > 0:
@@ -218,29 +243,66 @@ class Player(Entity):
         # Bot shooting - always shoot when not in cooldown
         self._bot_shooting()
     
-    def _find_safe_direction(self, enemy_bullets, enemies):
-        """Find safe direction using directional box casts"""
-        best_direction = Vector2(0, 0)
-        best_score = -1000
-        
-        # Test directions in a circle around the player
-        for i in range(self.bot_cast_count):
-            angle = (i * 360 / self.bot_cast_count)
-            angle_rad = math.radians(angle)
-            
-            # Direction vector
-            direction = Vector2(math.cos(angle_rad), math.sin(angle_rad))
-            
-            # Score this direction
-            score = self._score_direction(direction, enemy_bullets, enemies)
+    def _plan_direction(self, enemy_bullets):
+        """Follow the cached plan, replanning against the bullets within the planner's reach when needed"""
+        entity_manager = self.get_entity_manager()
+        cache = self.bot_plan_cache
+        threat = np.zeros(0, dtype=np.int64)
+        if len(enemy_bullets):
+            radius = cache.threat_radius(enemy_bullets.radii, enemy_bullets.velocities)
+            threat = entity_manager.query_radius(EntityTag.ENEMY_BULLET, self.position, radius)
+        reason = cache.replan_reason(self.position, [enemy_bullets.entities[i].serial for i in threat],
+                                     enemy_bullets.positions[threat], enemy_bullets.velocities[threat], enemy_bullets.radii[threat])
+        
+        if reason is not None:
+            nearby = np.zeros(0, dtype=np.int64)
+            if len(enemy_bullets):
+                reach = self.bot_planner.reach(enemy_bullets.radii, enemy_bullets.velocities)
+                nearby = entity_manager.query_radius(EntityTag.ENEMY_BULLET, self.position, reach)
             
-            if score > best_score:
-                best_score = score
-                best_direction = direction
+            # Line up under the enemy
+            enemy = entity_manager.get_first_by_tag(EntityTag.ENEMY)
+            target = (enemy.position.x if enemy else 0, Globals.world_bottom - 120)
+            plan = self.bot_planner.plan(self.position, enemy_bullets.positions[nearby],
+                                         enemy_bullets.velocities[nearby], enemy_bullets.radii[nearby], target)
+            cache.set_plan(plan, [enemy_bullets.entities[i].serial for i in nearby], reason)
+        return Vector2(*cache.next_direction())
+    
+    def _gradient_direction(self):
+        """Move down the danger field gradient, pulled towards a spot under the enemy"""
+        entity_manager = self.get_entity_manager()
+        gradient_x, gradient_y = entity_manager.get_danger_field().gradient_at(self.position.x, self.position.y)
+        direction = Vector2(-gradient_x, -gradient_y) * self.bot_gradient_gain
+        
+        enemy = entity_manager.get_first_by_tag(EntityTag.ENEMY)
+        to_target = Vector2(enemy.position.x if enemy else 0, Globals.world_bottom - 120) - self.position
+        if to_target.length() > self.speed:
+            direction += to_target.normalize() * self.bot_gradient_pull
+        return direction
+    
+    def _find_safe_direction(self, enemy_bullets):
+        """Find safe direction using directional box casts (scored by score_directions)"""
+        if self._bot_directions is None or len(self._bot_directions) != self.bot_cast_count:
+            self._bot_directions = bot_cast_directions(self.bot_cast_count)
+        
+        # Only bullets that can touch a cast (now or 10 frames ahead) matter, fetch them from the grid
+        nearby = np.zeros(0, dtype=np.int64)
+        if len(enemy_bullets):
+            max_speed = np.sqrt((enemy_bullets.velocities ** 2).sum(axis=1)).max()
+            reach = (self.bot_cast_length * 0.5 + self.bot_cast_width * 0.5 + enemy_bullets.radii.max()
+                     + 10 * max_speed + 1)  # +1 guards the strict comparisons against rounding
+            nearby = self.get_entity_manager().query_radius(EntityTag.ENEMY_BULLET, self.position, reach)
+        
+        # Test directions in a circle around the player, the first best one wins
+        position = np.array([[self.position.x, self.position.y]])
+        scores = score_directions(position, self._bot_directions, self.bot_cast_width, self.bot_cast_length,
+                                  enemy_bullets.positions, enemy_bullets.velocities, enemy_bullets.radii,
+                                  np.zeros(len(nearby), dtype=np.int64), nearby)[0]
+        best = int(scores.argmax())
+        best_direction = Vector2(*self._bot_directions[best])
         
         # Try to move to center-bottom for good shooting position
-        if best_score < 0:
-            # Try to move to center-bottom for good shooting position
+        if scores[best] < 0:
             target_pos = Vector2(0, Globals.world_bottom - 40)  # Center-bottom area
             to_target = target_pos - self.position
             if to_target.length() > 0:
@@ -248,65 +310,6 @@ class Player(Entity):
         
         return best_direction
     
-    def _score_direction(self, direction, enemy_bullets, enemies):
-        """Score a direction based on safety and tactical value"""
-        # Cast position
-        cast_end = self.position + direction * self.bot_cast_length
-        
-        # Safety score - negative points for bullets in path
-        safety_score = 100
-        
-        # Check collision with enemy bullets
-        for bullet in enemy_bullets:
-            if self._box_intersects_bullet(self.position, cast_end, bullet):
-                # Penalize based on bullet proximity and trajectory
-                distance = (bullet.position - self.position).length()
-                if distance < 20:
-                    safety_score -= 50
-                elif distance < 40:
-                    safety_score -= 25
-                else:
-                    safety_score -= 10
-        
-        # Tactical score - prefer positions that allow good shooting
-        tactical_score = 0
-        
-        # Prefer being in lower half of screen for shooting upward
-        if cast_end.y > 0:
-            tactical_score += 20
-        
-        # Prefer being somewhat centered horizontally
-        center_distance = abs(cast_end.x)
-        if center_distance < Globals.half_width // 3:  # Within 1/3 of screen width
-            tactical_score += 10
-        
-        # Avoid screen edges
-        margin = 10
-        if (cast_end.x < Globals.world_left + margin or cast_end.x > Globals.world_right - margin or 
-            cast_end.y < Globals.world_top + margin or cast_end.y > Globals.world_bottom - margin):
-            safety_score -= 30
-        
-        return safety_score + tactical_score
-    
-    def _box_intersects_bullet(self, start_pos, end_pos, bullet):
-        """Check if a box cast intersects with a bullet"""
-        # Simple box intersection check
-        # Get bullet future position based on its velocity
-        bullet_future = bullet.position + bullet.velocity * 10  # Look ahead 10 frames
-        
-        # Check if bullet path intersects with our box cast
-        cast_center = (start_pos + end_pos) * 0.5
-        cast_half_width = self.bot_cast_width * 0.5
-        cast_half_length = (end_pos - start_pos).length() * 0.5
-        
-        # Distance from bullet to cast center
-        to_bullet = bullet.position - cast_center
-        to_bullet_future = bullet_future - cast_center
-        
-        # Simple distance check (could be improved with proper box collision)
-        min_dist = min(to_bullet.length(), to_bullet_future.length())
-        return min_dist < (cast_half_width + bullet.radius)
-    
     def _clamp_to_bounds(self):
         """Keep player within screen bounds"""
         self.position.x = max(Globals.world_left + self.radius, min(self.position.x, Globals.world_right - self.radius))
@@ -0,0 +1,108 @@
+"""Input sources that drive the Player: physical devices or gym actions"""
+import pygame
+
+class PlayerInput:
+    """Player input state for a single frame"""
+    def __init__(self, move_x=0.0, move_y=0.0, shoot=False, toggle_bot=False):
+        self.move_x = move_x          # -1 (left) to 1 (right)
+        self.move_y = move_y          # -1 (up) to 1 (down)
+        self.shoot = shoot
+        self.toggle_bot = toggle_bot  # True on the frame the bot toggle is pressed
+
+class DeviceInput:
+    """Reads the keyboard and the first gamepad (requires pygame to be initialized)"""
+
+    def __init__(self):
+        self.gamepad = None
+        self._b_key_pressed = False
+        self._init_gamepad()
+
+    def _init_gamepad(self):
+        """Initialize gamepad if available"""
+        # Initialize joystick subsystem if not already initialized
+        if not pygame.get_init() or not pygame.joystick.get_init():
+            pygame.joystick.init()
+
+        if pygame.joystick.get_count() > 0:
+            self.gamepad = pygame.joystick.Joystick(0)
+            self.gamepad.init()
+
+    def _get_gamepad_input(self):
+        """Get current gamepad input state"""
+        if not self.gamepad:
+            return {}
+
+        gamepad_input = {}
+
+        # Left stick for movement
+        gamepad_input['left_stick_x'] = self.gamepad.get_axis(0)
+        gamepad_input['left_stick_y'] = self.gamepad.get_axis(1)
+
+        # Buttons for shooting (A button or right trigger)
+        try:
+            gamepad_input['shoot'] = (self.gamepad.get_button(0) or  # A button
+                                    self.gamepad.get_axis(5) > 0.5)  # Right trigger
+        except pygame.error:
+            # Handle cases where controller doesn't have all expected inputs
+            gamepad_input['shoot'] = False
+
+        return gamepad_input
+
+    def poll(self) -> PlayerInput:
+        """Read the current input state"""
+        keys = pygame.key.get_pressed()
+        gamepad_input = self._get_gamepad_input()
+
+        # Bot toggle (B key) fires once per press
+        toggle_bot = keys[pygame.K_b] and not self._b_key_pressed
+        self._b_key_pressed = keys[pygame.K_b]
+
+        # Player movement - keyboard
+        move_x = 0
+        move_y = 0
+
+        if keys[pygame.K_w] or keys[pygame.K_UP]:
+            move_y -= 1
+        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
+            move_y += 1
+        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+            move_x -= 1
+        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+            move_x += 1
+
+        # Gamepad movement
+        if gamepad_input:
+            # Left stick for movement
+            stick_x = gamepad_input.get('left_stick_x', 0)
+            stick_y = gamepad_input.get('left_stick_y', 0)
+
+            # Apply deadzone
+            deadzone = 0.15
+            if abs(stick_x) > deadzone:
+                move_x += stick_x
+            if abs(stick_y) > deadzone:
+                move_y += stick_y
+
+        shoot = bool(keys[pygame.K_SPACE] or gamepad_input.get('shoot', False))
+        return PlayerInput(move_x, move_y, shoot, bool(toggle_bot))
+
+class ActionInput:
+    """
+    Input set from a Discrete(10) gym action, no pygame calls involved
+
+    action % 5 picks the movement (stay, up, down, left, right) and action >= 5 holds fire.
+    """
+    MOVES = [(0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)]
+
+    def __init__(self):
+        self.state = PlayerInput()
+
+    def set_action(self, action):
+        """Set the input for the next frames from a discrete action"""
+        action = int(action)
+        self.state.move_x, self.state.move_y = self.MOVES[action % 5]
+        self.state.shoot = action >= 5
+
+    def poll(self) -> PlayerInput:
+        """Get the input set by the last action"""
+        return self.state
@@ -0,0 +1,161 @@
+"""
+Policy bot - Drive players with a trained Stable-Baselines3 policy inside the game loop
+
+Observations are written straight into preallocated arrays, inference runs through the
+policy's public predict() under torch.inference_mode(), and several players can share one
+batched forward pass. Every forward pass is timed. Pin torch's CPU threads with
+set_inference_threads() from the entry point for steady latency (play.py --policy does).
+"""
+import time
+import numpy as np
+import gymnasium as gym
+import torch
+from player_input import ActionInput
+
+FRAME_BUDGET_US = 1e6 / 60  # One frame of the live game
+
+def set_inference_threads(threads: int = 1):
+    """
+    Pin torch to a fixed number of intra-op threads (and one inter-op thread) for steady
+    latency. Changes torch's process-wide settings, so it is left to entry points.
+    """
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Can only be set before the first parallel work, keep what is there
+
+class PolicyController:
+    """
+    Runs a policy for up to batch_size players. Fill a slot per player with observe(),
+    then act() runs one forward pass over the first count slots.
+    """
+
+    def __init__(self, policy, observation_space: gym.spaces.Dict, batch_size: int = 1,
+                 deterministic: bool = True, latency_window: int = 600):
+        """
+        Args:
+            policy: SB3 policy (e.g. model.policy of a PPO model with MultiInputPolicy)
+            observation_space: Dict observation space of a Game the policy was trained on
+            batch_size: Number of players sharing the forward pass
+            deterministic: Take the most likely action instead of sampling
+            latency_window: Number of recent forward passes kept for the latency stats
+        """
+        self.policy = policy.to('cpu')
+        self.policy.set_training_mode(False)
+        self.observation_space = observation_space
+        self.batch_size = batch_size
+        self.deterministic = deterministic
+
+        # Observation buffers, so filling them does not allocate
+        self.arrays = {}
+        for key, space in observation_space.spaces.items():
+            shape = () if isinstance(space, gym.spaces.Discrete) else space.shape
+            self.arrays[key] = np.zeros((batch_size, *shape), dtype=np.float32)
+        self.actions = np.zeros(batch_size, dtype=np.int64)
+
+        # Latency of the last latency_window forward passes in microseconds (ring buffer)
+        self.latencies = np.zeros(latency_window)
+        self.calls = 0
+
+    @staticmethod
+    def load(path: str, **kwargs) -> 'PolicyController':
+        """Load a saved PPO model, see __init__ for the keyword arguments"""
+        from stable_baselines3 import PPO
+        model = PPO.load(path, device='cpu')
+        return PolicyController(model.policy, model.observation_space, **kwargs)
+
+    @property
+    def obs_mode(self) -> str:
+        """Game obs_mode matching the observation space"""
+        for key in self.observation_space.spaces:
+            if key not in ('total_damage_dealt', 'player_hp'):
+                return key
+        return 'stats'
+
+    def observe(self, slot: int, game):
+        """Write the observation of a game (as Game._get_obs() builds it) into a slot"""
+        self.arrays['total_damage_dealt'][slot, 0] = game.damage_dealt
+        self.arrays['player_hp'][slot] = game.player.lives
+        if game.obs_encoder is not None:
+            self.arrays[game.obs_mode][slot] = game.obs_encoder.encode(game.entity_manager, game.player.position)
+
+    def act(self, count: int = 1) -> np.ndarray:
+        """
+        Run the policy on the first count slots
+
+        Returns:
+            Discrete actions of the slots, the controller's buffer (overwritten by the next call)
+        """
+        start = time.perf_counter_ns()
+        observation = {key: array[:count] for key, array in self.arrays.items()}
+        with torch.inference_mode():
+            actions, _ = self.policy.predict(observation, deterministic=self.deterministic)
+        self.actions[:count] = np.reshape(actions, -1)
+        self.latencies[self.calls % len(self.latencies)] = (time.perf_counter_ns() - start) / 1000
+        self.calls += 1
+        return self.actions[:count]
+
+    def act_for(self, games: list) -> np.ndarray:
+        """Observe a list of games and run one batched forward pass over them"""
+        for slot, game in enumerate(games):
+            self.observe(slot, game)
+        return self.act(len(games))
+
+    def latency_stats(self) -> dict:
+        """Mean, median, p99 and max latency in microseconds over the recent forward passes"""
+        latencies = self.latencies[:min(self.calls, len(self.latencies))]
+        if len(latencies) == 0:
+            return {'calls': 0}
+        return {
+            'calls': self.calls,
+            'mean_us': float(latencies.mean()),
+            'p50_us': float(np.percentile(latencies, 50)),
+            'p99_us': float(np.percentile(latencies, 99)),
+            'max_us': float(latencies.max()),
+            'over_frame_budget': int((latencies > FRAME_BUDGET_US).sum()),
+        }
+
+class PolicyInput:
+    """
+    Input source that lets a PolicyController play a game's player. The policy runs once
+    every action_repeat frames (like Game's frame_skip) and its action is held in between.
+    With batched=True the policy is not run here; the action comes from set_action(), see
+    act_batched().
+    """
+
+    def __init__(self, controller: PolicyController, game, action_repeat: int = 1, batched: bool = False):
+        self.controller = controller
+        self.game = game
+        self.action_repeat = action_repeat
+        self.batched = batched
+        self._action_input = ActionInput()
+        self._frames = 0
+
+    def set_action(self, action):
+        self._action_input.set_action(action)
+
+    def poll(self):
+        if not self.batched and self._frames % self.action_repeat == 0:
+            self.controller.observe(0, self.game)
+            self._action_input.set_action(self.controller.act(1)[0])
+        self._frames += 1
+        return self._action_input.poll()
+
+def attach_policy(game, controller: PolicyController, action_repeat: int = 1, batched: bool = False) -> PolicyInput:
+    """Let a policy play a game's player and return the input source it uses"""
+    if game.obs_mode != controller.obs_mode:
+        raise ValueError(f"Policy observes '{controller.obs_mode}' but the game uses obs_mode '{game.obs_mode}'")
+    policy_input = PolicyInput(controller, game, action_repeat, batched)
+    game.player.input_source = policy_input
+    game.player.bot_enabled = False
+    return policy_input
+
+def act_batched(controller: PolicyController, policy_inputs: list):
+    """
+    One forward pass for several batched PolicyInputs (at most the controller's batch_size),
+    call before updating their games
+    """
+    actions = controller.act_for([policy_input.game for policy_input in policy_inputs])
+    for policy_input, action in zip(policy_inputs, actions):
+        policy_input.set_action(action)
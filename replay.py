@@ -0,0 +1,322 @@
+"""
+Replays - Record a game session as seed + per-frame input and re-simulate it headless
+
+File layout (little endian):
+    header      magic 'NHRP', version u8, seed u64, frame count u32, checksum interval u16,
+                level transition count u32, checksum count u32, compressed input size u32
+    inputs      zlib-compressed frames of (move_x i8, move_y i8, flags u8)
+    levels      (frame u32, level u16) for every level transition
+    checksums   (frame u32, crc32 u32) of the game state every checksum interval frames
+    bot config  size u32 + JSON of the bot mode and planner settings (see BOT_CONFIG), so a
+                session played by the bot re-simulates with the same decisions
+"""
+import json
+import random
+import struct
+import sys
+import time
+import zlib
+import numpy as np
+from entity import EntityTag
+from player_input import PlayerInput
+
+BOT_MODES = ('casts', 'planner', 'gradient')
+
+MAGIC = b'NHRP'
+VERSION = 2
+MOVE_SCALE = 63  # Movement is stored as round(move * 63), covering keyboard + stick (-2..2)
+SHOOT_FLAG = 1
+TOGGLE_BOT_FLAG = 2
+
+_HEADER = struct.Struct('<4sBQIHIII')
+FRAME_DTYPE = np.dtype([('move_x', 'i1'), ('move_y', 'i1'), ('flags', 'u1')])
+LEVEL_DTYPE = np.dtype([('frame', '<u4'), ('level', '<u2')])
+CHECKSUM_DTYPE = np.dtype([('frame', '<u4'), ('crc', '<u4')])
+_CONFIG_SIZE = struct.Struct('<I')
+
+# Settings the bot decides with, as attribute names of the player, its planner and its plan cache
+BOT_CONFIG = {
+    'player': ('bot_mode', 'bot_cast_count', 'bot_cast_width', 'bot_cast_length',
+               'bot_gradient_gain', 'bot_gradient_pull'),
+    'planner': ('player_speed', 'player_radius', 'segment_frames', 'segments', 'beam_width',
+                'max_work', 'safety_margin', 'hit_cost', 'target_weight'),
+    'plan_cache': ('replan_interval', 'min_clearance'),
+}
+
+def _bot_objects(player) -> dict:
+    return {'player': player, 'planner': player.bot_planner, 'plan_cache': player.bot_plan_cache}
+
+def get_bot_config(player) -> dict:
+    """The bot settings of a player as {'player': {...}, 'planner': {...}, 'plan_cache': {...}}"""
+    objects = _bot_objects(player)
+    return {group: {name: getattr(objects[group], name) for name in names} for group, names in BOT_CONFIG.items()}
+
+def set_bot_config(player, config: dict):
+    """
+    Apply settings from get_bot_config(). The planner's time budget is switched off, the
+    bot has to plan the same way on playback regardless of how fast the machine is.
+    """
+    objects = _bot_objects(player)
+    for group, values in config.items():
+        for name, value in values.items():
+            setattr(objects[group], name, value)
+    player.bot_planner.budget_us = None
+
+def state_checksum(game) -> int:
+    """CRC32 of the frame counter, score, lives, health and all entity positions"""
+    counters = np.array([game.clock.frame, game.score, game.level, game.player.lives, game.enemy.health], dtype=np.int64)
+    positions = np.array([game.player.position.x, game.player.position.y,
+                          game.enemy.position.x, game.enemy.position.y], dtype=np.float64)
+    crc = zlib.crc32(counters.tobytes())
+    crc = zlib.crc32(positions.tobytes(), crc)
+    crc = zlib.crc32(game.entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET).positions.tobytes(), crc)
+    return zlib.crc32(game.entity_manager.get_tag_arrays(EntityTag.PLAYER_BULLET).positions.tobytes(), crc)
+
+class Replay:
+    """A recorded session: seed, inputs per simulated frame, level transitions and checksums"""
+
+    def __init__(self, seed: int, frames: np.ndarray, levels: np.ndarray, checksums: np.ndarray, checksum_interval: int,
+                 bot_config: dict = None):
+        self.seed = seed
+        self.frames = frames
+        self.levels = levels
+        self.checksums = checksums
+        self.checksum_interval = checksum_interval
+        self.bot_config = bot_config  # get_bot_config() of the recorded player, None for the defaults
+
+    def __len__(self):
+        return len(self.frames)
+
+    def save(self, path: str):
+        inputs = zlib.compress(self.frames.astype(FRAME_DTYPE).tobytes(), 9)
+        with open(path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, self.seed, len(self.frames), self.checksum_interval,
+                                    len(self.levels), len(self.checksums), len(inputs)))
+            file.write(inputs)
+            file.write(self.levels.astype(LEVEL_DTYPE).tobytes())
+            file.write(self.checksums.astype(CHECKSUM_DTYPE).tobytes())
+            config = json.dumps(self.bot_config or {}).encode()
+            file.write(_CONFIG_SIZE.pack(len(config)))
+            file.write(config)
+
+    @staticmethod
+    def load(path: str) -> 'Replay':
+        with open(path, 'rb') as file:
+            data = file.read()
+        magic, version, seed, frame_count, checksum_interval, level_count, checksum_count, input_size = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} replay")
+
+        offset = _HEADER.size
+        frames = np.frombuffer(zlib.decompress(data[offset:offset + input_size]), dtype=FRAME_DTYPE, count=frame_count)
+        offset += input_size
+        levels = np.frombuffer(data, dtype=LEVEL_DTYPE, count=level_count, offset=offset)
+        offset += levels.nbytes
+        checksums = np.frombuffer(data, dtype=CHECKSUM_DTYPE, count=checksum_count, offset=offset)
+        offset += checksums.nbytes
+        config_size, = _CONFIG_SIZE.unpack_from(data, offset)
+        offset += _CONFIG_SIZE.size
+        bot_config = json.loads(data[offset:offset + config_size].decode()) or None
+        return Replay(seed, frames, levels, checksums, checksum_interval, bot_config)
+
+class RecordingInput:
+    """
+    Wraps an input source, quantizing its input to the replay resolution and recording it.
+    The game is driven by the quantized input, so playback matches exactly.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.frames = []
+
+    def poll(self) -> PlayerInput:
+        player_input = self.source.poll()
+        move_x = int(max(-127, min(127, round(player_input.move_x * MOVE_SCALE))))
+        move_y = int(max(-127, min(127, round(player_input.move_y * MOVE_SCALE))))
+        flags = (SHOOT_FLAG if player_input.shoot else 0) | (TOGGLE_BOT_FLAG if player_input.toggle_bot else 0)
+        self.frames.append((move_x, move_y, flags))
+        return PlayerInput(move_x / MOVE_SCALE, move_y / MOVE_SCALE, bool(flags & SHOOT_FLAG), bool(flags & TOGGLE_BOT_FLAG))
+
+class PlaybackInput:
+    """Feeds recorded frames back to the player, one per poll"""
+
+    def __init__(self, frames: np.ndarray):
+        self.move_x = (frames['move_x'] / MOVE_SCALE).tolist()
+        self.move_y = (frames['move_y'] / MOVE_SCALE).tolist()
+        self.shoot = (frames['flags'] & SHOOT_FLAG).astype(bool).tolist()
+        self.toggle_bot = (frames['flags'] & TOGGLE_BOT_FLAG).astype(bool).tolist()
+        self.frame = 0
+
+    def poll(self) -> PlayerInput:
+        i = self.frame
+        self.frame += 1
+        return PlayerInput(self.move_x[i], self.move_y[i], self.shoot[i], self.toggle_bot[i])
+
+class ReplayRecorder:
+    """
+    Records a session of a Game. Reseeds the game on creation, stores the player's bot
+    settings (set them before) and wraps the player's input source; call after_update()
+    after every Game.update().
+    """
+
+    def __init__(self, game, seed: int = None, checksum_interval: int = 60):
+        self.seed = seed if seed is not None else random.SystemRandom().randrange(2 ** 63)
+        self.checksum_interval = checksum_interval
+        game.reset(seed=self.seed)
+        set_bot_config(game.player, {})  # Drops the planner's time budget
+        self.bot_config = get_bot_config(game.player)
+        self.input = RecordingInput(game.player.input_source)
+        game.player.input_source = self.input
+        self.levels = []
+        self.checksums = []
+        self._frame = 0
+        self._level = game.level
+
+    def after_update(self, game):
+        """Record level transitions and checksums of the frame just simulated"""
+        frame = len(self.input.frames)
+        if frame == self._frame:
+            return  # Nothing was simulated (game over)
+        self._frame = frame
+
+        if game.level != self._level:
+            self._level = game.level
+            self.levels.append((frame, game.level))
+        if frame % self.checksum_interval == 0:
+            self.checksums.append((frame, state_checksum(game)))
+
+    def stop(self, game) -> Replay:
+        """Give the player its original input source back and return the recording"""
+        game.player.input_source = self.input.source
+        return self.to_replay()
+
+    def to_replay(self) -> Replay:
+        return Replay(self.seed,
+                      np.array(self.input.frames, dtype=FRAME_DTYPE),
+                      np.array(self.levels, dtype=LEVEL_DTYPE),
+                      np.array(self.checksums, dtype=CHECKSUM_DTYPE),
+                      self.checksum_interval,
+                      self.bot_config)
+
+class PlaybackResult:
+    """Outcome of re-simulating a replay"""
+
+    def __init__(self, frames: int, elapsed: float, mismatches: list):
+        self.frames = frames
+        self.elapsed = elapsed
+        self.mismatches = mismatches  # (frame, what) for every failed check
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatches
+
+    @property
+    def speedup(self) -> float:
+        """Simulation speed relative to real time at 60 FPS"""
+        return self.frames / 60 / self.elapsed if self.elapsed > 0 else float('inf')
+
+def play_replay(replay: Replay, verify: bool = True) -> PlaybackResult:
+    """
+    Re-simulate a replay headless as fast as possible
+
+    Args:
+        replay: Replay to play
+        verify: Compare level transitions and state checksums with the recording
+    """
+    from game import Game
+
+    game = Game(headless=True)
+    game.player.input_source = PlaybackInput(replay.frames)
+    set_bot_config(game.player, replay.bot_config or {})
+    game.reset(seed=replay.seed)
+
+    levels = {int(frame): int(level) for frame, level in replay.levels} if verify else {}
+    checksums = {int(frame): int(crc) for frame, crc in replay.checksums} if verify else {}
+    mismatches = []
+    level = game.level
+
+    start = time.perf_counter()
+    for frame in range(1, len(replay) + 1):
+        if game.game_over:
+            mismatches.append((frame, "game ended early"))
+            break
+        game.update()
+        if not verify:
+            continue
+        if game.level != level:
+            level = game.level
+            if levels.get(frame) != level:
+                mismatches.append((frame, f"reached level {level}"))
+        if frame in checksums and state_checksum(game) != checksums[frame]:
+            mismatches.append((frame, "state checksum"))
+    elapsed = time.perf_counter() - start
+
+    return PlaybackResult(game.clock.frame, elapsed, mismatches)
+
+class ScriptedInput:
+    """Turns the bot on in the first frame and keeps shooting, for recording bot sessions"""
+
+    def __init__(self):
+        self.frame = 0
+
+    def poll(self) -> PlayerInput:
+        self.frame += 1
+        return PlayerInput(shoot=True, toggle_bot=self.frame == 1)
+
+def check_round_trip(bot_mode: str, seed: int = 0, frames: int = 600, path: str = None) -> PlaybackResult:
+    """
+    Record the bot playing frames frames in bot_mode, save and load the replay (to path, or a
+    temporary file) and play it back with verification
+    """
+    import os
+    import tempfile
+    from game import Game
+
+    game = Game(headless=True)
+    game.player.input_source = ScriptedInput()
+    game.player.bot_mode = bot_mode
+    recorder = ReplayRecorder(game, seed=seed)
+    for _ in range(frames):
+        if game.game_over:
+            break
+        game.update()
+        recorder.after_update(game)
+    replay = recorder.stop(game)
+
+    if path is None:
+        handle, temp_path = tempfile.mkstemp(suffix='.nhrp')
+        os.close(handle)
+        try:
+            replay.save(temp_path)
+            replay = Replay.load(temp_path)
+        finally:
+            os.remove(temp_path)
+    else:
+        replay.save(path)
+        replay = Replay.load(path)
+    return play_replay(replay)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python replay.py <replay file>")
+        print("       python replay.py --check [frames]  (record, save and verify a session per bot mode)")
+        return
+
+    if sys.argv[1] == '--check':
+        frames = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+        for bot_mode in BOT_MODES:
+            result = check_round_trip(bot_mode, frames=frames)
+            print(f"{bot_mode}: {result.frames} frames, {'ok' if result.ok else result.mismatches}")
+        return
+
+    replay = Replay.load(sys.argv[1])
+    result = play_replay(replay)
+    print(f"Frames: {result.frames} in {result.elapsed:.3f}s ({result.speedup:.0f}x real time)")
+    if result.ok:
+        print(f"Verified {len(replay.checksums)} checksums and {len(replay.levels)} level transitions")
+    else:
+        for frame, what in result.mismatches:
+            print(f"Mismatch at frame {frame}: {what}")
+
+if __name__ == "__main__":
+    main()
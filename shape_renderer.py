@@ -2,9 +2,6 @@ import pygame
 import pygame.gfxdraw
 import math
 
-# Initialize pygame
-pygame.init()
-
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -409,6 +406,7 @@ class ShapeRenderer:
 
 # Example usage
 def main():
+    pygame.init()
     screen = pygame.display.set_mode((800, 600))
     pygame.display.set_caption("Pygame Shapes Demo")
     clock = pygame.time.Clock()
@@ -0,0 +1,97 @@
+"""
+SpatialGrid - Uniform grid index over point arrays for vectorized neighbourhood queries
+"""
+import math
+from typing import Tuple
+import numpy as np
+
+class SpatialGrid:
+    """
+    Buckets points into square cells so that radius queries only look at nearby cells.
+    Building and querying are pure array operations (sort + searchsorted), there is no
+    per-point Python work. Points outside the bounds are clamped into the border cells.
+    """
+
+    def __init__(self, cell_size: float, bounds: Tuple[float, float, float, float]):
+        """
+        Args:
+            cell_size: Size of a grid cell in world units
+            bounds: (left, right, top, bottom) area covered by the grid
+        """
+        self.cell_size = cell_size
+        self.left, self.right, self.top, self.bottom = bounds
+        self.cols = max(1, math.ceil((self.right - self.left) / cell_size))
+        self.rows = max(1, math.ceil((self.bottom - self.top) / cell_size))
+        self.positions = np.zeros((0, 2))
+        self._order = np.zeros(0, dtype=np.int64)  # Point indices sorted by cell
+        self._starts = np.zeros(self.cols * self.rows + 1, dtype=np.int64)  # Cell c holds _order[_starts[c]:_starts[c + 1]]
+
+    def _cell_coords(self, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        col = np.clip(((positions[:, 0] - self.left) // self.cell_size).astype(np.int64), 0, self.cols - 1)
+        row = np.clip(((positions[:, 1] - self.top) // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        return col, row
+
+    def build(self, positions: np.ndarray):
+        """
+        Index a set of points, replacing the previous contents
+
+        Args:
+            positions: (N, 2) array of points
+        """
+        self.positions = positions
+        col, row = self._cell_coords(positions)
+        cells = row * self.cols + col
+        self._order = np.argsort(cells, kind='stable')
+        self._starts = np.searchsorted(cells[self._order], np.arange(self.cols * self.rows + 1))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def query_pairs(self, points: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every (query point, indexed point) pair closer than radius
+
+        Args:
+            points: (P, 2) array of query points
+            radius: Search radius
+
+        Returns:
+            (query_index, point_index) integer arrays of matching pairs
+        """
+        query_index, point_index = self.candidate_pairs(points, radius)
+        offsets = self.positions[point_index] - points[query_index]
+        close = (offsets ** 2).sum(axis=1) < radius * radius
+        return query_index[close], point_index[close]
+
+    def candidate_pairs(self, points: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every (query point, indexed point) pair sharing a cell within radius of the
+        query point, without the exact distance test
+
+        Returns:
+            (query_index, point_index) integer arrays of candidate pairs
+        """
+        if len(points) == 0 or len(self.positions) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        # All cells of the (2k + 1)^2 block around each query point
+        span = math.ceil(radius / self.cell_size)
+        steps = np.arange(-span, span + 1)
+        col, row = self._cell_coords(points)
+        cols = col[:, np.newaxis, np.newaxis] + steps[np.newaxis, np.newaxis, :]
+        rows = row[:, np.newaxis, np.newaxis] + steps[np.newaxis, :, np.newaxis]
+        valid = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        cells = np.where(valid, rows * self.cols + cols, 0).reshape(len(points), -1)
+
+        starts = self._starts[cells]
+        counts = np.where(valid.reshape(len(points), -1), self._starts[cells + 1] - starts, 0)
+
+        # Expand each (query, cell) range into one entry per point in the cell
+        counts = counts.ravel()
+        total = int(counts.sum())
+        ends = np.cumsum(counts)
+        ranks = np.arange(total) - np.repeat(ends - counts, counts)
+        slots = np.repeat(starts.ravel(), counts) + ranks
+        query_index = np.repeat(np.arange(len(points)).repeat(cells.shape[1]), counts)
+        return query_index, self._order[slots]
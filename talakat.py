@@ -19,7 +19,8 @@ class TokenType(Enum):
     SEQUENCE = "sequence"
 
 class TalakatInterpreter:
-    def __init__(self):
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random  # Source of RANDOM token values
         self.default_values = {
             TokenType.ANGLE: 90,
             TokenType.COUNT: 4,
@@ -45,6 +46,21 @@ class TalakatInterpreter:
         self.current_index = 0
         self.wait_counter = 0
         self.sequence_indices = {}
+
+    def get_state(self):
+        """Get a copy of the interpreter state (restore it with set_state)"""
+        return (dict(self.current_values), list(self.loop_stack), list(self.loop_iterations),
+                self.current_index, self.wait_counter, dict(self.sequence_indices))
+
+    def set_state(self, state):
+        """Restore a state captured with get_state"""
+        current_values, loop_stack, loop_iterations, current_index, wait_counter, sequence_indices = state
+        self.current_values = dict(current_values)
+        self.loop_stack = list(loop_stack)
+        self.loop_iterations = list(loop_iterations)
+        self.current_index = current_index
+        self.wait_counter = wait_counter
+        self.sequence_indices = dict(sequence_indices)
     
     def get_bullets(self, tokens, enemy_pos, entity_manager):
         """Generate bullets based on the current state of the interpreter"""
@@ -88,11 +104,11 @@ class TalakatInterpreter:
                     self.loop_iterations.pop()
         elif token_type == TokenType.RANDOM:
             param_type, min_val, max_val = value
-            rand_value = random.uniform(min_val, max_val)
+            rand_value = self.rng.uniform(min_val, max_val)
             if param_type == TokenType.COLOR:
-                r = random.randint(0, 255)
-                g = random.randint(0, 255)
-                b = random.randint(0, 255)
+                r = self.rng.randint(0, 255)
+                g = self.rng.randint(0, 255)
+                b = self.rng.randint(0, 255)
                 self.current_values[param_type] = (r, g, b)
             else:
                 self.current_values[param_type] = rand_value
@@ -2,10 +2,16 @@
 TalakatEvaluator - Simulates Talakat bullet patterns and tracks bullet positions over time
 """
 import math
-from typing import List, Tuple, Dict, Optional
+import random
+from statistics import NormalDist
+from typing import Callable, List, Tuple, Dict, Optional, Sequence, Union
+import numpy as np
 from pygame.math import Vector2
 from talakat import TalakatInterpreter, TokenType
 from bullets import Bullet
+from globals import Globals
+from spatial_grid import SpatialGrid
+from player import bot_cast_directions, score_directions
 
 class BulletSnapshot:
     """Represents a bullet's state at a specific frame"""
@@ -45,12 +51,297 @@ class FrameSnapshot:
     def __repr__(self):
         return f"FrameSnapshot(frame={self.frame_number}, bullets={len(self.bullets)})"
 
+class SpawnLog:
+    """
+    Columnar record of every bullet spawn (one row per bullet).
+    Bullets move linearly, so the log fully describes the pattern's history.
+    """
+    def __init__(self):
+        self.frame: List[int] = []
+        self.x: List[float] = []
+        self.y: List[float] = []
+        self.vx: List[float] = []
+        self.vy: List[float] = []
+        self.size: List[float] = []
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self.cache: Dict[str, np.ndarray] = {}  # Values derived from the log, dropped when it changes
+
+    def append(self, frame: int, position: Vector2, velocity: Vector2, size: float):
+        """Record a bullet spawned at the given frame"""
+        self.frame.append(frame)
+        self.x.append(position.x)
+        self.y.append(position.y)
+        self.vx.append(velocity.x)
+        self.vy.append(velocity.y)
+        self.size.append(size)
+        self._arrays = None
+        self.cache.clear()
+
+    def truncate(self, length: int):
+        """Keep only the first length spawns"""
+        for column in (self.frame, self.x, self.y, self.vx, self.vy, self.size):
+            del column[length:]
+        self._arrays = None
+        self.cache.clear()
+
+    def clear(self):
+        """Remove every recorded spawn"""
+        for column in (self.frame, self.x, self.y, self.vx, self.vy, self.size):
+            column.clear()
+        self._arrays = None
+        self.cache.clear()
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Get the log as NumPy arrays (cached until the next append)
+
+        Returns:
+            Dictionary with 'frame' (N,), 'position' (N, 2), 'velocity' (N, 2) and 'size' (N,)
+        """
+        if self._arrays is None:
+            self._arrays = {
+                'frame': np.array(self.frame, dtype=np.int64),
+                'position': np.column_stack((np.array(self.x, dtype=np.float64), np.array(self.y, dtype=np.float64))),
+                'velocity': np.column_stack((np.array(self.vx, dtype=np.float64), np.array(self.vy, dtype=np.float64))),
+                'size': np.array(self.size, dtype=np.float64),
+            }
+        return self._arrays
+
+    def __len__(self):
+        return len(self.frame)
+
+class P2Quantile:
+    """
+    Streaming quantile estimate using the P-square algorithm (Jain & Chlamtac, 1985).
+    Keeps five markers instead of every sample, so memory stays constant per quantile.
+    """
+    def __init__(self, p: float):
+        self.p = p
+        self._initial: List[float] = []  # First five samples, before the markers exist
+        self._heights: List[float] = []
+        self._positions: List[int] = []
+        self._desired: List[float] = []
+        self._increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        """Add a sample to the estimate"""
+        if not self._heights:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+                self._positions = [1, 2, 3, 4, 5]
+                p = self.p
+                self._desired = [1.0, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.0]
+            return
+
+        q = self._heights
+        n = self._positions
+
+        # Find the cell containing x, extending the extreme markers if needed
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while k < 3 and x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Adjust the three middle markers towards their desired positions
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    # Parabolic prediction left the bracket, fall back to linear
+                    q[i] = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                n[i] += step
+
+    def value(self) -> float:
+        """Get the current quantile estimate"""
+        if self._heights:
+            return self._heights[2]
+        if not self._initial:
+            return float('nan')
+        # Too few samples for the markers, interpolate the sorted samples directly
+        ordered = sorted(self._initial)
+        position = self.p * (len(ordered) - 1)
+        low = int(position)
+        high = min(low + 1, len(ordered) - 1)
+        return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+class RunningStatistic:
+    """Streaming mean, variance (Welford) and quantiles of a metric across seeds"""
+    def __init__(self, quantiles: Tuple[float, ...] = (0.05, 0.5, 0.95)):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.quantiles = {p: P2Quantile(p) for p in quantiles}
+
+    def add(self, x: float):
+        """Add a sample"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        for estimator in self.quantiles.values():
+            estimator.add(x)
+
+    def variance(self) -> float:
+        """Sample variance (0 with fewer than two samples)"""
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    def half_width(self, z: float) -> float:
+        """Half width of the normal-approximation confidence interval for the mean"""
+        if self.count < 2:
+            return float('inf')
+        return z * math.sqrt(self.variance() / self.count)
+
+    def quantile(self, p: float) -> float:
+        """Get the streaming estimate of a tracked quantile"""
+        return self.quantiles[p].value()
+
+    def __repr__(self):
+        return f"RunningStatistic(n={self.count}, mean={self.mean:.3f}, std={math.sqrt(self.variance()):.3f})"
+
+class MonteCarloResult:
+    """Aggregated metrics of a multi-seed evaluation"""
+    def __init__(self, statistics: Dict[str, RunningStatistic], confidence: float, seeds_run: int, converged: bool):
+        self.statistics = statistics
+        self.confidence = confidence
+        self.seeds_run = seeds_run
+        self.converged = converged  # False when max_seeds ran out before reaching the precision
+        self._z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def confidence_interval(self, metric: str) -> Tuple[float, float]:
+        """Get the confidence interval for the mean of a metric"""
+        stat = self.statistics[metric]
+        if stat.count < 2:
+            return (stat.mean, stat.mean)
+        half_width = stat.half_width(self._z)
+        return (stat.mean - half_width, stat.mean + half_width)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Get a plain dictionary of every metric's aggregate"""
+        result = {}
+        for name, stat in self.statistics.items():
+            low, high = self.confidence_interval(name)
+            entry = {
+                'mean': stat.mean,
+                'std': math.sqrt(stat.variance()),
+                'min': stat.min,
+                'max': stat.max,
+                'ci_low': low,
+                'ci_high': high,
+            }
+            for p in stat.quantiles:
+                entry[f'q{int(round(p * 100))}'] = stat.quantile(p)
+            result[name] = entry
+        return result
+
+    def print_summary(self):
+        """Print the aggregated metrics"""
+        state = "converged" if self.converged else "not converged"
+        print(f"=== Monte-Carlo Evaluation ({self.seeds_run} seeds, {state}) ===")
+        for name, entry in self.summary().items():
+            print(f"{name}: mean {entry['mean']:.2f} "
+                  f"[{entry['ci_low']:.2f}, {entry['ci_high']:.2f}] @ {self.confidence:.0%}, "
+                  f"std {entry['std']:.2f}, range {entry['min']:.2f}-{entry['max']:.2f}")
+
+class FreeSpaceAnalysis:
+    """Per-frame free space of the player's reachable area, sampled every frame_step frames"""
+    def __init__(self, frames: np.ndarray, safe_fraction: np.ndarray, largest_empty_circle: np.ndarray,
+                 reachable_fraction: np.ndarray, blocked_frame: Optional[int]):
+        self.frames = frames                              # Sampled frame numbers
+        self.safe_fraction = safe_fraction                # Fraction of grid cells the player fits in
+        self.largest_empty_circle = largest_empty_circle  # Radius of the largest bullet-free circle
+        self.reachable_fraction = reachable_fraction      # Fraction of cells reachable without being hit
+        self.blocked_frame = blocked_frame                # First frame without any safe reachable cell
+
+    @property
+    def safe_path(self) -> bool:
+        """Whether a player starting at the spawn point can dodge the whole simulation"""
+        return self.blocked_frame is None
+
+    def __repr__(self):
+        return f"FreeSpaceAnalysis(samples={len(self.frames)}, safe_path={self.safe_path})"
+
+class SurvivalEstimate:
+    """Survival of a batch of simulated players against a pattern"""
+    def __init__(self, policy: str, hit_frames: np.ndarray, num_frames: int, window: int):
+        self.policy = policy
+        self.hit_frames = hit_frames  # Frame each agent was first hit at, -1 if it survived
+        self.num_frames = num_frames
+        self.window = window
+
+        # survival[f] = fraction of agents not yet hit at the start of frame f
+        hits = np.bincount(hit_frames[hit_frames >= 0], minlength=num_frames)
+        self.survival = 1.0 - np.concatenate(([0], np.cumsum(hits))) / len(hit_frames)
+
+        # Probability of being hit within each window, given being alive at its start
+        starts = np.arange(0, num_frames, window)
+        ends = np.minimum(starts + window, num_frames)
+        alive = self.survival[starts]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.hit_probability = np.where(alive > 0, (alive - self.survival[ends]) / alive, np.nan)
+        self.window_starts = starts
+
+    @property
+    def survival_rate(self) -> float:
+        """Fraction of agents that were never hit"""
+        return float(self.survival[-1])
+
+    @property
+    def mean_survival_frames(self) -> float:
+        """Average number of frames survived (survivors count the whole simulation)"""
+        survived = np.where(self.hit_frames >= 0, self.hit_frames, self.num_frames)
+        return float(survived.mean())
+
+    def __repr__(self):
+        return f"SurvivalEstimate(policy={self.policy}, agents={len(self.hit_frames)}, survival_rate={self.survival_rate:.3f})"
+
+class EvaluatorCheckpoint:
+    """Saved simulation state of a TalakatEvaluator (see TalakatEvaluator.checkpoint)"""
+    def __init__(self, frame: int, interpreter_state: tuple, rng_state: tuple, spawn_count: int,
+                 frame_count: int, active_bullets: List[Dict], record_frames: bool):
+        self.frame = frame
+        self.interpreter_state = interpreter_state
+        self.rng_state = rng_state
+        self.spawn_count = spawn_count  # Spawn log length at the checkpoint
+        self.frame_count = frame_count  # Number of stored FrameSnapshots at the checkpoint
+        self.active_bullets = active_bullets
+        self.record_frames = record_frames
+
+    def __repr__(self):
+        return f"EvaluatorCheckpoint(frame={self.frame}, spawns={self.spawn_count})"
+
+EmitterPath = Union[Callable[[int], Tuple[float, float]], Sequence[Tuple[float, float]], np.ndarray]
+
 class TalakatEvaluator:
     """
     Evaluates and simulates Talakat bullet patterns over time
     """
     
-    def __init__(self, pattern: List[Tuple], enemy_position: Vector2, bounds: Optional[Tuple[float, float, float, float]] = None):
+    def __init__(self, pattern: List[Tuple], enemy_position: Vector2, bounds: Optional[Tuple[float, float, float, float]] = None,
+                 seed: Optional[int] = None, emitter_path: Optional[EmitterPath] = None):
         """
         Initialize the evaluator with a pattern and enemy position
         
@@ -58,10 +349,19 @@ class TalakatEvaluator:
             pattern: Talakat pattern (list of (TokenType, value) tuples)
             enemy_position: Starting position of the enemy
             bounds: Optional bounds (left, right, top, bottom) for bullet culling
+            seed: Optional seed for the RANDOM token generator
+            emitter_path: Optional moving emitter, either a function of the frame number returning
+                (x, y) or a sequence of per-frame positions (the last one is held once it runs out).
+                When given it replaces enemy_position (see enemy_emitter_path)
         """
-        self.pattern = pattern
+        # Tokens without a value (e.g. a bare TokenType.ENDLOOP) become (token, None)
+        self.pattern = [token if isinstance(token, tuple) else (token, None) for token in pattern]
         self.enemy_position = enemy_position.copy()
+        self.emitter_path = emitter_path
+        if emitter_path is not None and not callable(emitter_path):
+            self.emitter_path = np.asarray(emitter_path, dtype=np.float64).reshape(-1, 2)
         self.interpreter = TalakatInterpreter()
+        self.rng = random.Random(seed)  # Private generator so runs can be reproduced per seed
         
         # Set bounds for bullet culling (default to large area)
         if bounds:
@@ -76,34 +376,102 @@ class TalakatEvaluator:
         # Simulation state
         self.active_bullets: List[Dict] = []  # List of bullet dictionaries with position, velocity, etc.
         self.frames: List[FrameSnapshot] = []  # Historical data
+        self.spawn_log = SpawnLog()  # Every spawn, enough to derive the metrics without frames
         self.current_frame = 0
+        self.record_frames = True
         
-    def simulate(self, num_frames: int) -> List[FrameSnapshot]:
+    def simulate(self, num_frames: int, record_frames: bool = True) -> List[FrameSnapshot]:
         """
         Run the simulation for the specified number of frames
         
         Args:
             num_frames: Number of frames to simulate
+            record_frames: Whether to step bullets and store FrameSnapshots. When False only
+                the spawn log is recorded, which is all the closed-form metrics need
             
         Returns:
-            List of FrameSnapshot objects, one for each frame
+            List of FrameSnapshot objects, one for each frame (empty if record_frames is False)
         """
         self.frames.clear()
         self.active_bullets.clear()
+        self.spawn_log.clear()
         self.interpreter.reset()
         self.current_frame = 0
+        self.record_frames = record_frames
         
+        return self.resume(num_frames)
+
+    def resume(self, num_frames: int) -> List[FrameSnapshot]:
+        """
+        Continue the simulation from where it stopped, keeping everything recorded so far
+
+        Uses the record_frames mode of the last simulate() call.
+
+        Args:
+            num_frames: Number of additional frames to simulate
+
+        Returns:
+            List of all FrameSnapshot objects so far (empty if frames are not recorded)
+        """
         for frame in range(num_frames):
-            self._simulate_frame()
-            
+            if self.record_frames:
+                self._simulate_frame()
+            else:
+                self._spawn_bullets()
+                self.current_frame += 1
+
         return self.frames
+
+    def checkpoint(self) -> EvaluatorCheckpoint:
+        """Capture the simulation state so it can be restored and continued later"""
+        active_bullets = [{
+            'origin': bullet['origin'].copy(),
+            'position': bullet['position'].copy(),
+            'velocity': bullet['velocity'].copy(),
+            'size': bullet['size'],
+            'color': bullet['color'],
+            'age': bullet['age']
+        } for bullet in self.active_bullets]
+        return EvaluatorCheckpoint(self.current_frame, self.interpreter.get_state(), self.rng.getstate(),
+                                   len(self.spawn_log), len(self.frames), active_bullets, self.record_frames)
+
+    def restore(self, checkpoint: EvaluatorCheckpoint):
+        """
+        Return to a checkpoint taken earlier in the current simulation, dropping everything
+        recorded after it. resume() then continues from the checkpoint's frame.
+        """
+        self.current_frame = checkpoint.frame
+        self.interpreter.set_state(checkpoint.interpreter_state)
+        self.rng.setstate(checkpoint.rng_state)
+        self.spawn_log.truncate(checkpoint.spawn_count)
+        del self.frames[checkpoint.frame_count:]
+        self.active_bullets = [dict(bullet, position=bullet['position'].copy(), velocity=bullet['velocity'].copy())
+                               for bullet in checkpoint.active_bullets]
+        self.record_frames = checkpoint.record_frames
+
+    def get_emitter_position(self, frame_number: int) -> Vector2:
+        """Get the position bullets are spawned from at a frame"""
+        if self.emitter_path is None:
+            return self.enemy_position.copy()
+        if callable(self.emitter_path):
+            x, y = self.emitter_path(frame_number)
+            return Vector2(x, y)
+        x, y = self.emitter_path[min(frame_number, len(self.emitter_path) - 1)]
+        return Vector2(float(x), float(y))
+
+    def _spawn_bullets(self) -> List[Dict]:
+        """Advance the pattern for the current frame and log the bullets it spawns"""
+        new_bullets = self._get_bullets_from_pattern()
+        for bullet_data in new_bullets:
+            self.spawn_log.append(self.current_frame, bullet_data['position'], bullet_data['velocity'], bullet_data['size'])
+        return new_bullets
     
     def _simulate_frame(self):
         """Simulate a single frame"""
         frame_snapshot = FrameSnapshot(self.current_frame)
         
         # Generate new bullets from the pattern using a custom method
-        new_bullets = self._get_bullets_from_pattern()
+        new_bullets = self._spawn_bullets()
         
         # Add new bullets to active bullets list
         for bullet_data in new_bullets:
@@ -121,9 +489,9 @@ class TalakatEvaluator:
                 age=bullet['age']
             )
             
-            # Update position and age for next frame
-            bullet['position'] += bullet['velocity']
+            # Update position and age for next frame (from the spawn position, like the closed form)
             bullet['age'] += 1
+            bullet['position'] = bullet['origin'] + bullet['velocity'] * bullet['age']
             
             # Check if bullet is out of bounds
             if self._is_bullet_out_of_bounds(bullet['position']):
@@ -184,15 +552,14 @@ class TalakatEvaluator:
                     self.interpreter.loop_stack.pop()
                     self.interpreter.loop_iterations.pop()
         elif token_type == TokenType.RANDOM:
-            import random
             param_type, min_val, max_val = value
             if param_type == TokenType.COLOR:
-                r = random.randint(0, 255)
-                g = random.randint(0, 255)
-                b = random.randint(0, 255)
+                r = self.rng.randint(0, 255)
+                g = self.rng.randint(0, 255)
+                b = self.rng.randint(0, 255)
                 self.interpreter.current_values[param_type] = (r, g, b)
             else:
-                rand_value = random.uniform(min_val, max_val)
+                rand_value = self.rng.uniform(min_val, max_val)
                 self.interpreter.current_values[param_type] = rand_value
         elif token_type == TokenType.SEQUENCE:
             param_type, values = value
@@ -205,6 +572,7 @@ class TalakatEvaluator:
         
         # Create bullet data based on current values
         if self.interpreter.wait_counter == 0:
+            origin = self.get_emitter_position(self.current_frame)
             # Ensure all necessary keys are in the dictionary
             for key in [TokenType.COUNT, TokenType.ANGLE, TokenType.SPREAD, 
                          TokenType.SPEED, TokenType.SIZE, TokenType.COLOR]:
@@ -234,7 +602,8 @@ class TalakatEvaluator:
                 
                 # Create bullet data dictionary instead of Bullet object
                 bullet_data = {
-                    'position': Vector2(self.enemy_position.x, self.enemy_position.y),
+                    'origin': Vector2(origin.x, origin.y),
+                    'position': Vector2(origin.x, origin.y),
                     'velocity': Vector2(vel_x, vel_y),
                     'size': size,
                     'color': color,
@@ -264,24 +633,366 @@ class TalakatEvaluator:
             return self.frames[frame_number]
         return None
     
+    def get_exit_frames(self) -> np.ndarray:
+        """
+        Get the frame each logged bullet is culled at, computed from its linear motion
+
+        A bullet spawned at frame s is part of frames s .. exit - 1, matching the stepped
+        simulation where a bullet is removed after the update that takes it out of bounds
+        (strictly beyond a bound, see _is_bullet_out_of_bounds). A bullet spawned out of bounds
+        is culled after its first update unless that brings it in. Bullets that never leave
+        the bounds get an infinite exit frame.
+
+        Returns:
+            Float array (N,) of exclusive exit frames, one per spawn log entry
+        """
+        cached = self.spawn_log.cache.get('exit_frames')
+        if cached is not None:
+            return cached
+
+        log = self.spawn_log.arrays()
+        if len(self.spawn_log) == 0:
+            return np.zeros(0, dtype=np.float64)
+
+        position = log['position']
+        velocity = log['velocity']
+        low = np.array([self.bounds_left, self.bounds_top])
+        high = np.array([self.bounds_right, self.bounds_bottom])
+
+        def out_of_bounds(steps):
+            # Per axis, whether the coordinate is out of bounds after the given steps
+            with np.errstate(invalid='ignore'):
+                coordinate = position + velocity * steps
+            return (coordinate < low) | (coordinate > high)
+
+        # Per axis, the first step j >= 1 where the coordinate is out of bounds: the first step
+        # if it starts out there, otherwise the step that crosses the bound it moves towards
+        with np.errstate(divide='ignore', invalid='ignore'):
+            steps_high = np.floor((high - position) / velocity) + 1
+            steps_low = np.floor((low - position) / velocity) + 1
+        steps = np.where(velocity > 0, steps_high, np.where(velocity < 0, steps_low, np.inf))
+        steps = np.where(out_of_bounds(1), 1, np.maximum(steps, 2))
+
+        # The division can round to a neighbouring step, settle it with the culling comparison
+        steps = np.where(out_of_bounds(steps), steps, steps + 1)
+        steps = np.where((steps > 2) & out_of_bounds(steps - 1), steps - 1, steps)
+
+        lifetimes = steps.min(axis=1)
+        exit_frames = log['frame'] + lifetimes
+        self.spawn_log.cache['exit_frames'] = exit_frames
+        return exit_frames
+
+    def check_closed_form(self) -> List[str]:
+        """
+        Compare the closed-form bullet counts and coverage with the recorded frames of a
+        simulate(record_frames=True) run
+
+        Returns:
+            A description of every mismatch, empty when both agree
+        """
+        if len(self.frames) != self.current_frame:
+            raise ValueError("check_closed_form() needs the frames of simulate(record_frames=True)")
+
+        mismatches = []
+        stepped_counts = np.array([frame.get_bullet_count() for frame in self.frames], dtype=np.int64)
+        counts = self.get_bullet_counts()
+        differing = np.flatnonzero(stepped_counts != counts)
+        if len(differing):
+            first = differing[0]
+            mismatches.append(f"bullet count differs on {len(differing)} frames "
+                              f"(frame {first}: {counts[first]} vs {stepped_counts[first]} stepped)")
+        if stepped_counts.sum() != counts.sum():
+            mismatches.append(f"{counts.sum()} vs {stepped_counts.sum()} stepped bullets over all frames")
+
+        positions = np.array([(bullet.position.x, bullet.position.y) for frame in self.frames for bullet in frame.bullets])
+        stepped_area = (0, 0, 0, 0)
+        if len(positions):
+            (min_x, min_y), (max_x, max_y) = positions.min(axis=0), positions.max(axis=0)
+            stepped_area = (float(min_x), float(max_x), float(min_y), float(max_y))
+        if self.get_coverage_area() != stepped_area:
+            mismatches.append(f"coverage {self.get_coverage_area()} vs {stepped_area} stepped")
+        return mismatches
+
+    def get_bullet_lifetimes(self) -> np.ndarray:
+        """
+        Get the number of frames each logged bullet stays in bounds (ignoring the end of the simulation)
+
+        Returns:
+            Float array (N,), infinite for bullets that never leave the bounds
+        """
+        return self.get_exit_frames() - self.spawn_log.arrays()['frame']
+
+    def get_bullet_counts(self) -> np.ndarray:
+        """
+        Get the number of bullets present in each simulated frame, from spawn and exit frames
+
+        Returns:
+            Integer array with one count per simulated frame
+        """
+        num_frames = self.current_frame
+        if num_frames == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        spawn = self.spawn_log.arrays()['frame']
+        exits = np.minimum(self.get_exit_frames(), num_frames).astype(np.int64)
+        changes = np.bincount(spawn, minlength=num_frames + 1) - np.bincount(exits, minlength=num_frames + 1)
+        return np.cumsum(changes[:num_frames])
+    
+    def get_bullets_at_frame(self, frame_number: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the bullets present in a frame from the spawn log, without stepping them
+
+        The log is in spawn order, so the bullets spawned by the frame are a prefix of it. The
+        running maximum of the exit frames is sorted too: every bullet before the first entry
+        above frame_number has left, so only the slice between the two is looked at.
+
+        Returns:
+            (positions (M, 2), velocities (M, 2), sizes (M,)) arrays
+        """
+        log = self.spawn_log.arrays()
+        exit_frames = self.get_exit_frames()
+        latest_exit = self.spawn_log.cache.get('latest_exit')
+        if latest_exit is None:
+            latest_exit = self.spawn_log.cache['latest_exit'] = np.maximum.accumulate(exit_frames)
+
+        first = np.searchsorted(latest_exit, frame_number, side='right')
+        end = np.searchsorted(log['frame'], frame_number, side='right')
+        window = slice(first, max(first, end))
+        alive = exit_frames[window] > frame_number
+        ages = (frame_number - log['frame'][window][alive])[:, np.newaxis]
+        velocities = log['velocity'][window][alive]
+        return log['position'][window][alive] + velocities * ages, velocities, log['size'][window][alive]
+
+    def get_free_space(self, cell_size: float = 16.0, player_radius: float = 2.0,
+                       player_speed: Optional[float] = None, start_position: Optional[Vector2] = None,
+                       area: Optional[Tuple[float, float, float, float]] = None,
+                       stop_when_blocked: bool = False) -> FreeSpaceAnalysis:
+        """
+        Analyse how much room the pattern leaves the player over the simulated frames
+
+        The reachable area is covered by a grid of cells. A cell is safe when a player centred
+        on it clears every bullet. Frames are sampled every frame_step = ceil(cell_size / player_speed)
+        frames, the time the player needs to cross one cell, and bullets are inflated by the
+        distance they travel in half a step so fast bullets are not missed between samples.
+        Reachability starts from the spawn cell and spreads to the 8 neighbouring cells per
+        step, through safe cells only.
+
+        Args:
+            cell_size: Grid cell size in world units
+            player_radius: Collision radius of the player
+            player_speed: Player speed per frame (defaults to Globals.player_speed)
+            start_position: Player start (defaults to the Player spawn point)
+            area: (left, right, top, bottom) area the player can move in (defaults to the world bounds)
+            stop_when_blocked: Stop sampling at the first frame without a safe reachable cell,
+                the per-sample metrics then end there
+
+        Returns:
+            FreeSpaceAnalysis with per-sample metrics
+        """
+        if player_speed is None:
+            player_speed = Globals.player_speed
+        if start_position is None:
+            start_position = Vector2(0, Globals.world_bottom - 120)
+        if area is None:
+            area = (Globals.world_left, Globals.world_right, Globals.world_top, Globals.world_bottom)
+        left, right, top, bottom = area
+        left, right = left + player_radius, right - player_radius
+        top, bottom = top + player_radius, bottom - player_radius
+
+        # Cell centres of the grid covering the reachable area
+        xs = np.arange(left + cell_size / 2, right, cell_size)
+        ys = np.arange(top + cell_size / 2, bottom, cell_size)
+        cell_x, cell_y = np.meshgrid(xs, ys)
+        cells = np.column_stack((cell_x.ravel(), cell_y.ravel()))  # Row-major, matching the (rows, cols) grids
+        border_distance = np.minimum.reduce([cells[:, 0] - left, right - cells[:, 0],
+                                             cells[:, 1] - top, bottom - cells[:, 1]]) + player_radius
+
+        frame_step = max(1, math.ceil(cell_size / player_speed))
+        sample_frames = np.arange(0, self.current_frame, frame_step)
+
+        start_col = int(np.clip((start_position.x - left) // cell_size, 0, len(xs) - 1))
+        start_row = int(np.clip((start_position.y - top) // cell_size, 0, len(ys) - 1))
+        reachable = np.zeros((len(ys), len(xs)), dtype=bool)
+        reachable[start_row, start_col] = True
+
+        safe_fraction = np.empty(len(sample_frames))
+        largest_empty_circle = np.empty(len(sample_frames))
+        reachable_fraction = np.empty(len(sample_frames))
+        blocked_frame = None
+
+        for i, frame_number in enumerate(sample_frames):
+            positions, velocities, sizes = self.get_bullets_at_frame(int(frame_number))
+
+            # Distance from every cell centre to the edge of every bullet, as one (rows, cols, bullets)
+            # broadcast built from the separable per-axis squared offsets
+            if len(positions):
+                travel = np.hypot(velocities[:, 0], velocities[:, 1]) * (frame_step / 2)
+                dx2 = np.square(xs[:, np.newaxis] - positions[:, 0], dtype=np.float32)
+                dy2 = np.square(ys[:, np.newaxis] - positions[:, 1], dtype=np.float32)
+                edge_distance = dy2[:, np.newaxis, :] + dx2[np.newaxis, :, :]
+                np.sqrt(edge_distance, out=edge_distance)
+                edge_distance -= sizes.astype(np.float32)
+                clearance = edge_distance.min(axis=2).ravel()
+                edge_distance -= (travel + player_radius).astype(np.float32)
+                safe = (edge_distance.min(axis=2) > 0).ravel()
+            else:
+                clearance = np.full(len(cells), np.inf)
+                safe = np.ones(len(cells), dtype=bool)
+
+            safe_fraction[i] = safe.mean()
+            largest_empty_circle[i] = np.minimum(clearance, border_distance).max()
+
+            # Spread reachability to neighbouring cells, then drop cells that are not safe
+            if i > 0:
+                padded = np.pad(reachable, 1)
+                reachable = np.zeros_like(reachable)
+                for dy in range(3):
+                    for dx in range(3):
+                        reachable |= padded[dy:dy + reachable.shape[0], dx:dx + reachable.shape[1]]
+            reachable &= safe.reshape(reachable.shape)
+            reachable_fraction[i] = reachable.mean()
+
+            if blocked_frame is None and not reachable.any():
+                blocked_frame = int(frame_number)
+                if stop_when_blocked:
+                    sampled = slice(0, i + 1)
+                    return FreeSpaceAnalysis(sample_frames[sampled], safe_fraction[sampled], largest_empty_circle[sampled],
+                                             reachable_fraction[sampled], blocked_frame)
+
+        return FreeSpaceAnalysis(sample_frames, safe_fraction, largest_empty_circle, reachable_fraction, blocked_frame)
+
+    def get_difficulty_metrics(self, cell_size: float = 16.0, stop_when_blocked: bool = False) -> Dict[str, float]:
+        """
+        Get scalar difficulty metrics of the last simulation, cheap enough for fitness functions
+
+        Works with simulate(record_frames=False), everything is derived from the spawn log.
+
+        Args:
+            cell_size: Free space grid cell size, coarser grids are cheaper (see get_free_space)
+            stop_when_blocked: End the free space analysis at the first frame without a safe
+                path; the safe fraction and empty circle metrics then cover the frames up to it
+
+        Returns:
+            Dictionary of metric name to value
+        """
+        free_space = self.get_free_space(cell_size=cell_size, stop_when_blocked=stop_when_blocked)
+        if len(free_space.frames) == 0:
+            return {}
+
+        survived = free_space.blocked_frame if free_space.blocked_frame is not None else self.current_frame
+        return {
+            'mean_safe_fraction': float(free_space.safe_fraction.mean()),
+            'min_safe_fraction': float(free_space.safe_fraction.min()),
+            'mean_largest_empty_circle': float(free_space.largest_empty_circle.mean()),
+            'min_largest_empty_circle': float(free_space.largest_empty_circle.min()),
+            'safe_path': 1.0 if free_space.safe_path else 0.0,
+            'survivable_fraction': survived / self.current_frame,
+            'max_bullets': float(self.get_max_bullet_count()),
+            'avg_bullets': self.get_average_bullet_count(),
+        }
+
+    def estimate_survival(self, num_agents: int = 1000, policy: str = 'random_walk', window: int = 60,
+                          seed: Optional[int] = None, start_position: Optional[Vector2] = None,
+                          start_spread: float = 40.0, player_radius: float = 2.0,
+                          player_speed: Optional[float] = None) -> SurvivalEstimate:
+        """
+        Estimate how likely a player is to get hit by the last simulated pattern
+
+        Every agent is stepped in lockstep against the bullets of each frame, with positions,
+        decisions and collisions computed as arrays over (agent, nearby bullet) pairs found
+        through a SpatialGrid, so the cost grows with array size rather than with the number
+        of Python-level players.
+
+        Policies:
+            'random_walk': keep a random heading (or stand still), changing it now and then
+            'greedy_dodge': move away from nearby bullets and their positions 10 frames ahead
+            'bot': the Player bot heuristic (12 box casts scored for safety and position)
+
+        Args:
+            num_agents: Number of simulated players
+            policy: Movement policy of the agents
+            window: Frames per hit probability window
+            seed: Seed for start positions and random decisions
+            start_position: Centre of the start positions (defaults to the Player spawn point)
+            start_spread: Agents start uniformly within +/- this distance of start_position
+            player_radius: Collision radius of an agent
+            player_speed: Movement per frame (defaults to Globals.player_speed)
+
+        Returns:
+            SurvivalEstimate with the survival curve and windowed hit probabilities
+        """
+        if policy not in ('random_walk', 'greedy_dodge', 'bot'):
+            raise ValueError(f"Unknown survival policy: {policy}")
+        if player_speed is None:
+            player_speed = Globals.player_speed
+        if start_position is None:
+            start_position = Vector2(0, Globals.world_bottom - 120)
+
+        rng = np.random.default_rng(seed)
+        low = np.array([Globals.world_left + player_radius, Globals.world_top + player_radius])
+        high = np.array([Globals.world_right - player_radius, Globals.world_bottom - player_radius])
+
+        positions = np.array([start_position.x, start_position.y]) + rng.uniform(-start_spread, start_spread, (num_agents, 2))
+        positions = np.clip(positions, low, high)
+        hit_frames = np.full(num_agents, -1, dtype=np.int64)
+        alive = np.ones(num_agents, dtype=bool)
+
+        # Random walk headings: 8 directions plus standing still
+        angles = np.radians(np.arange(0, 360, 45))
+        headings = np.vstack(([0.0, 0.0], np.column_stack((np.cos(angles), np.sin(angles)))))
+        heading = rng.integers(0, len(headings), num_agents)
+
+        world = (Globals.world_left, Globals.world_right, Globals.world_top, Globals.world_bottom)
+        grid = SpatialGrid(32, world)
+        future_grid = SpatialGrid(32, world)
+
+        for frame_number in range(self.current_frame):
+            bullet_positions, bullet_velocities, sizes = self.get_bullets_at_frame(frame_number)
+            agents = np.flatnonzero(alive)
+            if agents.size == 0:
+                break
+            grid.build(bullet_positions)
+
+            if policy == 'random_walk':
+                turning = rng.random(agents.size) < 1 / 30  # New heading about twice a second
+                heading[agents[turning]] = rng.integers(0, len(headings), int(turning.sum()))
+                moves = headings[heading[agents]]
+            elif policy == 'greedy_dodge':
+                future_grid.build(bullet_positions + bullet_velocities * 10)
+                moves = _greedy_dodge_directions(positions[agents], bullet_velocities, sizes, [grid, future_grid])
+            else:
+                moves = _bot_directions(positions[agents], bullet_velocities, sizes, grid)
+
+            positions[agents] = np.clip(positions[agents] + moves * player_speed, low, high)
+
+            # Circle collision of the living agents against the bullets in their cells
+            if len(sizes):
+                agent_index, bullet_index = grid.candidate_pairs(positions[agents], sizes.max() + player_radius)
+                offsets = positions[agents[agent_index]] - bullet_positions[bullet_index]
+                touching = (offsets ** 2).sum(axis=1) < (sizes[bullet_index] + player_radius) ** 2
+                hit = agents[np.unique(agent_index[touching])]
+                hit_frames[hit] = frame_number
+                alive[hit] = False
+
+        return SurvivalEstimate(policy, hit_frames, self.current_frame, window)
+
     def get_max_bullet_count(self) -> int:
         """Get the maximum number of bullets present in any single frame"""
-        if not self.frames:
+        counts = self.get_bullet_counts()
+        if counts.size == 0:
             return 0
-        return max(frame.get_bullet_count() for frame in self.frames)
+        return int(counts.max())
     
     def get_total_bullets_spawned(self) -> int:
         """Get the total number of bullets spawned throughout the simulation"""
-        total = 0
-        for frame in self.frames:
-            # Count bullets with age 0 (newly spawned this frame)
-            total += sum(1 for bullet in frame.bullets if bullet.age == 0)
-        return total
+        return len(self.spawn_log)
     
     def get_pattern_density_at_point(self, point: Vector2, radius: float = 50.0) -> List[int]:
         """
         Get the number of bullets near a point across all frames
         
+        Works with simulate(record_frames=False), bullet positions come from the spawn log.
+        
         Args:
             point: Center point to check
             radius: Radius around the point
@@ -289,42 +1000,112 @@ class TalakatEvaluator:
         Returns:
             List of bullet counts per frame
         """
+        center = np.array([point.x, point.y])
         density = []
-        for frame in self.frames:
-            count = len(frame.get_bullets_in_area(point, radius))
-            density.append(count)
+        for frame_number in range(self.current_frame):
+            positions, _, _ = self.get_bullets_at_frame(frame_number)
+            distances = np.sqrt(np.square(positions - center).sum(axis=1))
+            density.append(int(np.count_nonzero(distances <= radius)))
         return density
     
     def get_coverage_area(self) -> Tuple[float, float, float, float]:
         """
         Get the bounding box of all bullet positions across all frames
         
+        Positions are linear in time, so each bullet's extent is spanned by its spawn
+        position and its position in the last frame it is part of.
+        
         Returns:
             (min_x, max_x, min_y, max_y) tuple
         """
-        if not self.frames:
+        if len(self.spawn_log) == 0:
             return (0, 0, 0, 0)
-            
-        min_x = min_y = float('inf')
-        max_x = max_y = float('-inf')
-        
-        for frame in self.frames:
-            for bullet in frame.bullets:
-                min_x = min(min_x, bullet.position.x)
-                max_x = max(max_x, bullet.position.x)
-                min_y = min(min_y, bullet.position.y)
-                max_y = max(max_y, bullet.position.y)
-        
-        return (min_x, max_x, min_y, max_y)
-    
+
+        log = self.spawn_log.arrays()
+        last_frames = np.minimum(self.get_exit_frames(), self.current_frame) - 1
+        ages = (last_frames - log['frame'])[:, np.newaxis]
+        first = log['position']
+        last = first + log['velocity'] * ages
+
+        min_x, min_y = np.minimum(first, last).min(axis=0)
+        max_x, max_y = np.maximum(first, last).max(axis=0)
+        return (float(min_x), float(max_x), float(min_y), float(max_y))
+
+    def get_average_bullet_count(self) -> float:
+        """Get the average number of bullets per frame"""
+        counts = self.get_bullet_counts()
+        if counts.size == 0:
+            return 0.0
+        return float(counts.mean())
+
+    def is_stochastic(self) -> bool:
+        """Check whether the pattern contains RANDOM tokens"""
+        return any(token_type == TokenType.RANDOM for token_type, _ in self.pattern)
+
+    def monte_carlo(self, num_frames: int, metrics: Optional[Dict[str, Callable[['TalakatEvaluator'], float]]] = None,
+                    confidence: float = 0.95, rel_precision: float = 0.05, abs_precision: float = 0.0,
+                    min_seeds: int = 8, max_seeds: int = 1000, base_seed: int = 0,
+                    quantiles: Tuple[float, ...] = (0.05, 0.5, 0.95), record_frames: bool = False) -> MonteCarloResult:
+        """
+        Simulate the pattern over many seeds until every metric's mean is known precisely enough
+
+        Seeds are run one after another and aggregated with streaming statistics. The run stops
+        once the confidence interval half width of every metric is within
+        max(abs_precision, rel_precision * |mean|), so low-variance patterns finish after
+        min_seeds while noisy ones keep sampling. Patterns without RANDOM tokens run a single seed.
+
+        Args:
+            num_frames: Number of frames to simulate per seed
+            metrics: Mapping of metric name to a function of the evaluator (defaults to MONTE_CARLO_METRICS)
+            confidence: Confidence level of the intervals
+            rel_precision: Target half width relative to the mean
+            abs_precision: Target absolute half width (useful for metrics whose mean is near 0)
+            min_seeds: Minimum seeds before the stopping rule is checked
+            max_seeds: Hard limit on the number of seeds
+            base_seed: Seed of the first run, later runs use base_seed + i
+            quantiles: Quantiles to track for each metric
+            record_frames: Whether to store FrameSnapshots, only needed by custom metrics reading frames
+
+        Returns:
+            MonteCarloResult with the aggregated metrics (the evaluator keeps the last seed's frames)
+        """
+        if metrics is None:
+            metrics = MONTE_CARLO_METRICS
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        statistics = {name: RunningStatistic(quantiles) for name in metrics}
+        stochastic = self.is_stochastic()
+        converged = False
+        seeds_run = 0
+
+        for i in range(max_seeds):
+            self.rng.seed(base_seed + i)
+            self.simulate(num_frames, record_frames=record_frames)
+            for name, metric in metrics.items():
+                statistics[name].add(float(metric(self)))
+            seeds_run += 1
+
+            if not stochastic:
+                # Every seed gives the same result
+                converged = True
+                break
+
+            if seeds_run >= min_seeds and all(
+                    stat.half_width(z) <= max(abs_precision, rel_precision * abs(stat.mean))
+                    for stat in statistics.values()):
+                converged = True
+                break
+
+        return MonteCarloResult(statistics, confidence, seeds_run, converged)
+
     def print_statistics(self):
         """Print simulation statistics"""
-        if not self.frames:
+        if self.current_frame == 0:
             print("No simulation data available")
             return
             
         print("=== Talakat Pattern Simulation Statistics ===")
-        print(f"Frames simulated: {len(self.frames)}")
+        print(f"Frames simulated: {self.current_frame}")
         print(f"Total bullets spawned: {self.get_total_bullets_spawned()}")
         print(f"Max bullets on screen: {self.get_max_bullet_count()}")
         
@@ -334,9 +1115,124 @@ class TalakatEvaluator:
         print(f"Coverage height: {max_y - min_y:.1f}")
         
         # Frame-by-frame bullet count
-        bullet_counts = [frame.get_bullet_count() for frame in self.frames]
-        avg_bullets = sum(bullet_counts) / len(bullet_counts)
-        print(f"Average bullets per frame: {avg_bullets:.1f}")
+        print(f"Average bullets per frame: {self.get_average_bullet_count():.1f}")
+
+        lifetimes = self.get_bullet_lifetimes()
+        finite = lifetimes[np.isfinite(lifetimes)]
+        if finite.size:
+            print(f"Bullet lifetime: median {np.median(finite):.0f} frames, max {finite.max():.0f} frames")
+
+# Update (counted from 0 after the enemy spawned) in which an in-game Enemy fires its first
+# shot: entering and invincibility both end in its 60th update
+ENEMY_FIRST_SHOT_FRAME = 59
+
+def enemy_emitter_path(start_x: float, num_frames: int, start_frame: int = ENEMY_FIRST_SHOT_FRAME,
+                       spawn_frame: int = 0) -> np.ndarray:
+    """
+    Build the emitter path of an in-game Enemy: it enters from above the screen, then sways
+    side to side with sin(time) on the simulation clock.
+
+    Args:
+        start_x: Horizontal spawn position of the enemy
+        num_frames: Number of positions to generate
+        start_frame: Update since the enemy spawned at which the path starts, by default the
+            one of its first shot, so frame 0 of a simulation lines up with it
+        spawn_frame: Clock.frame of the enemy's first update, the phase of its sway: 0 for the
+            enemy of a new game, Game.clock.frame + 1 for one spawned by Game.spawn_enemy()
+
+    Returns:
+        (num_frames, 2) array of positions
+    """
+    radius = 24            # Enemy.radius
+    enter_speed = 3.0      # Enemy.enter_speed
+    target_y = Globals.world_top + 90
+    x, y = start_x, Globals.world_top - 90
+    path = np.empty((num_frames, 2))
+
+    for frame_number in range(start_frame + num_frames):
+        # Same order as Enemy.update(): move, then clamp
+        if y < target_y:
+            y = min(y + enter_speed, target_y)
+        else:
+            x += math.sin((spawn_frame + frame_number) / 60) * Globals.enemy_speed
+        x = max(Globals.world_left + radius, min(x, Globals.world_right - radius))
+        if frame_number >= start_frame:
+            path[frame_number - start_frame] = (x, y)
+    return path
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Normalize the last axis, leaving zero vectors at zero"""
+    lengths = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+
+def _sum_by_agent(agent_index: np.ndarray, values: np.ndarray, num_agents: int) -> np.ndarray:
+    """Sum (pairs, 2) values into (agents, 2) rows"""
+    return np.column_stack((np.bincount(agent_index, weights=values[:, 0], minlength=num_agents),
+                            np.bincount(agent_index, weights=values[:, 1], minlength=num_agents)))
+
+def _greedy_dodge_directions(positions: np.ndarray, bullet_velocities: np.ndarray, sizes: np.ndarray,
+                             grids: List[SpatialGrid], danger_radius: float = 60.0) -> np.ndarray:
+    """
+    Unit directions pushing each agent away from bullets near it, with one grid per lookahead
+    (bullets now and 10 frames ahead)
+    """
+    push = np.zeros_like(positions)
+    if len(sizes) == 0:
+        return push
+
+    for grid in grids:
+        agent_index, bullet_index = grid.query_pairs(positions, danger_radius + sizes.max())
+        away = positions[agent_index] - grid.positions[bullet_index]
+        distance = np.linalg.norm(away, axis=1) - sizes[bullet_index]
+        # Inverse square weight inside the danger radius, nothing outside
+        weight = np.where(distance < danger_radius, 1.0 / np.maximum(distance, 1.0) ** 2, 0.0)
+        push += _sum_by_agent(agent_index, _normalize_rows(away) * weight[:, np.newaxis], len(positions))
+    return _normalize_rows(push)
+
+def _bot_directions(positions: np.ndarray, bullet_velocities: np.ndarray, sizes: np.ndarray,
+                    grid: SpatialGrid) -> np.ndarray:
+    """
+    Unit directions chosen by the Player bot heuristic for each agent. score_directions() is
+    evaluated for every (agent, direction, nearby bullet) at once; bullets too far away to
+    reach any cast are skipped through the spatial grid.
+    """
+    cast_count, cast_width, cast_length = 12, 8, 30  # Player.bot_cast_* defaults
+    directions = bot_cast_directions(cast_count)
+
+    agent_index = bullet_index = np.zeros(0, dtype=np.int64)
+    if len(sizes):
+        # A bullet (or its position 10 frames ahead) can only touch a cast within this distance
+        reach = cast_length * 0.5 + cast_width * 0.5 + sizes.max() + 10 * np.linalg.norm(bullet_velocities, axis=1).max()
+        agent_index, bullet_index = grid.query_pairs(positions, reach)
+    scores = score_directions(positions, directions, cast_width, cast_length, grid.positions, bullet_velocities, sizes,
+                              agent_index, bullet_index)
+
+    best = scores.argmax(axis=1)
+    moves = directions[best]
+
+    # No safe direction: head for the centre-bottom shooting position
+    retreat = scores[np.arange(len(positions)), best] < 0
+    if retreat.any():
+        target = np.array([0, Globals.world_bottom - 40])
+        moves[retreat] = _normalize_rows(target - positions[retreat])
+    return moves
+
+def _coverage_width(evaluator: TalakatEvaluator) -> float:
+    min_x, max_x, _, _ = evaluator.get_coverage_area()
+    return max_x - min_x
+
+def _coverage_height(evaluator: TalakatEvaluator) -> float:
+    _, _, min_y, max_y = evaluator.get_coverage_area()
+    return max_y - min_y
+
+# Default metrics aggregated by TalakatEvaluator.monte_carlo()
+MONTE_CARLO_METRICS: Dict[str, Callable[[TalakatEvaluator], float]] = {
+    'total_spawned': lambda evaluator: evaluator.get_total_bullets_spawned(),
+    'max_bullets': lambda evaluator: evaluator.get_max_bullet_count(),
+    'avg_bullets': lambda evaluator: evaluator.get_average_bullet_count(),
+    'coverage_width': _coverage_width,
+    'coverage_height': _coverage_height,
+}
 
 def test_evaluator():
     """Test function for the TalakatEvaluator"""
@@ -369,5 +1265,17 @@ def test_evaluator():
             if frame.bullets:
                 print(f"  First bullet: {frame.bullets[0]}")
 
+    # The closed-form metrics have to agree with the stepped frames for every pattern, with
+    # a fixed and a moving emitter
+    print("\n=== Closed Form vs Stepped ===")
+    world = (Globals.world_left, Globals.world_right, Globals.world_top, Globals.world_bottom)
+    for name, pattern in PATTERNS.items():
+        for label, bounds, path in (("bounds", (-500, 500, -500, 500), None),
+                                    ("enemy path", world, enemy_emitter_path(0, 300))):
+            evaluator = TalakatEvaluator(pattern, enemy_pos, bounds, seed=0, emitter_path=path)
+            evaluator.simulate(300)
+            mismatches = evaluator.check_closed_form()
+            print(f"{name} ({label}): {'; '.join(mismatches) if mismatches else 'match'}")
+
 if __name__ == "__main__":
     test_evaluator()
@@ -4,6 +4,7 @@ from game import Game
 gym.register(
     id="Talakat-v0",
     entry_point=Game,
+    kwargs={"headless": True},
 )
 env = gym.make("Talakat-v0")
 
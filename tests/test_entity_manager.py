@@ -0,0 +1,40 @@
+import numpy as np
+from game import Game
+from entity import EntityTag
+from entity_manager import _entity_rows
+from bullet_patterns import get_pattern_for_level
+
+
+def assert_matches_rebuild(entity_manager, tag):
+    arrays = entity_manager.get_tag_arrays(tag)
+    entities = [entity for entity in entity_manager.get_entities_by_tag(tag) if entity.is_active()]
+    rows = _entity_rows(entities)
+    assert list(arrays.entities) == entities
+    assert np.array_equal(arrays.positions, rows[:, 0:2])
+    assert np.array_equal(arrays.velocities, rows[:, 2:4])
+    assert np.array_equal(arrays.radii, rows[:, 4])
+
+
+def test_linear_tag_store_matches_rebuild():
+    game = Game(headless=True)
+    game.reset(seed=7)
+    game.player.bot_enabled = True
+    game.player.bot_mode = 'planner'  # Survives long enough to restore the snapshot
+    game.player.bot_planner.budget_us = None  # Plans the same on any machine
+    game.level = 8
+    game.enemy.current_pattern = get_pattern_for_level(8, game.rng)
+
+    snapshot = None
+    most_bullets = 0
+    for frame in range(900):
+        assert not game.game_over
+        game.update()
+        if frame == 300:
+            snapshot = game.clone_state()
+        if frame == 600:
+            game.restore_state(snapshot)
+        for tag in (EntityTag.ENEMY_BULLET, EntityTag.PLAYER_BULLET):
+            assert_matches_rebuild(game.entity_manager, tag)
+        most_bullets = max(most_bullets, len(game.entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET)))
+
+    assert most_bullets > 0
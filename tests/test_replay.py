@@ -0,0 +1,14 @@
+import pytest
+from replay import BOT_MODES, Replay, check_round_trip
+
+
+@pytest.mark.parametrize("bot_mode", BOT_MODES)
+def test_round_trip(bot_mode, tmp_path):
+    path = str(tmp_path / "session.nhrp")
+    result = check_round_trip(bot_mode, seed=4, frames=360, path=path)
+    assert result.ok, result.mismatches
+    assert result.frames == 360
+
+    replay = Replay.load(path)
+    assert replay.bot_config['player']['bot_mode'] == bot_mode
+    assert len(replay.checksums) == 6
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from pygame.math import Vector2
+from globals import Globals
+from bullet_patterns import PATTERNS
+from talakat_evaluator import TalakatEvaluator, enemy_emitter_path
+
+WORLD = (Globals.world_left, Globals.world_right, Globals.world_top, Globals.world_bottom)
+
+
+@pytest.mark.parametrize("name", sorted(PATTERNS))
+@pytest.mark.parametrize("bounds", [None, (-500, 500, -500, 500), WORLD], ids=["default", "square", "world"])
+def test_closed_form_matches_stepped(name, bounds):
+    evaluator = TalakatEvaluator(PATTERNS[name], Vector2(0, -200), bounds, seed=1)
+    evaluator.simulate(300)
+    assert evaluator.check_closed_form() == []
+
+
+@pytest.mark.parametrize("name", sorted(PATTERNS))
+def test_closed_form_matches_stepped_on_enemy_path(name):
+    evaluator = TalakatEvaluator(PATTERNS[name], Vector2(0, -200), WORLD, seed=1,
+                                 emitter_path=enemy_emitter_path(0, 600))
+    evaluator.simulate(600)
+    assert evaluator.check_closed_form() == []
+
+
+@pytest.mark.parametrize("name", sorted(PATTERNS))
+def test_spawn_log_queries_match_frames(name):
+    evaluator = TalakatEvaluator(PATTERNS[name], Vector2(0, -200), WORLD, seed=1)
+    evaluator.simulate(300)
+
+    for frame in evaluator.frames:
+        positions, _, _ = evaluator.get_bullets_at_frame(frame.frame_number)
+        stepped = np.array([(bullet.position.x, bullet.position.y) for bullet in frame.bullets]).reshape(-1, 2)
+        assert np.array_equal(positions, stepped)
+
+    point = Vector2(30, -150)
+    stepped_density = [len(frame.get_bullets_in_area(point, 50)) for frame in evaluator.frames]
+    assert evaluator.get_pattern_density_at_point(point, 50) == stepped_density
+
+    # The spawn log alone gives the same answers
+    unrecorded = TalakatEvaluator(PATTERNS[name], Vector2(0, -200), WORLD, seed=1)
+    unrecorded.simulate(300, record_frames=False)
+    assert unrecorded.get_pattern_density_at_point(point, 50) == stepped_density
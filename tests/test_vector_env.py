@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from gymnasium.vector import AutoresetMode
+from pygame.math import Vector2
+from game import Game
+from entity import EntityTag
+from entity_manager import EntityManager
+from bullet_patterns import PATTERNS
+from talakat import TalakatInterpreter, TokenType
+from vector_env import TalakatVectorEnv, loop_stack_depth
+
+
+def _normalized(pattern):
+    return [token if isinstance(token, tuple) else (token, None) for token in pattern]
+
+
+# RANDOM tokens draw from different generators in Game and the vector env
+DETERMINISTIC_PATTERNS = sorted(name for name, pattern in PATTERNS.items()
+                                if all(token[0] != TokenType.RANDOM for token in _normalized(pattern)))
+
+
+@pytest.mark.parametrize("name", DETERMINISTIC_PATTERNS)
+def test_matches_game(name):
+    pattern = _normalized(PATTERNS[name])
+    game = Game(headless=True)
+    game.reset(seed=3)
+    game.enemy.current_pattern = pattern
+    env = TalakatVectorEnv(1)
+    env.reset(seed=3)
+    env.enemy_pos[0] = (game.enemy.position.x, game.enemy.position.y)
+    env._compile_pattern(0, pattern)
+
+    rng = np.random.default_rng(3)
+    for _ in range(600):
+        action = int(rng.integers(0, 5))  # Moves only, the enemy keeps its pattern
+        game.step(action)
+        env.step(np.array([action]))
+        if game.game_over:
+            break
+
+        assert env.player_lives[0] == game.player.lives
+        assert np.allclose(env.player_pos[0], (game.player.position.x, game.player.position.y))
+        assert np.allclose(env.enemy_pos[0], (game.enemy.position.x, game.enemy.position.y))
+        bullets = game.entity_manager.get_tag_arrays(EntityTag.ENEMY_BULLET).positions
+        vector_bullets = env.bullet_pos[0][env.bullet_alive[0]]
+        assert len(vector_bullets) == len(bullets)
+        if len(bullets):
+            # Every bullet has a counterpart (float32 in the vector env)
+            distances = np.sqrt(((bullets[:, np.newaxis] - vector_bullets[np.newaxis]) ** 2).sum(axis=2))
+            assert distances.min(axis=1).max() < 0.01
+            assert distances.min(axis=0).max() < 0.01
+
+
+LOOP, END, WAIT = (TokenType.LOOP, 2), (TokenType.ENDLOOP, None), (TokenType.WAIT, 1)
+LOOP_PATTERNS = [
+    [LOOP, (TokenType.COUNT, 1), WAIT, (TokenType.LOOP, 3), (TokenType.COUNT, 2), WAIT, END, END],
+    [END, (TokenType.LOOP, 3), (TokenType.COUNT, 1), WAIT],
+    [LOOP, (TokenType.COUNT, 1), WAIT, LOOP, (TokenType.COUNT, 2), (TokenType.LOOP, 3), WAIT, END, (TokenType.COUNT, 3)],
+    [END, END, LOOP, (TokenType.COUNT, 1), WAIT, LOOP, (TokenType.COUNT, 2), LOOP, WAIT, (TokenType.COUNT, 5)],
+]
+
+
+@pytest.mark.parametrize("pattern", LOOP_PATTERNS)
+def test_loop_stack_matches_interpreter(pattern):
+    env = TalakatVectorEnv(1, loop_depth=loop_stack_depth(pattern))
+    env.reset(seed=0)
+    env._compile_pattern(0, pattern)
+    env.token_index[0] = env.wait_counter[0] = env.loop_size[0] = 0
+    interpreter = TalakatInterpreter()
+    entity_manager = EntityManager()
+
+    for _ in range(2000):
+        env.bullet_alive[:] = False
+        env._bullet_high = 0
+        env._run_interpreters(np.ones(1, dtype=bool))
+        bullets = interpreter.get_bullets(pattern, Vector2(0, 0), entity_manager)
+        assert env.bullet_alive.sum() == len(bullets)
+        assert env.token_index[0] == interpreter.current_index
+
+
+def test_loop_stack_depth_is_checked():
+    with pytest.raises(ValueError):
+        TalakatVectorEnv(1, loop_depth=2)._compile_pattern(0, [LOOP, LOOP, LOOP, END, END, END])
+
+
+def test_same_step_final_obs_per_env():
+    env = TalakatVectorEnv(8, autoreset_mode=AutoresetMode.SAME_STEP)
+    env.reset(seed=0)
+    rng = np.random.default_rng(0)
+    for _ in range(5000):
+        _, _, terminations, _, infos = env.step(rng.integers(0, 5, 8))
+        if terminations.any():
+            break
+    assert terminations.any()
+
+    final_obs = infos['final_obs']
+    assert final_obs.dtype == object and len(final_obs) == 8
+    assert np.array_equal(infos['_final_obs'], terminations)
+    for row in range(8):
+        if terminations[row]:
+            assert env.single_observation_space.contains(final_obs[row])
+            assert final_obs[row]['player_hp'] == 0
+        else:
+            assert final_obs[row] is None
@@ -1,4 +1,24 @@
 
 
 def seconds_to_frames(seconds, fps=60):
-    return int(seconds * fps)
\ No newline at end of file
+    return int(seconds * fps)
+
+
+class SimulationClock:
+    """Counts simulated frames; the time base for gameplay logic instead of wall-clock time"""
+
+    def __init__(self, fps=60):
+        self.fps = fps
+        self.frame = 0  # Frames simulated so far
+
+    def tick(self):
+        """Advance by one simulated frame"""
+        self.frame += 1
+
+    def reset(self):
+        self.frame = 0
+
+    @property
+    def time(self):
+        """Simulated time in seconds"""
+        return self.frame / self.fps
@@ -1,13 +1,16 @@
 # train the AI model here
+import multiprocessing as mp
+import os
 import time
+from multiprocessing import shared_memory
 
-# test
-
+import numpy as np
 import gymnasium as gym
+from gymnasium.vector import AutoresetMode
 from stable_baselines3 import PPO
-from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import VecEnv
 from torch import nn
-import game
+from vector_env import TalakatVectorEnv
 
 
 # class PolicyNetwork(nn.Module):
@@ -24,42 +27,273 @@ import game
 #         x = self.layer2(x)
 #         return x
 
+# Rollout settings
+num_workers = os.cpu_count() or 1
+envs_per_worker = 64
+total_timesteps = 1_000_000
+obs_mode = 'nearest_bullets'  # Game obs_mode, 'stats' only sees damage dealt and lives (a throughput run)
 
-# env = gym.make('CartPole-v1', render_mode="rgb_array")
-# print("observation space: ", env.observation_space)
-# observation, info = env.reset()
-# print("observation: ", observation)
-# print("action space: ", env.action_space)
-#
-# print(env.render())
 
-gym.register("GameEnv", entry_point="game:Game")
+class SharedBuffers:
+    """Named NumPy arrays packed into a single shared memory block"""
+
+    def __init__(self, layout: dict, name: str = None):
+        """
+        Args:
+            layout: Mapping of array name to (shape, dtype)
+            name: Name of an existing block to attach to, or None to create one
+        """
+        offsets = {}
+        size = 0
+        for key, (shape, dtype) in layout.items():
+            offsets[key] = size
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            size += (nbytes + 7) // 8 * 8  # Keep every array 8 byte aligned
+
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(size, 1))
+        self.name = self.shm.name
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offsets[key])
+                       for key, (shape, dtype) in layout.items()}
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        self.arrays = {}  # Views must be gone before the buffer can be released
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _obs_spaces(space: gym.Space) -> dict:
+    """Sub-spaces of an observation space by key ('' for a non-dict space)"""
+    if isinstance(space, gym.spaces.Dict):
+        return dict(space.spaces)
+    return {'': space}
+
+
+def _buffer_layout(observation_space: gym.Space, num_envs: int) -> dict:
+    layout = {
+        'actions': ((num_envs,), np.int64),
+        'rewards': ((num_envs,), np.float32),
+        'terminations': ((num_envs,), np.bool_),
+        'truncations': ((num_envs,), np.bool_),
+        'final_mask': ((num_envs,), np.bool_),
+    }
+    for key, space in _obs_spaces(observation_space).items():
+        layout['obs/' + key] = ((num_envs,) + space.shape, space.dtype)
+        layout['final_obs/' + key] = ((num_envs,) + space.shape, space.dtype)
+    return layout
+
+
+def _write_obs(buffers: SharedBuffers, prefix: str, obs, rows: slice):
+    values = obs if isinstance(obs, dict) else {'': obs}
+    for key, value in values.items():
+        buffers[prefix + key][rows] = value
+
+
+def _rollout_worker(remote, parent_remote, env_fn, num_envs: int, start: int, layout: dict, shm_name: str):
+    """Worker process: steps one vector env and writes its results into the shared buffers"""
+    parent_remote.close()
+    buffers = SharedBuffers(layout, name=shm_name)
+    rows = slice(start, start + num_envs)
+    env = env_fn(num_envs)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == 'step':
+                t = time.perf_counter()
+                obs, rewards, terminations, truncations, infos = env.step(buffers['actions'][rows])
+                _write_obs(buffers, 'obs/', obs, rows)
+                buffers['rewards'][rows] = rewards
+                buffers['terminations'][rows] = terminations
+                buffers['truncations'][rows] = truncations
+                final_mask = infos.get('_final_obs', np.zeros(num_envs, dtype=bool))
+                buffers['final_mask'][rows] = final_mask
+                for i in np.flatnonzero(final_mask):  # final_obs holds one observation per finished env
+                    _write_obs(buffers, 'final_obs/', infos['final_obs'][i], slice(start + i, start + i + 1))
+                remote.send(time.perf_counter() - t)
+            elif command == 'reset':
+                t = time.perf_counter()
+                obs, _ = env.reset(seed=data)
+                _write_obs(buffers, 'obs/', obs, rows)
+                remote.send(time.perf_counter() - t)
+            elif command == 'get_attr':
+                remote.send(getattr(env, data))
+            elif command == 'set_attr':
+                setattr(env, *data)
+                remote.send(None)
+            elif command == 'env_method':
+                method_name, args, kwargs = data
+                remote.send(getattr(env, method_name)(*args, **kwargs))
+            elif command == 'close':
+                env.close()
+                remote.send(None)
+                break
+    finally:
+        buffers.close()
+
+
+def make_talakat_env(num_envs: int):
+    """Vector env factory used by the rollout workers"""
+    return TalakatVectorEnv(num_envs, autoreset_mode=AutoresetMode.SAME_STEP, obs_mode=obs_mode)
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Stable Baselines3 VecEnv that runs vector envs in worker processes.
+
+    Each worker owns envs_per_worker games. Actions, observations, rewards and done flags
+    are exchanged through one shared memory block; the pipes only carry commands and the
+    worker step times, so nothing is pickled per step.
+    """
+
+    def __init__(self, env_fn=make_talakat_env, num_workers: int = 1, envs_per_worker: int = 64, start_method: str = None):
+        """
+        Args:
+            env_fn: Picklable factory taking a number of envs and returning a gymnasium VectorEnv
+                    with SAME_STEP autoreset
+            num_workers: Number of worker processes
+            envs_per_worker: Number of envs stepped by each worker
+            start_method: multiprocessing start method, None for the platform default
+        """
+        probe = env_fn(1)
+        observation_space = probe.single_observation_space
+        action_space = probe.single_action_space
+        autoreset_mode = probe.metadata.get('autoreset_mode')
+        probe.close()
+        if autoreset_mode != AutoresetMode.SAME_STEP:
+            raise ValueError(f"Workers need SAME_STEP autoreset, got {autoreset_mode}")
+
+        self.num_workers = num_workers
+        self.envs_per_worker = envs_per_worker
+        num_envs = num_workers * envs_per_worker
+        self._layout = _buffer_layout(observation_space, num_envs)
+        self.buffers = SharedBuffers(self._layout)
+        self._dict_obs = isinstance(observation_space, gym.spaces.Dict)
+
+        # Time the learner spent blocked on the workers, and time each worker spent stepping
+        self.env_time = 0.0
+        self.worker_time = np.zeros(num_workers)
+        self._step_start = 0.0
+
+        context = mp.get_context(start_method)
+        self.remotes, work_remotes = zip(*[context.Pipe() for _ in range(num_workers)])
+        self.processes = []
+        for i, (work_remote, remote) in enumerate(zip(work_remotes, self.remotes)):
+            args = (work_remote, remote, env_fn, envs_per_worker, i * envs_per_worker, self._layout, self.buffers.name)
+            process = context.Process(target=_rollout_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+        self.closed = False
+
+        super().__init__(num_envs, observation_space, action_space)
+
+    def _read_obs(self, prefix: str, index=slice(None)):
+        obs = {key: self.buffers[prefix + key][index].copy() for key in _obs_spaces(self.observation_space)}
+        return obs if self._dict_obs else obs['']
+
+    def _wait_workers(self):
+        durations = [remote.recv() for remote in self.remotes]
+        self.worker_time += durations
+
+    def reset(self):
+        start = time.perf_counter()
+        for i, remote in enumerate(self.remotes):
+            seed = self._seeds[i * self.envs_per_worker]
+            remote.send(('reset', seed))
+        self._wait_workers()
+        self.env_time += time.perf_counter() - start
+        self._reset_seeds()
+        self._reset_options()
+        return self._read_obs('obs/')
+
+    def step_async(self, actions: np.ndarray):
+        self._step_start = time.perf_counter()
+        self.buffers['actions'][:] = actions
+        for remote in self.remotes:
+            remote.send(('step', None))
+
+    def step_wait(self):
+        self._wait_workers()
+        obs = self._read_obs('obs/')
+        rewards = self.buffers['rewards'].copy()
+        terminations = self.buffers['terminations']
+        truncations = self.buffers['truncations']
+        dones = terminations | truncations
+
+        infos = [{} for _ in range(self.num_envs)]
+        for i in np.flatnonzero(self.buffers['final_mask']):
+            infos[i]['terminal_observation'] = self._read_obs('final_obs/', i)
+            infos[i]['TimeLimit.truncated'] = bool(truncations[i] and not terminations[i])
+
+        self.env_time += time.perf_counter() - self._step_start
+        return obs, rewards, dones, infos
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for remote in self.remotes:
+            remote.recv()
+        for process in self.processes:
+            process.join()
+        self.buffers.close()
+        self.buffers.unlink()
+        self.closed = True
+
+    def _worker_indices(self, indices):
+        """Workers owning the given env indices, each with the number of those envs it holds"""
+        workers = np.asarray(self._get_indices(indices)) // self.envs_per_worker
+        return np.unique(workers, return_counts=True)
+
+    def get_attr(self, attr_name, indices=None):
+        values = []
+        for worker, count in zip(*self._worker_indices(indices)):
+            self.remotes[worker].send(('get_attr', attr_name))
+            values += [self.remotes[worker].recv()] * count
+        return values
+
+    def set_attr(self, attr_name, value, indices=None):
+        for worker, _ in zip(*self._worker_indices(indices)):
+            self.remotes[worker].send(('set_attr', (attr_name, value)))
+            self.remotes[worker].recv()
 
-# Create the environment
-env = gym.make("GameEnv")
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """Call a method of the worker vector envs (once per worker, like get_attr) over the pipes"""
+        values = []
+        for worker, count in zip(*self._worker_indices(indices)):
+            self.remotes[worker].send(('env_method', (method_name, method_args, method_kwargs)))
+            values += [self.remotes[worker].recv()] * count
+        return values
 
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
 
-# Parallel environments
-# env = "FrozenLake-v1"
-env = "CartPole-v1"
-vec_env = make_vec_env(env, n_envs=1)
-# Custom MLP policy of two layers of size 32 each with Relu activation function
-# policy_kwargs = dict(activation_fn=nn.ReLU, net_arch=[32, 32])
-# model = PPO("MlpPolicy", vec_env, policy_kwargs=policy_kwargs, verbose=1)
+    def print_timing(self, total_time: float):
+        """Print how the wall time split between waiting on the envs and running the learner"""
+        learner_time = total_time - self.env_time
+        utilization = self.worker_time.sum() / (self.num_workers * total_time) if total_time > 0 else 0
+        print(f"Total time: {total_time:.2f}s")
+        print(f"Env time: {self.env_time:.2f}s ({self.env_time / total_time:.1%})")
+        print(f"Learner time: {learner_time:.2f}s ({learner_time / total_time:.1%})")
+        print(f"Worker utilization: {utilization:.1%} over {self.num_workers} workers")
 
-model = PPO("MlpPolicy", vec_env, verbose=1, learning_rate=0.001)
-t = time.time()
-model.learn(total_timesteps=5000)
-print(time.time() - t)
-# model.save("ppo_cartpole")
 
-# del model # remove to demonstrate saving and loading
+def main():
+    vec_env = SharedMemoryVecEnv(make_talakat_env, num_workers, envs_per_worker)
+    # Custom MLP policy of two layers of size 32 each with Relu activation function
+    # policy_kwargs = dict(activation_fn=nn.ReLU, net_arch=[32, 32])
+    model = PPO("MultiInputPolicy", vec_env, verbose=1, learning_rate=0.001)
+    t = time.time()
+    model.learn(total_timesteps=total_timesteps)
+    vec_env.print_timing(time.time() - t)
+    vec_env.close()
+    # model.save("ppo_talakat")
 
-# model = PPO.load("ppo_cartpole")
 
-# obs = vec_env.reset()
-# while True:
-#     action, _states = model.predict(obs)
-#     obs, rewards, dones, info = vec_env.step(action)
-#     vec_env.render("human")
-#     time.sleep(1/2)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
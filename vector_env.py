@@ -0,0 +1,535 @@
+"""
+TalakatVectorEnv - Runs many Neural Hellwork games at once as batched NumPy arrays
+"""
+import math
+from random import Random
+from typing import Any, Optional
+import numpy as np
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+from pygame.math import Vector2
+from danger_field import DangerField
+from entity_manager import TagArrays
+from globals import Globals
+from obs_encoders import make_obs_encoder
+from talakat import TokenType
+from bullet_patterns import get_pattern_for_level
+from player_input import ActionInput
+from tools import seconds_to_frames
+
+# Entity constants, mirroring Player, Enemy, PlayerBullet and Game
+PLAYER_RADIUS = 2
+PLAYER_LIVES = 3
+PLAYER_START = (0, Globals.world_bottom - 120)
+PLAYER_RESPAWN = (0, 80)
+PLAYER_INVINCIBLE_FRAMES = seconds_to_frames(1.5)
+PLAYER_SHOOT_COOLDOWN = seconds_to_frames(0.167)
+PLAYER_BULLET_RADIUS = 16
+ENEMY_RADIUS = 24
+ENEMY_HEALTH = 100
+ENEMY_ENTER_SPEED = 3.0
+ENEMY_INVINCIBLE_FRAMES = seconds_to_frames(1.0)
+ENEMY_START_Y = Globals.world_top - 90
+ENEMY_TARGET_Y = Globals.world_top + 90
+MAX_LEVEL = 10
+
+# Interpreter token codes. The five numeric parameters double as their value slot
+_TOKEN_CODES = {
+    TokenType.ANGLE: 0,
+    TokenType.COUNT: 1,
+    TokenType.SPEED: 2,
+    TokenType.SIZE: 3,
+    TokenType.SPREAD: 4,
+    TokenType.COLOR: 5,
+    TokenType.WAIT: 6,
+    TokenType.LOOP: 7,
+    TokenType.ENDLOOP: 8,
+    TokenType.RANDOM: 9,
+    TokenType.SEQUENCE: 10,
+}
+_ANGLE, _COUNT, _SPEED, _SIZE, _SPREAD, _COLOR, _WAIT, _LOOP, _ENDLOOP, _RANDOM, _SEQUENCE = range(11)
+_DEFAULT_VALUES = [90, 4, 4.5, 6, 0, 0]  # TalakatInterpreter defaults (color is not simulated)
+
+def loop_stack_depth(pattern: list) -> int:
+    """
+    Loop stack entries TalakatInterpreter can still read while running a pattern forever.
+    The stack is kept when the pattern wraps around, so a pattern with more LOOPs than
+    ENDLOOPs deepens it on every pass; entries below the lowest depth any later pass
+    returns to are never read again and do not count.
+    """
+    endloops = sum(1 for token in pattern if (token[0] if isinstance(token, tuple) else token) == TokenType.ENDLOOP)
+    passes = []  # (lowest, deepest) stack size of every pass
+    start = 0
+    while True:
+        depth = lowest = deepest = start
+        for token in pattern:
+            token_type = token[0] if isinstance(token, tuple) else token
+            if token_type == TokenType.LOOP:
+                depth += 1
+                deepest = max(deepest, depth)
+            elif token_type == TokenType.ENDLOOP and depth > 0:
+                depth -= 1  # A loop's ENDLOOP is passed on once, when its iterations run out
+                lowest = min(lowest, depth)
+        passes.append((lowest, deepest))
+        # Once the start is deeper than the ENDLOOPs can pop, every pass repeats this one, shifted
+        if depth == start or start > endloops:
+            break
+        start = depth
+
+    needed, later_lowest = 0, float('inf')
+    for lowest, deepest in reversed(passes):
+        later_lowest = min(later_lowest, lowest)
+        needed = max(needed, deepest - later_lowest)
+    return needed
+
+class _EnemyBullets:
+    """
+    The enemy bullets of one game of a TalakatVectorEnv behind the EntityManager methods the
+    observation encoders read (get_tag_arrays() and get_danger_field())
+    """
+
+    def __init__(self):
+        self.arrays = None
+        self.danger_field = DangerField()
+
+    def set_bullets(self, positions: np.ndarray, velocities: np.ndarray, radii: np.ndarray):
+        rows = np.column_stack((positions, velocities, radii)).astype(np.float64)
+        self.arrays = TagArrays(range(len(rows)), rows)  # There are no entity objects
+        self._danger_built = False
+
+    def get_tag_arrays(self, tag: int) -> TagArrays:
+        return self.arrays  # Encoders only ask for enemy bullets
+
+    def get_danger_field(self) -> DangerField:
+        if not self._danger_built:
+            self.danger_field.build(self.arrays.positions, self.arrays.velocities, self.arrays.radii)
+            self._danger_built = True
+        return self.danger_field
+
+class TalakatVectorEnv(VectorEnv):
+    """
+    Vectorized version of the Game env. Players, enemies, bullets and Talakat interpreters
+    of all games are stored as arrays with a leading num_envs axis and advanced together,
+    so there are no per-game entity objects and no per-game Python loop in step().
+
+    Enemy bullets live in a fixed pool of bullet_capacity slots per game; spawns that do
+    not fit are dropped. Finished games are reset automatically (NEXT_STEP or SAME_STEP,
+    with infos['final_obs'] as a per-env object array like SyncVectorEnv's).
+    Colors are not simulated.
+
+    Observations are the Game ones for the same obs_mode. Any mode besides 'stats' runs the
+    game's observation encoder once per game, the only per-game Python loop in step().
+    """
+
+    metadata = {"autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(self, num_envs: int, bullet_capacity: int = 2048, autoreset_mode: AutoresetMode = AutoresetMode.NEXT_STEP,
+                 max_tokens: int = 32, max_sequence: int = 16, loop_depth: int = 4, obs_mode: str = 'stats'):
+        """
+        Args:
+            num_envs: Number of games
+            bullet_capacity: Maximum number of enemy bullets per game
+            autoreset_mode: AutoresetMode.NEXT_STEP or AutoresetMode.SAME_STEP
+            max_tokens: Maximum pattern length
+            max_sequence: Maximum number of values in a SEQUENCE token
+            loop_depth: Loop stack entries per game, patterns needing more (see loop_stack_depth) raise a ValueError
+            obs_mode: Game obs_mode, 'stats', 'bullet_grid', 'nearest_bullets' or 'danger_field'
+        """
+        if autoreset_mode not in (AutoresetMode.NEXT_STEP, AutoresetMode.SAME_STEP):
+            raise ValueError(f"Unsupported autoreset mode: {autoreset_mode}")
+
+        self.num_envs = num_envs
+        self.autoreset_mode = autoreset_mode
+        self.metadata = dict(self.metadata, autoreset_mode=autoreset_mode)
+        self.bullet_capacity = bullet_capacity
+        self.max_tokens = max_tokens
+        self.max_sequence = max_sequence
+        self.loop_depth = loop_depth
+
+        self.single_action_space = gym.spaces.Discrete(10)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.obs_mode = obs_mode
+        self.obs_encoder = make_obs_encoder(obs_mode)
+        self._enemy_bullets = _EnemyBullets()
+        spaces = {
+            'total_damage_dealt': gym.spaces.Box(low=0, high=float('inf'), shape=(1,), dtype=np.float32),
+            'player_hp': gym.spaces.Discrete(4)  # 0 to 3 lives
+        }
+        if self.obs_encoder is not None:
+            spaces[obs_mode] = self.obs_encoder.observation_space
+        self.single_observation_space = gym.spaces.Dict(spaces)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        n = num_envs
+        # Player
+        self.player_pos = np.zeros((n, 2))
+        self.player_lives = np.zeros(n, dtype=np.int64)
+        self.player_invincible_timer = np.zeros(n, dtype=np.int64)
+        self.player_shoot_cooldown = np.zeros(n, dtype=np.int64)
+        # Enemy
+        self.enemy_pos = np.zeros((n, 2))
+        self.enemy_health = np.zeros(n, dtype=np.int64)
+        self.enemy_entering = np.zeros(n, dtype=bool)
+        self.enemy_invincible_timer = np.zeros(n, dtype=np.int64)
+        # Enemy bullets (pool slots) and player bullets (fired every 10 frames, at most 8 on screen)
+        self.bullet_pos = np.zeros((n, bullet_capacity, 2), dtype=np.float32)
+        self.bullet_vel = np.zeros((n, bullet_capacity, 2), dtype=np.float32)
+        self.bullet_radius = np.zeros((n, bullet_capacity), dtype=np.float32)
+        self.bullet_alive = np.zeros((n, bullet_capacity), dtype=bool)
+        self.bullet_serial = np.zeros((n, bullet_capacity), dtype=np.int64)  # Spawn order, Game's entity order
+        self._next_serial = 0
+        self._bullet_high = 0  # No bullet lives in a slot at or above this index
+        self.player_bullet_pos = np.zeros((n, 16, 2), dtype=np.float32)
+        self.player_bullet_alive = np.zeros((n, 16), dtype=bool)
+        # Game state
+        self.level = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.damage_dealt = np.zeros(n, dtype=np.int64)
+        self.damage_received = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.win = np.zeros(n, dtype=bool)
+        self.frame = np.zeros(n, dtype=np.int64)  # Simulation clock of each game
+        # Compiled patterns
+        self.token_code = np.zeros((n, max_tokens), dtype=np.int64)
+        self.token_value = np.zeros((n, max_tokens))
+        self.token_param = np.zeros((n, max_tokens), dtype=np.int64)  # Target slot of RANDOM/SEQUENCE
+        self.token_min = np.zeros((n, max_tokens))
+        self.token_max = np.zeros((n, max_tokens))
+        self.sequence_values = np.zeros((n, max_tokens, max_sequence))
+        self.sequence_length = np.ones((n, max_tokens), dtype=np.int64)
+        self.pattern_length = np.zeros(n, dtype=np.int64)
+        # Interpreter state
+        self.values = np.zeros((n, len(_DEFAULT_VALUES)))
+        self.token_index = np.zeros(n, dtype=np.int64)
+        self.wait_counter = np.zeros(n, dtype=np.int64)
+        self.loop_stack = np.zeros((n, loop_depth), dtype=np.int64)
+        self.loop_iterations = np.zeros((n, loop_depth), dtype=np.int64)
+        self.loop_size = np.zeros(n, dtype=np.int64)
+        self.sequence_index = np.zeros((n, len(_DEFAULT_VALUES)), dtype=np.int64)
+
+        self._pattern_rng = Random()
+        self._autoreset_envs = np.zeros(n, dtype=bool)
+        self._moves = np.array(ActionInput.MOVES, dtype=np.float64)
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        """Reset every game"""
+        super().reset(seed=seed, options=options)
+        self._pattern_rng.seed(int(self.np_random.integers(2 ** 63)))
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        self._autoreset_envs[:] = False
+        return self._get_obs(), {}
+
+    def step(self, actions):
+        """Advance every game by one frame"""
+        actions = np.asarray(actions, dtype=np.int64)
+        was_over = self.game_over.copy()
+        self._simulate_frame(actions)
+
+        ended = self.game_over & ~was_over
+        rewards = np.where(ended & self.win, 100.0, np.where(ended, -100.0, 0.0))
+        terminations = self.game_over.copy()
+        truncations = np.zeros(self.num_envs, dtype=bool)
+        infos: dict[str, Any] = {}
+
+        if self.autoreset_mode == AutoresetMode.NEXT_STEP:
+            # Games that ended on the previous step start over instead of stepping
+            resetting = self._autoreset_envs
+            if resetting.any():
+                self._reset_envs(resetting)
+                rewards[resetting] = 0.0
+                terminations[resetting] = False
+            self._autoreset_envs = terminations | truncations
+        else:
+            done = terminations | truncations
+            if done.any():
+                # Same layout as SyncVectorEnv: one observation per finished env, None elsewhere
+                final_obs = self._get_obs()
+                infos['final_obs'] = np.full(self.num_envs, None, dtype=object)
+                for row in np.flatnonzero(done):
+                    infos['final_obs'][row] = {key: value[row] for key, value in final_obs.items()}
+                infos['_final_obs'] = done
+                infos['final_info'] = {}
+                infos['_final_info'] = done.copy()
+                self._reset_envs(done)
+
+        return self._get_obs(), rewards, terminations, truncations, infos
+
+    def _get_obs(self):
+        obs = {
+            'total_damage_dealt': self.damage_dealt.astype(np.float32)[:, np.newaxis],
+            'player_hp': np.clip(self.player_lives, 0, PLAYER_LIVES)
+        }
+        if self.obs_encoder is not None:
+            obs[self.obs_mode] = self._encode_obs()
+        return obs
+
+    def _encode_obs(self) -> np.ndarray:
+        """Run the observation encoder on the enemy bullets and player of every game"""
+        space = self.obs_encoder.observation_space
+        encoded = np.empty((self.num_envs, *space.shape), dtype=space.dtype)
+        high = self._bullet_high
+        for row in range(self.num_envs):
+            alive = self.bullet_alive[row, :high]
+            self._enemy_bullets.set_bullets(self.bullet_pos[row, :high][alive], self.bullet_vel[row, :high][alive],
+                                            self.bullet_radius[row, :high][alive])
+            encoded[row] = self.obs_encoder.encode(self._enemy_bullets, Vector2(*self.player_pos[row]))
+        return encoded
+
+    def _reset_envs(self, mask: np.ndarray):
+        """Start new games in the masked envs"""
+        rows = np.flatnonzero(mask)
+        self.player_pos[rows] = PLAYER_START
+        self.player_lives[rows] = PLAYER_LIVES
+        self.player_invincible_timer[rows] = 0
+        self.player_shoot_cooldown[rows] = 0
+        self.bullet_alive[rows] = False
+        self.player_bullet_alive[rows] = False
+        self.level[rows] = 1
+        self.score[rows] = 0
+        self.damage_dealt[rows] = 0
+        self.damage_received[rows] = 0
+        self.game_over[rows] = False
+        self.win[rows] = False
+        self.frame[rows] = 0
+        self._spawn_enemies(rows)
+
+    def _spawn_enemies(self, rows: np.ndarray):
+        """Spawn a fresh enemy with the pattern of the current level"""
+        self.enemy_pos[rows, 0] = self.np_random.uniform(Globals.world_left + 90, Globals.world_right - 90, len(rows))
+        self.enemy_pos[rows, 1] = ENEMY_START_Y
+        self.enemy_health[rows] = ENEMY_HEALTH
+        self.enemy_entering[rows] = True
+        self.enemy_invincible_timer[rows] = ENEMY_INVINCIBLE_FRAMES
+        for row in rows:
+            self._compile_pattern(row, get_pattern_for_level(int(self.level[row]), self._pattern_rng))
+
+        # Fresh interpreter
+        self.values[rows] = _DEFAULT_VALUES
+        self.token_index[rows] = 0
+        self.wait_counter[rows] = 0
+        self.loop_size[rows] = 0
+        self.sequence_index[rows] = 0
+
+    def _compile_pattern(self, row: int, pattern: list):
+        """Store a Talakat pattern in the token arrays of one game"""
+        if len(pattern) > self.max_tokens:
+            raise ValueError(f"Pattern has {len(pattern)} tokens, max_tokens is {self.max_tokens}")
+        depth = loop_stack_depth(pattern)
+        if depth > self.loop_depth:
+            raise ValueError(f"Pattern needs {depth} loop stack entries, loop_depth is {self.loop_depth}")
+
+        self.pattern_length[row] = len(pattern)
+        for i, token in enumerate(pattern):
+            token_type, value = token if isinstance(token, tuple) else (token, None)
+            code = _TOKEN_CODES[token_type]
+            self.token_code[row, i] = code
+            if code == _RANDOM:
+                param_type, min_val, max_val = value
+                self.token_param[row, i] = _TOKEN_CODES[param_type]
+                if param_type != TokenType.COLOR:
+                    self.token_min[row, i] = min_val
+                    self.token_max[row, i] = max_val
+            elif code == _SEQUENCE:
+                param_type, values = value
+                if len(values) > self.max_sequence:
+                    raise ValueError(f"Sequence has {len(values)} values, max_sequence is {self.max_sequence}")
+                self.token_param[row, i] = _TOKEN_CODES[param_type]
+                self.sequence_length[row, i] = len(values)
+                if param_type != TokenType.COLOR:
+                    self.sequence_values[row, i, :len(values)] = values
+            elif code not in (_COLOR, _ENDLOOP):
+                self.token_value[row, i] = value
+
+    def _simulate_frame(self, actions: np.ndarray):
+        """One Game.update() for every game"""
+        n = self.num_envs
+        high = self._bullet_high
+
+        # Bullets fired in earlier frames move (new ones this frame do not, as in EntityManager.update_all)
+        self.bullet_pos[:, :high] += self.bullet_vel[:, :high]
+        self.player_bullet_pos[:, :, 1] -= Globals.bullet_speed
+
+        # Player movement, shooting and invincibility
+        self.player_pos += self._moves[actions % 5] * Globals.player_speed
+        np.clip(self.player_pos[:, 0], Globals.world_left + PLAYER_RADIUS, Globals.world_right - PLAYER_RADIUS, out=self.player_pos[:, 0])
+        np.clip(self.player_pos[:, 1], Globals.world_top + PLAYER_RADIUS, Globals.world_bottom - PLAYER_RADIUS, out=self.player_pos[:, 1])
+
+        cooling = self.player_shoot_cooldown > 0
+        self.player_shoot_cooldown[cooling] -= 1
+        firing = np.flatnonzero((actions >= 5) & (self.player_shoot_cooldown <= 0))
+        slots = np.argmin(self.player_bullet_alive[firing], axis=1)
+        has_slot = ~self.player_bullet_alive[firing, slots]
+        firing, slots = firing[has_slot], slots[has_slot]
+        self.player_bullet_pos[firing, slots, 0] = self.player_pos[firing, 0]
+        self.player_bullet_pos[firing, slots, 1] = self.player_pos[firing, 1] - PLAYER_RADIUS
+        self.player_bullet_alive[firing, slots] = True
+        self.player_shoot_cooldown[firing] = PLAYER_SHOOT_COOLDOWN
+
+        self.player_invincible_timer[self.player_invincible_timer > 0] -= 1
+
+        # Enemy entrance, sway and invincibility
+        self.enemy_invincible_timer[self.enemy_invincible_timer > 0] -= 1
+        entering = self.enemy_entering.copy()
+        self.enemy_pos[entering, 1] += ENEMY_ENTER_SPEED
+        arrived = entering & (self.enemy_pos[:, 1] >= ENEMY_TARGET_Y)
+        self.enemy_pos[arrived, 1] = ENEMY_TARGET_Y
+        self.enemy_entering[arrived] = False
+        self.enemy_pos[~entering, 0] += np.sin(self.frame[~entering] / 60) * Globals.enemy_speed
+        np.clip(self.enemy_pos[:, 0], Globals.world_left + ENEMY_RADIUS, Globals.world_right - ENEMY_RADIUS, out=self.enemy_pos[:, 0])
+
+        vulnerable = ~self.enemy_entering & (self.enemy_invincible_timer <= 0)
+        self._run_interpreters(vulnerable)
+        high = self._bullet_high
+
+        # Player bullets vs enemy
+        offsets = self.player_bullet_pos - self.enemy_pos[:, np.newaxis, :].astype(np.float32)
+        touching = self.player_bullet_alive & ((offsets ** 2).sum(axis=2) < (PLAYER_BULLET_RADIUS + ENEMY_RADIUS) ** 2)
+        self.player_bullet_alive &= ~touching
+        hits = touching.sum(axis=1) * vulnerable
+        self.enemy_health -= 10 * hits
+        killed = (hits > 0) & (self.enemy_health <= 0)
+        self.score += 100 * killed
+        self.damage_dealt += killed
+
+        # Enemy bullets vs player
+        offsets = self.bullet_pos[:, :high] - self.player_pos[:, np.newaxis, :].astype(np.float32)
+        reach = self.bullet_radius[:, :high] + PLAYER_RADIUS
+        touching = self.bullet_alive[:, :high] & ((offsets ** 2).sum(axis=2) < reach * reach)
+        hit = touching.any(axis=1) & (self.player_invincible_timer <= 0)
+        if hit.any():
+            # Game tests the bullets in spawn order and moves the player to the respawn point on the
+            # first hit: the bullets after it are tested there, the ones before it stay
+            serial = self.bullet_serial[hit, :high]
+            first = np.where(touching[hit], serial, np.iinfo(np.int64).max).min(axis=1, keepdims=True)
+            offsets = self.bullet_pos[hit, :high] - np.array(PLAYER_RESPAWN, dtype=np.float32)
+            at_respawn = self.bullet_alive[hit, :high] & ((offsets ** 2).sum(axis=2) < reach[hit] * reach[hit])
+            touching[hit] = (serial == first) | (at_respawn & (serial > first))
+        self.bullet_alive[:, :high] &= ~touching
+        self.player_lives -= hit
+        self.player_invincible_timer[hit] = PLAYER_INVINCIBLE_FRAMES
+        self.player_pos[hit] = PLAYER_RESPAWN
+        self.damage_received += hit
+
+        # Offscreen bullets
+        x, y = self.bullet_pos[:, :high, 0], self.bullet_pos[:, :high, 1]
+        radius = self.bullet_radius[:, :high]
+        offscreen = ((x < Globals.world_left - radius) | (x > Globals.world_right + radius) |
+                     (y < Globals.world_top - radius) | (y > Globals.world_bottom + radius))
+        self.bullet_alive[:, :high] &= ~offscreen
+        self.player_bullet_alive &= self.player_bullet_pos[:, :, 1] >= Globals.world_top - PLAYER_BULLET_RADIUS
+        live_columns = np.flatnonzero(self.bullet_alive[:, :high].any(axis=0))
+        self._bullet_high = int(live_columns[-1]) + 1 if live_columns.size else 0
+
+        # Win check, next enemy and game over, in Game.update() order
+        won = self.level > MAX_LEVEL
+        self.win |= won
+        self.game_over |= won
+        if killed.any():
+            rows = np.flatnonzero(killed)
+            self.level[rows] += 1
+            self._spawn_enemies(rows)
+        self.game_over |= self.player_lives <= 0
+
+        self.frame += 1
+
+    def _run_interpreters(self, active: np.ndarray):
+        """One TalakatInterpreter.get_bullets() for every active game"""
+        rows = np.flatnonzero(active)
+        waiting = self.wait_counter[rows] > 0
+        self.wait_counter[rows[waiting]] -= 1
+        rows = rows[~waiting]
+        rows = rows[self.pattern_length[rows] > 0]
+        if rows.size == 0:
+            return
+
+        index = self.token_index[rows]
+        code = self.token_code[rows, index]
+        value = self.token_value[rows, index]
+        param = self.token_param[rows, index]
+
+        # Plain parameter tokens
+        setting = code <= _SPREAD
+        self.values[rows[setting], code[setting]] = value[setting]
+
+        waits = code == _WAIT
+        self.wait_counter[rows[waits]] = np.trunc(value[waits])
+
+        # LOOP pushes its position. On a full stack the oldest entry is dropped, which no
+        # ENDLOOP reads again (_compile_pattern() checked the pattern against loop_stack_depth())
+        pushing = np.flatnonzero(code == _LOOP)
+        full = pushing[self.loop_size[rows[pushing]] == self.loop_depth]
+        self.loop_stack[rows[full], :-1] = self.loop_stack[rows[full], 1:]
+        self.loop_iterations[rows[full], :-1] = self.loop_iterations[rows[full], 1:]
+        self.loop_size[rows[full]] -= 1
+        top = self.loop_size[rows[pushing]]
+        self.loop_stack[rows[pushing], top] = index[pushing]
+        self.loop_iterations[rows[pushing], top] = np.trunc(value[pushing])
+        self.loop_size[rows[pushing]] += 1
+
+        # ENDLOOP jumps back while iterations remain, otherwise pops
+        ending = np.flatnonzero((code == _ENDLOOP) & (self.loop_size[rows] > 0))
+        top = self.loop_size[rows[ending]] - 1
+        self.loop_iterations[rows[ending], top] -= 1
+        repeating = self.loop_iterations[rows[ending], top] > 0
+        index[ending[repeating]] = self.loop_stack[rows[ending[repeating]], top[repeating]]
+        self.loop_size[rows[ending[~repeating]]] -= 1
+
+        randomizing = np.flatnonzero((code == _RANDOM) & (param <= _SPREAD))
+        self.values[rows[randomizing], param[randomizing]] = self.np_random.uniform(
+            self.token_min[rows[randomizing], index[randomizing]], self.token_max[rows[randomizing], index[randomizing]])
+
+        sequencing = np.flatnonzero(code == _SEQUENCE)
+        seq_rows, seq_params, seq_tokens = rows[sequencing], param[sequencing], index[sequencing]
+        position = self.sequence_index[seq_rows, seq_params]
+        length = self.sequence_length[seq_rows, seq_tokens]
+        numeric = seq_params <= _SPREAD
+        self.values[seq_rows[numeric], seq_params[numeric]] = self.sequence_values[
+            seq_rows[numeric], seq_tokens[numeric], (position % length)[numeric]]
+        self.sequence_index[seq_rows, seq_params] = (position + 1) % length
+
+        # Bullets are created on every token that leaves the wait counter at exactly 0
+        self._spawn_bullets(rows[self.wait_counter[rows] == 0])
+
+        index += 1
+        index[index >= self.pattern_length[rows]] = 0
+        self.token_index[rows] = index
+
+    def _spawn_bullets(self, rows: np.ndarray):
+        """Fire the current count/angle/spread/speed/size from the enemies of the given games"""
+        if rows.size == 0:
+            return
+
+        count = np.maximum(np.trunc(self.values[rows, _COUNT]).astype(np.int64), 0)
+        # Only columns up to the high-water mark can be in use, anything past it is free
+        columns = min(self.bullet_capacity, self._bullet_high + int(count.max()))
+        alive = self.bullet_alive[rows, :columns]
+        taken = np.minimum(count, columns - alive.sum(axis=1))  # Spawns beyond the pool are dropped
+        total = int(taken.sum())
+        if total == 0:
+            return
+
+        # One entry per new bullet, ordered by game then by index within the burst
+        owner = np.repeat(np.arange(len(rows)), taken)
+        i = np.arange(total) - np.repeat(np.cumsum(taken) - taken, taken)
+        n = count[owner]
+        angle = self.values[rows, _ANGLE][owner]
+        spread = self.values[rows, _SPREAD][owner]
+        fraction = i / np.maximum(n - 1, 1)
+        angle = np.where((n > 1) & (spread > 0), angle - spread / 2 + fraction * spread, angle)
+        speed = self.values[rows, _SPEED][owner]
+        radians = np.radians(angle)
+
+        # The first free slots of each game, in the same game-then-slot order
+        free = ~alive
+        take = free & (np.cumsum(free, axis=1) <= taken[:, np.newaxis])
+        owner_rows, slots = np.nonzero(take)
+        games = rows[owner_rows]
+        self.bullet_pos[games, slots] = self.enemy_pos[games]
+        self.bullet_vel[games, slots, 0] = np.cos(radians) * speed
+        self.bullet_vel[games, slots, 1] = np.sin(radians) * speed
+        self.bullet_radius[games, slots] = self.values[rows, _SIZE][owner]
+        self.bullet_alive[games, slots] = True
+        self.bullet_serial[games, slots] = self._next_serial + np.arange(total)
+        self._next_serial += total
+        self._bullet_high = max(self._bullet_high, int(slots.max()) + 1)